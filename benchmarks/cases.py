@@ -0,0 +1,493 @@
+"""
+Casos de benchmark de los hot paths de tank_simulator y del pipeline del worker.
+Cada caso recibe un directorio temporal y devuelve un dict con sus métricas
+(como mínimo 'wall_s'); el harness añade peak RSS y bytes escritos.
+"""
+import os
+import sys
+import json
+import time
+from datetime import datetime
+from typing import Callable, Dict, Any
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "libraries", "tank_simulator")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+PRESET_PATH = os.path.join(os.path.dirname(__file__), "presets", "reference_preset.json")
+START_TIME = datetime(2025, 1, 1)
+SEED = 101
+TANK_ID = 1
+DT_TOLERANCE = 0.03  # error relativo máximo entre medias diarias con dt=15 y dt=1
+
+CASES: Dict[str, Callable[[str], Dict[str, Any]]] = {}
+
+
+def benchmark(name: str):
+    def register(func):
+        CASES[name] = func
+        return func
+    return register
+
+def load_reference_preset() -> dict:
+    with open(PRESET_PATH) as f:
+        return json.load(f)
+
+def build_env(days: int, **kwargs):
+    from tank_simulator.environment import SimulationEnvironment
+    return SimulationEnvironment(
+        days=days,
+        config_dict=load_reference_preset(),
+        seed=SEED,
+        start_time=START_TIME,
+        tank_id=TANK_ID,
+        **kwargs
+    )
+
+def reference_dataframe(days: int):
+    from tank_simulator.orchestration import run_simulation
+    from common.simulation_utils import rows_to_dataframe
+    env = build_env(days)
+    return env, rows_to_dataframe(run_simulation(env), env)
+
+def folder_size(path: str) -> int:
+    total = 0
+    for folder, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(folder, name)) for name in files)
+    return total
+
+
+# --- tank_simulator ---
+
+@benchmark("env_build")
+def bench_env_build(out_dir: str) -> Dict[str, Any]:
+    repeats = 5
+    start = time.perf_counter()
+    for _ in range(repeats):
+        build_env(30)
+    wall = time.perf_counter() - start
+    return {"wall_s": wall, "per_build_ms": wall / repeats * 1000}
+
+@benchmark("preset_compile")
+def bench_preset_compile(out_dir: str) -> Dict[str, Any]:
+    from tank_simulator.compiled_preset import compile_preset, get_compiled_preset
+    preset = load_reference_preset()
+    repeats = 1000
+    start = time.perf_counter()
+    for _ in range(repeats):
+        compile_preset(preset)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeats):
+        get_compiled_preset(preset)
+    cached = time.perf_counter() - start
+    return {"wall_s": cold + cached, "cold_us": cold / repeats * 1e6, "cached_us": cached / repeats * 1e6}
+
+@benchmark("simulation_step")
+def bench_simulation_step(out_dir: str) -> Dict[str, Any]:
+    from tank_simulator.orchestration import simulation_step
+    env = build_env(2)
+    state = env.get_initial_state()
+    steps = env.minutes
+    start = time.perf_counter()
+    for t in range(steps):
+        state, _ = simulation_step(t, env, state, 0.001)
+    wall = time.perf_counter() - start
+    return {"wall_s": wall, "minutes_per_s": steps / wall}
+
+def _bench_run_simulation(days: int, kernel_backend: str = "python", output_mode: str = "rows",
+                          dt_minutes: int = 1) -> Dict[str, Any]:
+    from tank_simulator.orchestration import run_simulation
+    from tank_simulator.collectors import make_collector
+    env = build_env(days, kernel_backend=kernel_backend, dt_minutes=dt_minutes)
+    start = time.perf_counter()
+    result = run_simulation(env, collector=make_collector(output_mode))
+    wall = time.perf_counter() - start
+    minutes = len(result) * dt_minutes if output_mode == "rows" else env.minutes
+    return {"wall_s": wall, "minutes_per_s": minutes / wall, "rows": len(result) if output_mode == "rows" else 0}
+
+@benchmark("run_simulation_30d")
+def bench_run_simulation_30(out_dir: str) -> Dict[str, Any]:
+    return _bench_run_simulation(30)
+
+@benchmark("run_simulation_120d")
+def bench_run_simulation_120(out_dir: str) -> Dict[str, Any]:
+    return _bench_run_simulation(120)
+
+@benchmark("run_simulation_365d")
+def bench_run_simulation_365(out_dir: str) -> Dict[str, Any]:
+    return _bench_run_simulation(365)
+
+@benchmark("run_simulation_120d_numba")
+def bench_run_simulation_120_numba(out_dir: str) -> Dict[str, Any]:
+    # Sin numba instalado el backend cae al camino python (se indica en 'numba')
+    from tank_simulator.kernels import numba_available
+    return {**_bench_run_simulation(120, kernel_backend="numba"), "numba": numba_available()}
+
+@benchmark("run_simulation_120d_kpis")
+def bench_run_simulation_120_kpis(out_dir: str) -> Dict[str, Any]:
+    return _bench_run_simulation(120, output_mode="kpis")
+
+@benchmark("run_simulation_120d_kpis_numba")
+def bench_run_simulation_120_kpis_numba(out_dir: str) -> Dict[str, Any]:
+    from tank_simulator.kernels import numba_available
+    return {**_bench_run_simulation(120, kernel_backend="numba", output_mode="kpis"), "numba": numba_available()}
+
+@benchmark("run_simulation_120d_dt15")
+def bench_run_simulation_120_dt15(out_dir: str) -> Dict[str, Any]:
+    return _bench_run_simulation(120, dt_minutes=15)
+
+@benchmark("fused_kernel_parity")
+def bench_fused_kernel_parity(out_dir: str) -> Dict[str, Any]:
+    """
+    Camino de referencia y kernel fusionado (compilado si hay numba, si no su
+    versión Python) día a día con paso de 1 y de 15 minutos. La paridad
+    exacta se comprueba en tests/test_fused_kernel.py.
+    """
+    from tank_simulator import kernels
+    from tank_simulator.orchestration import simulate_day_reference, simulate_day_fused
+    days = 10
+    kernel = kernels.get_compiled_kernel() if kernels.numba_available() else kernels.fused_day_kernel
+
+    start = time.perf_counter()
+    for dt_minutes in (1, 15):
+        env_ref, env_fused = build_env(days, dt_minutes=dt_minutes), build_env(days, dt_minutes=dt_minutes)
+        params, events = kernels.pack_kernel_params(env_fused), kernels.event_arrays(env_fused)
+        state_ref, state_fused = env_ref.get_initial_state(), env_fused.get_initial_state()
+        n = env_ref.steps_per_day
+        for day in range(days):
+            t0 = day * 1440
+            feed = 0.002 * (day + 1)
+            state_ref, _ = simulate_day_reference(env_ref, state_ref, t0, n, feed)
+            state_fused, _ = simulate_day_fused(env_fused, kernel, params, events, state_fused, t0, n, feed)
+    return {"wall_s": time.perf_counter() - start, "days": days, "numba": kernels.numba_available()}
+
+@benchmark("engine_parity")
+def bench_engine_parity(out_dir: str) -> Dict[str, Any]:
+    """
+    Check de flujos de RNG: sanidad escalar (fila a fila) y vectorizada, con
+    backend python o numba, deben dar filas idénticas. Los umbrales de sanidad
+    se ajustan para que las reglas con ruido se disparen.
+    """
+    from tank_simulator.orchestration import run_simulation
+    from tank_simulator.environment import SimulationEnvironment
+    preset = {
+        **load_reference_preset(),
+        "sanity_density_crit_for_o2": 0.05, "sanity_temp_crit_for_ph": 28.5,
+        "sanity_ph_min_at_crit_temp": 8.0, "sanity_max_mortality_ratio": 0.00005,
+    }
+    engines = [(mode, backend) for mode in ("scalar", "vectorized") for backend in ("python", "numba")]
+    start = time.perf_counter()
+    results = {
+        engine: run_simulation(SimulationEnvironment(
+            days=5, config_dict=preset, seed=SEED, start_time=START_TIME, tank_id=TANK_ID,
+            sanity_mode=engine[0], kernel_backend=engine[1]
+        ))
+        for engine in engines
+    }
+    reference = results[engines[0]]
+    mismatched = [engine for engine in engines[1:] if results[engine] != reference]
+    if mismatched:
+        raise RuntimeError(f"Motores con filas distintas a {engines[0]}: {mismatched}")
+    return {"wall_s": time.perf_counter() - start, "engines": len(engines), "rows": len(reference)}
+
+DT_KEYS = ("temperature_C_mean", "salinity_ppt_mean", "oxygen_mgL_mean", "pH_mean", "feed_kg", "weight_end_g")
+
+def dt_relative_errors(days: int = 10, seeds=range(8), dt_minutes: int = 15) -> Dict[str, float]:
+    """
+    Error relativo máximo (sobre los días) entre las medias diarias de un
+    conjunto de semillas con `dt_minutes` y con dt_minutes=1. Muertes y
+    supervivientes no se comparan: son eventos raros y el sorteo de siembras
+    cambia con el paso.
+    """
+    import numpy as np
+    from tank_simulator.orchestration import run_simulation
+    from tank_simulator.collectors import DailyCollector
+    from tank_simulator.environment import SimulationEnvironment
+    preset = load_reference_preset()
+
+    def daily_means(dt: int) -> Dict[str, np.ndarray]:
+        runs = []
+        for seed in seeds:
+            env = SimulationEnvironment(days=days, config_dict=preset, seed=seed, start_time=START_TIME,
+                                        tank_id=TANK_ID, kernel_backend="auto", dt_minutes=dt)
+            runs.append(run_simulation(env, collector=DailyCollector()))
+        return {key: np.mean([[day[key] for day in run] for run in runs], axis=0) for key in DT_KEYS}
+
+    fine, coarse = daily_means(1), daily_means(dt_minutes)
+    return {key: float(np.max(np.abs(coarse[key] - fine[key]) / np.abs(fine[key]))) for key in DT_KEYS}
+
+@benchmark("dt_equivalence")
+def bench_dt_equivalence(out_dir: str) -> Dict[str, Any]:
+    """dt_minutes=15 frente a 1 (la tolerancia se comprueba en tests/test_dt_equivalence.py)."""
+    start = time.perf_counter()
+    errors = dt_relative_errors()
+    return {"wall_s": time.perf_counter() - start, "max_rel_error": max(errors.values())}
+
+@benchmark("sweep_grid")
+def bench_sweep_grid(out_dir: str) -> Dict[str, Any]:
+    from tank_simulator.sweep import run_sweep, expand_grid
+    points = expand_grid({"V": [800.0, 1000.0, 1200.0, 1400.0], "initial_N": [8000, 12000]})
+    start = time.perf_counter()
+    results = run_sweep(load_reference_preset(), points, days=10, seed=SEED, start_time=START_TIME, tank_id=TANK_ID)
+    wall = time.perf_counter() - start
+    return {"wall_s": wall, "points": len(results), "points_per_s": len(results) / wall, "workers": os.cpu_count()}
+
+
+# --- pipeline del worker ---
+
+@benchmark("export_csv")
+def bench_export_csv(out_dir: str) -> Dict[str, Any]:
+    from common.export_utils import write_csv
+    from common.models import ExportOptions
+    _, df = reference_dataframe(30)
+    path = os.path.join(out_dir, "reference.csv")
+    start = time.perf_counter()
+    with open(path, "wb") as f:
+        write_csv(df, f, ExportOptions())
+    return {"wall_s": time.perf_counter() - start, "rows": len(df)}
+
+@benchmark("export_parquet")
+def bench_export_parquet(out_dir: str) -> Dict[str, Any]:
+    from common.export_utils import write_parquet
+    env, df = reference_dataframe(30)
+    start = time.perf_counter()
+    write_parquet(df, os.path.join(out_dir, "reference.parquet"), env.steps_per_day)
+    return {"wall_s": time.perf_counter() - start, "rows": len(df)}
+
+@benchmark("generate_chunks")
+def bench_generate_chunks(out_dir: str) -> Dict[str, Any]:
+    from common.simulation_utils import generate_chunks
+    _, df = reference_dataframe(30)
+    start = time.perf_counter()
+    generate_chunks(df, "bench", TANK_ID, out_dir, chunk_size=10000)
+    return {"wall_s": time.perf_counter() - start, "rows": len(df)}
+
+@benchmark("chunks_json_parity")
+def bench_chunks_json_parity(out_dir: str) -> Dict[str, Any]:
+    """json_records (pyarrow.compute) frente a DataFrame.to_json(orient="records"), incluidos NaN y enteros exactos."""
+    import pyarrow as pa
+    from common.export_utils import json_records, iso_timestamps
+    _, df = reference_dataframe(2)
+    df = df.assign(oxygen_mgL=df["oxygen_mgL"].where(df.index % 97 != 0), biomass_kg=df["biomass_kg"].round())
+    start = time.perf_counter()
+    encoded = json_records(pa.Table.from_pandas(df, preserve_index=False))
+    wall = time.perf_counter() - start
+    expected = df.assign(timestamp_utc=iso_timestamps(df["timestamp_utc"].to_numpy())).to_json(orient="records")
+    if json.loads(encoded) != json.loads(expected):
+        raise RuntimeError("json_records no coincide con DataFrame.to_json(orient='records')")
+    return {"wall_s": wall, "rows": len(df), "bytes": len(encoded)}
+
+@benchmark("export_with_chunks")
+def bench_export_with_chunks(out_dir: str) -> Dict[str, Any]:
+    """Exportación CSV/Parquet + chunks: en serie frente a solapadas (como simulate_tank_data)."""
+    from concurrent.futures import ThreadPoolExecutor
+    from common.simulation_utils import export_dataframe, generate_chunks
+    env, df = reference_dataframe(30)
+    start = time.perf_counter()
+    export_dataframe(df, env, os.path.join(out_dir, "serial"), "bench")
+    generate_chunks(df, "bench", TANK_ID, os.path.join(out_dir, "serial"))
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=1) as background:
+        chunking = background.submit(generate_chunks, df, "bench", TANK_ID, os.path.join(out_dir, "overlap"))
+        export_dataframe(df, env, os.path.join(out_dir, "overlap"), "bench")
+        chunking.result()
+    overlapped = time.perf_counter() - start
+    return {"wall_s": overlapped, "serial_s": serial, "rows": len(df)}
+
+@benchmark("memory_budget_365d")
+def bench_memory_budget_365d(out_dir: str) -> Dict[str, Any]:
+    """simulate_tank_data de 365 días con presupuesto de memoria (el tope se comprueba en tests/test_streaming_export.py)."""
+    from common.simulation_utils import simulate_tank_data, CHUNK_SIZE
+    budget_mb = 200
+    start = time.perf_counter()
+    _, paths = simulate_tank_data(
+        365, load_reference_preset(), SEED, START_TIME, out_dir, TANK_ID, "bench",
+        chunk_size=CHUNK_SIZE, memory_budget_bytes=budget_mb * 2**20
+    )
+    wall = time.perf_counter() - start
+    return {"wall_s": wall, "rows": paths["rows"], "budget_mb": budget_mb, "minutes_per_s": paths["rows"] / wall}
+
+@benchmark("compact_output")
+def bench_compact_output(out_dir: str) -> Dict[str, Any]:
+    """
+    Perfil precision="compact" frente a "full": memoria del DataFrame y
+    tamaño de los archivos. Salvo biomass_kg, el CSV debe ser idéntico (los
+    valores ya vienen redondeados a <= 7 dígitos significativos).
+    """
+    import io
+    from common.simulation_utils import export_dataframe, generate_chunks
+    from common.export_utils import apply_precision, write_csv
+    from common.models import ExportOptions
+    env, df = reference_dataframe(30)
+    metrics = {"rows": len(df)}
+    start = time.perf_counter()
+    for precision in ("full", "compact"):
+        options = ExportOptions(precision=precision)
+        frame = apply_precision(df, options)
+        folder = os.path.join(out_dir, precision)
+        paths = export_dataframe(frame, env, folder, "bench", options=options)
+        generate_chunks(frame, "bench", TANK_ID, folder)
+        metrics[f"{precision}_memory_mb"] = frame.memory_usage(deep=True).sum() / 2**20
+        metrics[f"{precision}_parquet_kb"] = os.path.getsize(paths["parquet"]) / 1024
+        metrics[f"{precision}_files_mb"] = folder_size(folder) / 2**20
+    metrics["wall_s"] = time.perf_counter() - start
+
+    texts = []
+    for frame in (df, apply_precision(df, ExportOptions(precision="compact"))):
+        buffer = io.BytesIO()
+        write_csv(frame.drop(columns=["biomass_kg"]), buffer, ExportOptions())
+        texts.append(buffer.getvalue())
+    if texts[0] != texts[1]:
+        raise RuntimeError("El CSV compacto difiere del completo fuera de biomass_kg")
+    return metrics
+
+@benchmark("run_summary_sidecars")
+def bench_run_summary_sidecars(out_dir: str) -> Dict[str, Any]:
+    """
+    stats.json/events.json de 30 días: acumulados por bloques desalineados
+    con los episodios deben coincidir con el DataFrame entero, y los
+    percentiles con np.percentile. Reporta su tamaño frente al de los chunks.
+    """
+    import numpy as np
+    from common.run_summary import RunSummary, STATS_COLUMNS, STATS_PERCENTILES
+    from common.simulation_utils import generate_chunks
+    env, df = reference_dataframe(30)
+    # Umbral por encima de la mediana de O2: episodios largos que cruzan bloques
+    threshold = float(df["oxygen_mgL"].median())
+    start = time.perf_counter()
+    whole = RunSummary(env.start_time, env.dt_minutes, threshold)
+    whole.add(df)
+    wall = time.perf_counter() - start
+    blocks = RunSummary(env.start_time, env.dt_minutes, threshold)
+    for offset in range(0, len(df), 997):
+        blocks.add(df.iloc[offset:offset + 997])
+    if whole.stats() != blocks.stats() or whole.events() != blocks.events():
+        raise RuntimeError("RunSummary por bloques no coincide con el cálculo sobre el DataFrame entero")
+    for name in STATS_COLUMNS:
+        stats = whole.stats()["columns"][name]
+        expected = np.percentile(df[name].to_numpy(), STATS_PERCENTILES)
+        if not np.allclose([stats[f"p{q}"] for q in STATS_PERCENTILES], expected, atol=1e-6):
+            raise RuntimeError(f"Percentiles de {name} no coinciden con np.percentile")
+    if sum(episode["minutes"] for episode in whole.events()["hypoxia"]["episodes"]) != int((df["oxygen_mgL"] < threshold).sum()):
+        raise RuntimeError("Los episodios de hipoxia no cubren los minutos bajo el umbral")
+
+    cache_folder = generate_chunks(df, "bench", TANK_ID, out_dir, summary=RunSummary.for_env(env))
+    sidecars = sum(os.path.getsize(os.path.join(cache_folder, name)) for name in ("stats.json", "events.json"))
+    return {
+        "wall_s": wall, "rows": len(df), "hypoxia_episodes": len(whole.events()["hypoxia"]["episodes"]),
+        "sidecar_kb": sidecars / 1024, "chunks_mb": (folder_size(cache_folder) - sidecars) / 2**20
+    }
+
+@benchmark("serialization_codec")
+def bench_serialization_codec(out_dir: str) -> Dict[str, Any]:
+    """
+    Coste por mensaje (µs) de codificar/decodificar eventos de progreso con
+    cada backend JSON disponible, y de decodificar + validar un mensaje de
+    simulación: json.loads + SimulationPayload(**data) frente a pydantic-core.
+    """
+    from common.serialization import load_codec, JSON_BACKENDS, JSON_BACKEND
+    from common.models import SimulationPayload, parse_job_message
+    repeats = 2000
+    event = {"id": "bench-job", "status": "running", "progress": 42.5, "url": "http://cache/bench/metadata"}
+    payload = {"days": 30, "seed": SEED, "start_time": START_TIME.isoformat(), "tank_id": TANK_ID,
+               "job_id": "bench-job", "preset": load_reference_preset()}
+    body = json.dumps({"data": payload, "published_at": time.time()}).encode()
+
+    def per_op_us(fn) -> float:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+        return (time.perf_counter() - start) / repeats * 1e6
+
+    metrics = {"backend": JSON_BACKEND}
+    for name in JSON_BACKENDS:
+        try:
+            _, dumps, loads = load_codec(name)
+        except ImportError:
+            continue
+        encoded = dumps(event)
+        metrics[f"{name}_encode_us"] = per_op_us(lambda: dumps(event))
+        metrics[f"{name}_decode_us"] = per_op_us(lambda: loads(encoded))
+        metrics[f"{name}_payload_decode_us"] = per_op_us(lambda: loads(body))
+
+    metrics["payload_validate_dict_us"] = per_op_us(lambda: SimulationPayload(**json.loads(body)["data"]))
+    start = time.perf_counter()
+    metrics["payload_validate_json_us"] = per_op_us(lambda: parse_job_message(body))
+    metrics["wall_s"] = time.perf_counter() - start
+    return metrics
+
+@benchmark("cache_server_chunks")
+def bench_cache_server_chunks(out_dir: str) -> Dict[str, Any]:
+    from common.simulation_utils import generate_chunks
+    _, df = reference_dataframe(30)
+    cache_folder = generate_chunks(df, "bench", TANK_ID, out_dir, chunk_size=10000)
+    with open(os.path.join(cache_folder, "index.json")) as f:
+        n_chunks = json.load(f)["chunks"]
+
+    os.environ["SIMULATIONS_OUT_DIR"] = out_dir
+    import cache_server
+    cache_server.BASE_PATH = out_dir
+    from fastapi.testclient import TestClient
+    client = TestClient(cache_server.app)
+    client.get("/health").raise_for_status()  # warm-up: arranque de la app fuera de la medición
+
+    served = 0
+    start = time.perf_counter()
+    client.get("/cache/bench/metadata").raise_for_status()
+    for n in range(1, n_chunks + 1):
+        response = client.get(f"/cache/bench/chunk/{n}")
+        response.raise_for_status()
+        served += len(response.content)
+    wall = time.perf_counter() - start
+    return {"wall_s": wall, "chunks": n_chunks, "bytes_served": served, "mb_per_s": served / wall / 1e6}
+
+
+# --- arranque en frío ---
+
+UPLOADER_MODULES = (
+    "common.common_imports", "common.minio_utils", "common.redis_utils", "common.rabbit_utils",
+    "common.logger", "common.job_status", "common.metrics", "tank_simulator.instrumentation",
+    "common.storage_lifecycle", "common.serialization",
+)
+SIMULATION_CORE_MODULES = ("tank_simulator.environment", "tank_simulator.orchestration")
+
+def cold_import(modules, forbidden=()) -> Dict[str, Any]:
+    """
+    Importa `modules` con `python -X importtime` en un intérprete limpio (los
+    workers abren conexiones al importarse, por eso se miden sus dependencias).
+    import_ms es la suma del acumulado de cada módulo pedido (sin el arranque
+    del intérprete); loaded, los módulos de `forbidden` que se cargaron.
+    """
+    import subprocess
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, "libraries", "tank_simulator")]))
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {name}" for name in modules)],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stderr
+
+    total_us, loaded = 0, []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # cabecera
+        if not name.startswith("  ") and name.strip() in modules:
+            total_us += int(cumulative)  # nivel superior (1 espacio de sangría)
+        if name.strip() in forbidden:
+            loaded.append(name.strip())
+    return {"import_ms": total_us / 1000, "loaded": loaded}
+
+@benchmark("import_uploader")
+def bench_import_uploader(out_dir: str) -> Dict[str, Any]:
+    import_ms = cold_import(UPLOADER_MODULES)["import_ms"]
+    return {"wall_s": import_ms / 1000, "import_ms": import_ms}
+
+@benchmark("import_simulation_core")
+def bench_import_simulation_core(out_dir: str) -> Dict[str, Any]:
+    import_ms = cold_import(SIMULATION_CORE_MODULES)["import_ms"]
+    return {"wall_s": import_ms / 1000, "import_ms": import_ms}
@@ -0,0 +1,152 @@
+"""
+Generador de carga contra un RabbitMQ local: compara la latencia de jobs
+cortos (interactivos) detrás de jobs largos (batch) con una cola FIFO única
+frente a carriles corto/largo con prioridad y prefetch por carril.
+
+Los consumidores son procesos locales que simulan con tank_simulator (modo
+KPIs, sin Redis ni MinIO), así que solo hace falta RabbitMQ:
+
+    docker run -d -p 5672:5672 rabbitmq:3
+    python -m benchmarks.load_generator --short 30 --long 3 --workers 2
+
+Con --workers W, el modo 'fifo' usa W consumidores sobre una cola y el modo
+'lanes' reparte los mismos W entre carriles (al menos uno por carril).
+Se publican primero los jobs largos (peor caso para FIFO).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import multiprocessing as mp
+from typing import Dict, List
+
+import pika
+
+from benchmarks.cases import load_reference_preset, START_TIME, SEED
+from common.models import SimulationPayload
+from common.rabbit_utils import declare_queue
+from common.scheduling import estimate_job_cost, job_lane, job_priority
+
+QUEUE_PREFIX = "loadgen"
+MAX_PRIORITY = 10
+
+
+def build_payload(index: int, days: int) -> SimulationPayload:
+    return SimulationPayload(
+        days=days, seed=SEED + index, start_time=START_TIME, tank_id=1,
+        job_id=f"loadgen-{index}", preset=load_reference_preset(), output_mode="kpis",
+    )
+
+def consume(url: str, queue_name: str, prefetch: int, results: mp.Queue, kernel_backend: str):
+    """Proceso consumidor: simula cada job y reporta (job_id, días, latencia desde la publicación)."""
+    from tank_simulator.environment import SimulationEnvironment
+    from tank_simulator.orchestration import run_simulation
+    from tank_simulator.collectors import KpiCollector
+
+    connection = pika.BlockingConnection(pika.URLParameters(url))
+    channel = connection.channel()
+    channel.basic_qos(prefetch_count=prefetch)
+
+    def on_message(ch, method, properties, body):
+        data = json.loads(body)
+        if data.get("stop"):
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            ch.stop_consuming()
+            return
+        payload = SimulationPayload(**data["data"])
+        env = SimulationEnvironment(
+            days=payload.days, config_dict=payload.preset.model_dump(), seed=payload.seed,
+            start_time=payload.start_time, tank_id=payload.tank_id, kernel_backend=kernel_backend,
+        )
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            run_simulation(env, collector=KpiCollector())
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        results.put((payload.job_id, payload.days, time.time() - data["published_at"]))
+
+    channel.basic_consume(queue=queue_name, on_message_callback=on_message)
+    channel.start_consuming()
+    connection.close()
+
+def run_scenario(url: str, mode: str, jobs: List[SimulationPayload], workers: int, kernel_backend: str) -> Dict[str, List[float]]:
+    connection = pika.BlockingConnection(pika.URLParameters(url))
+    channel = connection.channel()
+    if mode == "fifo":
+        queues = {f"{QUEUE_PREFIX}.fifo": (workers, 1)}
+        max_priority = 0
+    else:
+        long_workers = max(1, workers // 3)
+        queues = {f"{QUEUE_PREFIX}.short": (max(1, workers - long_workers), 4), f"{QUEUE_PREFIX}.long": (long_workers, 1)}
+        max_priority = MAX_PRIORITY
+    for queue_name in queues:
+        channel.queue_delete(queue=queue_name)
+        declare_queue(channel, queue_name, max_priority)
+
+    results = mp.Queue()
+    consumers = [
+        mp.Process(target=consume, args=(url, queue_name, prefetch, results, kernel_backend))
+        for queue_name, (count, prefetch) in queues.items() for _ in range(count)
+    ]
+    for process in consumers:
+        process.start()
+
+    for payload in jobs:
+        cost = estimate_job_cost(payload)
+        if mode == "fifo":
+            queue_name, priority = f"{QUEUE_PREFIX}.fifo", 0
+        else:
+            queue_name, priority = f"{QUEUE_PREFIX}.{job_lane(cost)}", job_priority(cost, MAX_PRIORITY)
+        body = json.dumps({"data": payload.model_dump(mode="json"), "published_at": time.time()})
+        channel.basic_publish(exchange="", routing_key=queue_name, body=body,
+                              properties=pika.BasicProperties(priority=priority))
+
+    lanes = {payload.job_id: job_lane(estimate_job_cost(payload)) for payload in jobs}
+    latencies: Dict[str, List[float]] = {"short": [], "long": []}
+    for _ in jobs:
+        job_id, days, latency = results.get()
+        latencies[lanes[job_id]].append(latency)
+
+    for queue_name, (count, _) in queues.items():
+        for _ in range(count):
+            channel.basic_publish(exchange="", routing_key=queue_name, body=json.dumps({"stop": True}))
+    for process in consumers:
+        process.join()
+    for queue_name in queues:
+        channel.queue_delete(queue=queue_name)
+    connection.close()
+    return latencies
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] if ordered else float("nan")
+
+def main(argv=None) -> int:
+    from common.common_imports import URL_RABBIT
+    parser = argparse.ArgumentParser(description="Latencia de jobs cortos: cola FIFO vs carriles con prioridad")
+    parser.add_argument("--url", default=URL_RABBIT)
+    parser.add_argument("--short", type=int, default=30, help="Número de jobs cortos")
+    parser.add_argument("--long", type=int, default=3, help="Número de jobs largos")
+    parser.add_argument("--short-days", type=int, default=5)
+    parser.add_argument("--long-days", type=int, default=365)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--kernel-backend", default="auto")
+    parser.add_argument("--mode", choices=("fifo", "lanes", "both"), default="both")
+    args = parser.parse_args(argv)
+
+    jobs = [build_payload(i, args.long_days) for i in range(args.long)]
+    jobs += [build_payload(args.long + i, args.short_days) for i in range(args.short)]
+    modes = ("fifo", "lanes") if args.mode == "both" else (args.mode,)
+    for mode in modes:
+        start = time.time()
+        latencies = run_scenario(args.url, mode, jobs, args.workers, args.kernel_backend)
+        makespan = time.time() - start
+        print(f"{mode:<6} makespan={makespan:.1f}s  " + "  ".join(
+            f"{lane}: n={len(values)} p50={percentile(values, 0.5):.2f}s p95={percentile(values, 0.95):.2f}s"
+            for lane, values in latencies.items() if values
+        ))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
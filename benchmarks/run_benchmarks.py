@@ -0,0 +1,138 @@
+"""
+Harness de benchmarks (offline, preset de referencia incluido).
+
+Uso:
+    python -m benchmarks.run_benchmarks                      # todos los casos
+    python -m benchmarks.run_benchmarks -k run_simulation    # filtra por nombre
+    python -m benchmarks.run_benchmarks --save-baseline      # guarda baseline.json
+    python -m benchmarks.run_benchmarks --threshold 0.25     # falla si wall_s empeora >25%
+    python -m benchmarks.run_benchmarks --repeat 3           # se queda con la mejor repetición
+
+Cada caso corre en un subproceso propio para que el peak RSS sea el del caso.
+Un caso que lanza excepción (p. ej. un check de arranque en frío) cuenta como fallo.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+import contextlib
+from typing import Dict, Any, List, Optional
+
+from benchmarks.cases import CASES, ROOT, folder_size
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = 0.20
+
+
+def run_case_in_process(name: str, result_path: str):
+    """Ejecuta un caso y escribe sus métricas en result_path (modo subproceso)."""
+    out_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        # Los prints de la simulación no deben mezclarse con la salida del harness
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            metrics = CASES[name](out_dir)
+        metrics["bytes_written"] = folder_size(out_dir)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    # ru_maxrss está en KB en Linux
+    metrics["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with open(result_path, "w") as f:
+        json.dump(metrics, f)
+
+def run_case(name: str) -> Optional[Dict[str, Any]]:
+    """Métricas del caso, o None si el subproceso falló."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+        result_path = tmp.name
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run_benchmarks", "--case", name, "--result", result_path],
+            cwd=ROOT,
+        )
+        if completed.returncode != 0:
+            return None
+        with open(result_path) as f:
+            return json.load(f)
+    finally:
+        os.unlink(result_path)
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], threshold: float) -> List[str]:
+    """Devuelve la lista de casos cuyo wall_s empeoró más que el umbral."""
+    regressions = []
+    for name, metrics in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        ratio = metrics["wall_s"] / reference["wall_s"]
+        if ratio > 1.0 + threshold:
+            regressions.append(f"{name}: {reference['wall_s']:.3f}s -> {metrics['wall_s']:.3f}s (x{ratio:.2f})")
+    return regressions
+
+def format_metrics(metrics: Dict[str, Any]) -> str:
+    return "  ".join(
+        f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+        for key, value in metrics.items()
+    )
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de tank_simulator y del worker")
+    parser.add_argument("-k", dest="pattern", default="", help="Solo casos cuyo nombre contiene este texto")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--repeat", type=int, default=1, help="Repeticiones por caso (se usa la de menor wall_s)")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        run_case_in_process(args.case, args.result)
+        return 0
+
+    results = {}
+    failures = []
+    for name in CASES:
+        if args.pattern not in name:
+            continue
+        runs = [run_case(name) for _ in range(max(1, args.repeat))]
+        if any(metrics is None for metrics in runs):
+            failures.append(name)
+            print(f"{name:<24} FALLÓ")
+            continue
+        results[name] = min(runs, key=lambda metrics: metrics["wall_s"])
+        print(f"{name:<24} {format_metrics(results[name])}")
+
+    if failures:
+        print(f"Casos fallidos: {', '.join(failures)}")
+        return 1
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline guardado en {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Sin baseline para comparar (usa --save-baseline).")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    if regressions:
+        print(f"Regresiones (> {args.threshold:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("Sin regresiones respecto al baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,49 @@
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
+from prometheus_client import Counter, Gauge, make_asgi_app
 import os
+import asyncio
+from functools import lru_cache
+from common.storage_lifecycle import StorageManager, touch_job_folder
+from common.run_summary import STATS_FILE, EVENTS_FILE
+from common.common_imports import STORAGE_SWEEP_INTERVAL_S
+from common.logger import get_logger
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
+# ==== Métricas ====
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Peticiones al cache server por endpoint y resultado (hit/miss)",
+    ["endpoint", "result"]
+)
+CHUNK_BYTES_SERVED = Counter("cache_chunk_bytes_served_total", "Bytes de chunks servidos")
+SIDECAR_BYTES_SERVED = Counter("cache_sidecar_bytes_served_total", "Bytes de stats/events servidos desde memoria")
+STORAGE_BYTES = Gauge("storage_bytes", "Bytes en SIMULATIONS_OUT_DIR según el último manifiesto")
+STORAGE_EVICTED = Counter("storage_evicted_jobs_total", "Jobs expulsados del almacenamiento local", ["reason"])
+
+logger = get_logger("CacheServer")
 BASE_PATH = os.getenv("SIMULATIONS_OUT_DIR", "simulations_storage")
+SIDECAR_CACHE_ENTRIES = int(os.getenv("CACHE_SIDECAR_ENTRIES", "512"))
+
+storage = StorageManager(out_dir=BASE_PATH)
+
+async def storage_lifecycle_loop():
+    """Pasada de TTL/cuota cada STORAGE_SWEEP_INTERVAL_S, fuera del event loop."""
+    while True:
+        try:
+            manifest = await asyncio.to_thread(storage.enforce)
+            STORAGE_BYTES.set(manifest["total_bytes"])
+            for job in manifest["evicted"]:
+                STORAGE_EVICTED.labels(reason=job["reason"]).inc()
+        except Exception as e:
+            logger.error(f"[!] Error en la pasada de almacenamiento: {e}")
+        await asyncio.sleep(STORAGE_SWEEP_INTERVAL_S)
+
+@app.on_event("startup")
+async def start_storage_lifecycle():
+    if STORAGE_SWEEP_INTERVAL_S > 0:
+        app.state.storage_task = asyncio.create_task(storage_lifecycle_loop())
 
 def find_job_folder(job_id: str):
     for tank_folder in os.listdir(BASE_PATH):
@@ -18,8 +57,11 @@ def get_metadata(job_id: str):
     
     folder = find_job_folder(job_id)
     if not folder:
+        CACHE_REQUESTS.labels(endpoint="metadata", result="miss").inc()
         raise HTTPException(404, "job not found")
 
+    CACHE_REQUESTS.labels(endpoint="metadata", result="hit").inc()
+    touch_job_folder(folder)
     meta = os.path.join(folder, "index.json")
     return FileResponse(meta, media_type="application/json")
 
@@ -27,14 +69,58 @@ def get_metadata(job_id: str):
 def get_chunk(job_id: str, n: int):
     folder = find_job_folder(job_id)
     if not folder:
+        CACHE_REQUESTS.labels(endpoint="chunk", result="miss").inc()
         raise HTTPException(404, "job not found")
 
     chunk = os.path.join(folder, f"chunk_{n}.json")
     if not os.path.exists(chunk):
+        CACHE_REQUESTS.labels(endpoint="chunk", result="miss").inc()
         raise HTTPException(404, "chunk not found")
 
+    CACHE_REQUESTS.labels(endpoint="chunk", result="hit").inc()
+    touch_job_folder(folder)
+    CHUNK_BYTES_SERVED.inc(os.path.getsize(chunk))
     return FileResponse(chunk, media_type="application/json")
 
+@lru_cache(maxsize=SIDECAR_CACHE_ENTRIES)
+def load_sidecar(path: str, mtime_ns: int) -> bytes:
+    """Contenido de un stats.json/events.json; la clave incluye el mtime, así una reescritura no sirve datos viejos."""
+    with open(path, "rb") as f:
+        return f.read()
+
+def serve_sidecar(job_id: str, name: str, endpoint: str) -> Response:
+    folder = find_job_folder(job_id)
+    path = os.path.join(folder, name) if folder else None
+    try:
+        content = load_sidecar(path, os.stat(path).st_mtime_ns) if path else None
+    except FileNotFoundError:
+        content = None  # job anterior a los sidecars o expulsado entre stat y open
+    if content is None:
+        CACHE_REQUESTS.labels(endpoint=endpoint, result="miss").inc()
+        raise HTTPException(404, f"{endpoint} not found")
+
+    CACHE_REQUESTS.labels(endpoint=endpoint, result="hit").inc()
+    touch_job_folder(folder)
+    SIDECAR_BYTES_SERVED.inc(len(content))
+    return Response(content, media_type="application/json")
+
+@app.get("/cache/{job_id}/stats")
+def get_stats(job_id: str):
+    """min/max/media/percentiles de las columnas principales de toda la corrida (run_summary)."""
+    return serve_sidecar(job_id, STATS_FILE, "stats")
+
+@app.get("/cache/{job_id}/events")
+def get_events(job_id: str):
+    """Recambios, picos de alimentación, siembras y episodios de hipoxia de la corrida."""
+    return serve_sidecar(job_id, EVENTS_FILE, "events")
+
+@app.get("/storage/manifest")
+def get_storage_manifest():
+    manifest = storage.read_manifest()
+    if manifest is None:
+        raise HTTPException(404, "manifest not generated yet")
+    return manifest
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -1,23 +1,42 @@
 # ==== Librerías base ====
 import os
 import json
-import numpy as np
-import pandas as pd
-import pika
 import time
+import importlib
 
 # ==== Fechas y tiempo ====
 from datetime import datetime, timedelta
 
 # ==== Tipos genéricos ====
-from typing import List, Dict, Any, Set, Callable, Optional, Tuple
+from typing import List, Dict, Any, Set, Callable, Optional, Tuple, Union
 
 # ==== Utilidades ====
 from functools import partial
 
-# ==== Modelado y validación ====
+# ==== Modelado ====
 from dataclasses import dataclass
-from pydantic import BaseModel, ValidationError
+
+# ==== Importaciones perezosas ====
+# numpy, pandas, pika y pydantic se cargan solo al acceder al atributo
+# (common_imports.np, etc.). No están en __all__: un star-import los cargaría
+# todos y el uploader no necesita ninguno de los pesados para arrancar.
+_LAZY_ATTRIBUTES = {
+    "np": ("numpy", None),
+    "pd": ("pandas", None),
+    "pika": ("pika", None),
+    "BaseModel": ("pydantic", "BaseModel"),
+    "ValidationError": ("pydantic", "ValidationError"),
+}
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY_ATTRIBUTES[name]
+    value = importlib.import_module(module_name)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
 
 
 # ==== Rabbit Config ====
@@ -29,6 +48,17 @@ UPLOAD_QUEUE = os.environ.get("RABBITMQ_UPLOAD_QUEUE", "minio_upload_queue")
 COLA_NOMBRE = os.environ.get("RABBITMQ_SIMULATIONS_QUEUE", "simulations_queue")
 URL_RABBIT = f"amqp://{RABBIT_USER}:{RABBIT_PASS}@{RABBIT_HOST}:{RABBIT_PORT}"
 
+# ==== Carriles de simulación (corto = interactivo, largo = batch) ====
+LONG_QUEUE = os.environ.get("RABBITMQ_SIMULATIONS_LONG_QUEUE", f"{COLA_NOMBRE}_long")
+LANE_QUEUES = {"short": COLA_NOMBRE, "long": LONG_QUEUE}
+RABBITMQ_MAX_PRIORITY = int(os.environ.get("RABBITMQ_MAX_PRIORITY", "0"))  # 0 = colas sin prioridad
+LANE_PREFETCH = {
+    "short": int(os.environ.get("RABBITMQ_PREFETCH_SHORT", "4")),
+    "long": int(os.environ.get("RABBITMQ_PREFETCH_LONG", "1")),
+}
+SIMULATION_LANES = [lane.strip() for lane in os.environ.get("SIMULATION_LANES", "short,long").split(",") if lane.strip()]
+LONG_LANE_MIN_DAYS = float(os.environ.get("SIMULATIONS_LONG_LANE_MIN_DAYS", "90"))  # coste en días-tanque
+
 # ==== Redis Config ====
 REDIS_HOST  =  os.environ.get("REDIS_HOST", "guest")
 REDIS_PORT  =  os.environ.get("REDIS_PORT", "guest")
@@ -47,29 +77,53 @@ MINIO_URL = os.getenv("MINIO_URL", "localhost:9000")
 MINIO_ACCESS = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
 MINIO_SECRET = os.getenv("MINIO_SECRET_KEY", "minioadmin")
 MINIO_BUCKET = os.getenv("MINIO_BUCKET", "simulations")
+MINIO_PART_SIZE = int(os.getenv("MINIO_PART_SIZE", str(10 * 1024 * 1024)))
+DIRECT_UPLOAD = os.getenv("SIMULATIONS_DIRECT_UPLOAD", "false").lower() in ("1", "true", "yes")
+
+# ==== Deduplicación de jobs idénticos ====
+DEDUP_ENABLED = os.getenv("SIMULATIONS_DEDUP", "true").lower() in ("1", "true", "yes")
+DEDUP_WINDOW_S = int(os.getenv("SIMULATIONS_DEDUP_WINDOW_S", "30"))  # reutilización tras terminar el líder
+DEDUP_LOCK_TTL_S = int(os.getenv("SIMULATIONS_DEDUP_LOCK_TTL_S", "1800"))  # vida máxima del lock del líder
+DEDUP_POLL_S = float(os.getenv("SIMULATIONS_DEDUP_POLL_S", "0.5"))
+DEDUP_MAX_WAIT_S = float(os.getenv("SIMULATIONS_DEDUP_MAX_WAIT_S", "60"))  # espera máxima de un seguidor
+
+# ==== Cancelación y plazos de jobs ====
+JOB_TIMEOUT_S = float(os.getenv("SIMULATIONS_JOB_TIMEOUT_S", "0"))  # 0 = sin plazo por defecto
+CANCEL_CHECK_INTERVAL_S = float(os.getenv("SIMULATIONS_CANCEL_CHECK_INTERVAL_S", "1.0"))
+
+# ==== Memoria por job ====
+MEMORY_BUDGET_MB = int(os.getenv("SIMULATIONS_MEMORY_BUDGET_MB", "0"))  # 0 = sin presupuesto (todo en memoria)
+
+# ==== Ciclo de vida del almacenamiento local ====
+STORAGE_TTL_S = float(os.getenv("STORAGE_TTL_S", str(7 * 86400)))  # sin accesos en este tiempo -> se borra (0 = sin TTL)
+STORAGE_QUOTA_BYTES = int(os.getenv("STORAGE_QUOTA_BYTES", "0"))  # 0 = sin cuota
+STORAGE_KEEP_HOT = os.getenv("STORAGE_KEEP_HOT", "true").lower() in ("1", "true", "yes")  # conservar chunks tras subir
+STORAGE_CLEANUP_AFTER_UPLOAD = os.getenv("STORAGE_CLEANUP_AFTER_UPLOAD", "true").lower() in ("1", "true", "yes")
+STORAGE_MIN_AGE_S = float(os.getenv("STORAGE_MIN_AGE_S", "300"))
+STORAGE_SWEEP_INTERVAL_S = float(os.getenv("STORAGE_SWEEP_INTERVAL_S", "300"))
 
 __all__ = [
     # Librerías base
-    "os", "json", "np", "pd",
+    "os", "json",
 
     # Tiempo
     "datetime", "timedelta", "time",
 
     # Tipado
-    "List", "Dict", "Any", "Set", "Callable", "Optional", "Tuple", "BaseModel", "ValidationError",
+    "List", "Dict", "Any", "Set", "Callable", "Optional", "Tuple", "Union",
 
     # Utilidades
     "partial",
 
     # Modelado
-    "dataclass", "BaseModel", "ValidationError",
-
-    #Conexiones
-    "pika",
+    "dataclass",
 
     # Configuración RABBIT
     "RABBIT_USER", "RABBIT_PASS", "RABBIT_HOST", "RABBIT_PORT", "COLA_NOMBRE", "URL_RABBIT", "UPLOAD_QUEUE",
 
+    # Carriles de simulación
+    "LONG_QUEUE", "LANE_QUEUES", "RABBITMQ_MAX_PRIORITY", "LANE_PREFETCH", "SIMULATION_LANES", "LONG_LANE_MIN_DAYS",
+
     #Configuracion REDIS
     "REDIS_HOST", "REDIS_PORT", "REDIS_URL", "REDIS_SIMULATION_CHANNEL", "REDIS_SIMULATION_NAMESPACE", "REDIS_SIMULATION_EVENT",
 
@@ -77,6 +131,19 @@ __all__ = [
     "SIMULATIONS_OUT_DIR", "CACHE_SERVER_URL",
 
     #Simulations Upload
-    "MINIO_URL", "MINIO_ACCESS", "MINIO_SECRET", "MINIO_BUCKET"
+    "MINIO_URL", "MINIO_ACCESS", "MINIO_SECRET", "MINIO_BUCKET", "MINIO_PART_SIZE", "DIRECT_UPLOAD",
+
+    #Deduplicación de jobs
+    "DEDUP_ENABLED", "DEDUP_WINDOW_S", "DEDUP_LOCK_TTL_S", "DEDUP_POLL_S", "DEDUP_MAX_WAIT_S",
+
+    #Cancelación y plazos
+    "JOB_TIMEOUT_S", "CANCEL_CHECK_INTERVAL_S",
+
+    #Memoria por job
+    "MEMORY_BUDGET_MB",
+
+    #Almacenamiento local
+    "STORAGE_TTL_S", "STORAGE_QUOTA_BYTES", "STORAGE_KEEP_HOT", "STORAGE_CLEANUP_AFTER_UPLOAD",
+    "STORAGE_MIN_AGE_S", "STORAGE_SWEEP_INTERVAL_S"
 
 ]
\ No newline at end of file
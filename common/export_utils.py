@@ -0,0 +1,282 @@
+import io
+import os
+import json
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator, Tuple
+from common.models import ExportOptions
+
+# ==== Opciones de salida CSV ====
+CSV_EXTENSIONS = {None: ".csv", "gzip": ".csv.gz", "zstd": ".csv.zst"}
+PARTITION_MINUTES = {"day": 1440, "week": 7 * 1440}
+CSV_BLOCK_ROWS = int(os.getenv("CSV_BLOCK_ROWS", "100000"))
+CSV_WRITER_THREADS = int(os.getenv("CSV_WRITER_THREADS", str(min(4, os.cpu_count() or 1))))
+JSON_WRITER_THREADS = int(os.getenv("JSON_WRITER_THREADS", str(min(4, os.cpu_count() or 1))))
+
+
+# ==== Timestamps ====
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+UTC_OFFSET = "+00:00"
+
+
+def minute_timestamps(start_time: datetime, minute_index, dt_minutes: int = 1):
+    """
+    Timestamps (datetime64[s] en UTC) de cada fila, derivados en bloque
+    de start_time + (minute_index + dt_minutes) minutos (fin del paso).
+    Si start_time tiene zona, el resultado lleva zona UTC y los CSV/JSON
+    escriben el offset ("+00:00", como datetime.isoformat()); si no, sin zona.
+    """
+    start = pd.Timestamp(start_time)
+    aware = start.tzinfo is not None
+    if aware:
+        start = start.tz_convert("UTC").tz_localize(None)
+    offsets = (np.asarray(minute_index, dtype=np.int64) + dt_minutes).astype("timedelta64[m]")
+    values = np.datetime64(start.to_datetime64(), "s") + offsets
+    return pd.DatetimeIndex(values).tz_localize("UTC") if aware else values
+
+def iso_format(aware: bool) -> str:
+    """Formato strftime de timestamp_utc en CSV/JSON (con offset si la columna tiene zona)."""
+    return ISO_FORMAT + UTC_OFFSET if aware else ISO_FORMAT
+
+def iso_timestamps(values) -> np.ndarray:
+    """Formatea timestamps a ISO-8601 en bloque (solo para CSV/JSON)."""
+    values = pd.DatetimeIndex(values)
+    aware = values.tz is not None
+    if aware:
+        values = values.tz_convert("UTC").tz_localize(None)
+    text = np.datetime_as_string(values.to_numpy(dtype="datetime64[s]"), unit="s")
+    return np.char.add(text, UTC_OFFSET) if aware else text
+
+# ==== Esquema Parquet ====
+# Los valores ya vienen redondeados a 3-6 decimales en simulation_step: float32
+# los representa sin pérdida visible. biomass_kg puede superar los 7 dígitos
+# significativos, así que se mantiene en float64.
+PARQUET_SCHEMA = pa.schema([
+    ("timestamp_utc", pa.timestamp("s", tz="UTC")),
+    ("tank_id", pa.int32()),
+    ("minute_index", pa.int32()),
+    ("temperature_C", pa.float32()),
+    ("salinity_ppt", pa.float32()),
+    ("oxygen_mgL", pa.float32()),
+    ("pH", pa.float32()),
+    ("feed_kg_min", pa.float32()),
+    ("density_shrimp_L", pa.float32()),
+    ("survivors", pa.int32()),
+    ("deaths", pa.int32()),
+    ("current_weight_g", pa.float32()),
+    ("biomass_kg", pa.float64()),
+    ("waterchange", pa.bool_()),
+    ("feed_spike", pa.bool_()),
+    ("stock_add", pa.int32()),
+])
+# Perfil compacto (ExportOptions.precision="compact"): todo float32/int32,
+# también biomass_kg, que pierde los dígitos por encima de ~7 significativos.
+COMPACT_SCHEMA = pa.schema([
+    field.with_type(pa.float32()) if pa.types.is_floating(field.type) else field for field in PARQUET_SCHEMA
+])
+COMPACT_DTYPES = {field.name: np.dtype(field.type.to_pandas_dtype()) for field in COMPACT_SCHEMA if field.name != "timestamp_utc"}
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+PARQUET_COMPRESSION_LEVEL = int(os.getenv("PARQUET_COMPRESSION_LEVEL", "3"))
+PARQUET_DICTIONARY_COLUMNS = ["tank_id", "deaths", "stock_add"]
+PARQUET_DELTA_COLUMNS = {"minute_index": "DELTA_BINARY_PACKED", "survivors": "DELTA_BINARY_PACKED"}
+
+
+def output_schema(options: ExportOptions = None) -> pa.Schema:
+    return COMPACT_SCHEMA if options is not None and options.precision == "compact" else PARQUET_SCHEMA
+
+def compact_columns(data):
+    """
+    Pasa las columnas numéricas de salida a float32/int32 (DataFrame o dict de
+    columnas numpy); las que ya tienen ese tipo no se copian.
+    """
+    casts = {name: dtype for name, dtype in COMPACT_DTYPES.items() if name in data and data[name].dtype != dtype}
+    if not casts:
+        return data
+    if isinstance(data, pd.DataFrame):
+        return data.astype(casts)
+    return {name: values.astype(casts[name]) if name in casts else values for name, values in data.items()}
+
+def apply_precision(data, options: ExportOptions = None):
+    return compact_columns(data) if options is not None and options.precision == "compact" else data
+
+def to_parquet_table(df: pd.DataFrame, schema: pa.Schema = PARQUET_SCHEMA) -> pa.Table:
+    """Convierte el DataFrame de resultados al esquema Arrow tipado."""
+    df = df.copy(deep=False)
+    df["timestamp_utc"] = pd.to_datetime(df["timestamp_utc"], utc=True)
+    schema = pa.schema([field for field in schema if field.name in df.columns])
+    return pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+def open_parquet_writer(where, schema: pa.Schema) -> pq.ParquetWriter:
+    """
+    Writer Parquet con zstd, estadísticas y page index, para que los lectores
+    que filtran por fecha puedan saltarse row groups. Admite varias
+    write_table() (exportación incremental).
+    """
+    return pq.ParquetWriter(
+        where,
+        schema,
+        compression=PARQUET_COMPRESSION,
+        compression_level=PARQUET_COMPRESSION_LEVEL,
+        use_dictionary=[c for c in PARQUET_DICTIONARY_COLUMNS if c in schema.names],
+        column_encoding={c: e for c, e in PARQUET_DELTA_COLUMNS.items() if c in schema.names},
+        write_statistics=True,
+        write_page_index=True,
+        data_page_version="2.0",
+    )
+
+def write_parquet(df: pd.DataFrame, where, rows_per_group: int, schema: pa.Schema = PARQUET_SCHEMA):
+    """
+    Escribe el DataFrame completo en Parquet con row groups de `rows_per_group`
+    filas (env.steps_per_day: un row group por día simulado, sea cual sea dt).
+    """
+    table = to_parquet_table(df, schema)
+    with open_parquet_writer(where, table.schema) as writer:
+        writer.write_table(table, row_group_size=rows_per_group)
+
+def csv_extension(options: ExportOptions) -> str:
+    return CSV_EXTENSIONS[options.csv_compression]
+
+def iter_csv_partitions(df: pd.DataFrame, options: ExportOptions) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Devuelve (sufijo, sub-DataFrame) por cada partición diaria/semanal."""
+    if options.csv_partition == "none":
+        yield "", df
+        return
+    period = PARTITION_MINUTES[options.csv_partition]
+    keys = df["minute_index"] // period
+    for key, part in df.groupby(keys, sort=True):
+        yield f"_{options.csv_partition}{int(key) + 1:03d}", part
+
+class _BorrowedFile(io.RawIOBase):
+    """Vista de solo escritura sobre `f` cuyo close() no cierra `f` (es del llamador)."""
+    def __init__(self, f):
+        self._f = f
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        return self._f.write(data)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+def write_csv(df: pd.DataFrame, f, options: ExportOptions, header: bool = True):
+    """
+    Escribe `df` como CSV (opcionalmente comprimido) sobre el file-like binario
+    `f`. Con header=False se añade a un CSV ya empezado: comprimido, cada
+    llamada es un miembro gzip / frame zstd propio. `f` queda abierto.
+    """
+    if options.csv_engine == "pyarrow":
+        for block in _iter_csv_blocks(df, options.csv_compression, header):
+            f.write(block)
+        return
+    date_format = iso_format(any(isinstance(dtype, pd.DatetimeTZDtype) for dtype in df.dtypes))
+    if options.csv_compression:
+        out = pa.CompressedOutputStream(pa.PythonFile(_BorrowedFile(f), mode="w"), options.csv_compression)
+        df.to_csv(out, index=False, header=header, date_format=date_format)
+        out.close()
+    else:
+        df.to_csv(f, index=False, header=header, date_format=date_format)
+
+def _float_text(column) -> pa.ChunkedArray:
+    """Floats como texto al estilo de pandas: los enteros exactos salen como 1.0."""
+    text = pc.cast(column, pa.string())
+    has_point = pc.or_(pc.match_substring(text, "."), pc.match_substring(text, "e"))
+    return pc.if_else(has_point, text, pc.binary_join_element_wise(text, ".0", ""))
+
+def _csv_text_columns(table: pa.Table) -> pa.Table:
+    """
+    Pasa a texto las columnas que pyarrow formatea distinto que pandas.to_csv:
+    timestamps (ISO), bools (True/False) y floats (1.0). Difiere solo en los
+    floats < 1e-4, que salen en decimal (0.00005) y no en exponente (5e-05).
+    """
+    for index, field in enumerate(table.schema):
+        column = table.column(index)
+        if pa.types.is_timestamp(field.type):
+            text = pc.strftime(column, format=iso_format(field.type.tz is not None))
+        elif pa.types.is_boolean(field.type):
+            text = pc.if_else(column, "True", "False")
+        elif pa.types.is_floating(field.type):
+            text = _float_text(column)
+        else:
+            continue
+        table = table.set_column(index, field.name, text)
+    return table
+
+def _iter_csv_blocks(df: pd.DataFrame, compression, header: bool = True) -> Iterator[bytes]:
+    """
+    Codifica el CSV en bloques independientes en paralelo (pyarrow libera el GIL).
+    Cada bloque se comprime como un miembro/frame propio: la concatenación de
+    miembros gzip o frames zstd sigue siendo un archivo válido.
+    """
+    table = _csv_text_columns(pa.Table.from_pandas(df, preserve_index=False))
+    starts = list(range(0, max(table.num_rows, 1), CSV_BLOCK_ROWS))
+    # Cabecera sin comillas, como pandas (pyarrow 17 siempre las pone en la suya)
+    header_line = (",".join(table.column_names) + "\n").encode() if header else b""
+
+    def _encode(start: int) -> bytes:
+        buffer = pa.BufferOutputStream()
+        out = pa.CompressedOutputStream(buffer, compression) if compression else buffer
+        if start == 0 and header_line:
+            out.write(header_line)
+        pacsv.write_csv(
+            table.slice(start, CSV_BLOCK_ROWS),
+            out,
+            pacsv.WriteOptions(include_header=False, quoting_style="none")
+        )
+        if compression:
+            out.close()
+        return buffer.getvalue().to_pybytes()
+
+    if len(starts) == 1:
+        yield _encode(0)
+        return
+    with ThreadPoolExecutor(max_workers=CSV_WRITER_THREADS) as pool:
+        # map conserva el orden de los bloques
+        yield from pool.map(_encode, starts)
+
+
+# ==== JSON orient=records (chunks del cache server) ====
+def _json_values(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Literal JSON de cada valor de la columna, como strings de Arrow."""
+    kind = column.type
+    if pa.types.is_timestamp(kind):
+        # "YYYY-MM-DD HH:MM:SS" (en UTC) -> ISO con 'T' y el offset si tiene zona, como iso_timestamps
+        text = pc.cast(column.cast(pa.timestamp(kind.unit)), pa.string())
+        suffix = UTC_OFFSET + '"' if kind.tz is not None else '"'
+        values = pc.binary_join_element_wise('"', pc.binary_replace_slice(text, 10, 11, "T"), suffix, "")
+    elif pa.types.is_string(kind) or pa.types.is_large_string(kind):
+        escaped = pc.replace_substring(pc.replace_substring(column, "\\", "\\\\"), '"', '\\"')
+        values = pc.binary_join_element_wise('"', escaped, '"', "")
+    elif pa.types.is_floating(kind):
+        # Como pandas: NaN/inf como null
+        values = pc.if_else(pc.is_finite(column), _float_text(column), pa.scalar("null"))
+    else:
+        values = pc.cast(column, pa.string())  # enteros y bool ("true"/"false")
+    return pc.fill_null(values, "null")
+
+def json_records(table: pa.Table) -> bytes:
+    """
+    Codifica la tabla como JSON orient=records (el mismo contenido que
+    DataFrame.to_json(orient="records")) solo con kernels de pyarrow.compute:
+    liberan el GIL, así que varios chunks se codifican en paralelo en hilos.
+    """
+    if table.num_rows == 0:
+        return b"[]"
+    pieces = []
+    for i, name in enumerate(table.column_names):
+        pieces.append(("{" if i == 0 else ",") + json.dumps(name) + ":")
+        pieces.append(_json_values(table.column(i)))
+    pieces.append("}")
+    records = pc.binary_join_element_wise(*pieces, "").combine_chunks().cast(pa.large_string())
+    single_list = pa.LargeListArray.from_arrays(pa.array([0, len(records)], pa.int64()), records)
+    joined = pc.binary_join(single_list, pa.scalar(",", pa.large_string()))[0]
+    return b"[" + joined.as_buffer().to_pybytes() + b"]"
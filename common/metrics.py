@@ -0,0 +1,64 @@
+import os
+import time
+from typing import Optional
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from tank_simulator.instrumentation import StageTimer
+
+# ==== Métricas de los workers (registro por defecto de prometheus_client) ====
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+JOBS_TOTAL = Counter(
+    "worker_jobs_total", "Jobs procesados por resultado", ["worker", "status"]
+)
+SIMULATED_MINUTES_TOTAL = Counter(
+    "simulation_minutes_total", "Minutos simulados acumulados"
+)
+SIMULATION_MINUTES_PER_SECOND = Gauge(
+    "simulation_minutes_per_second", "Throughput del último job (minutos simulados / s de bucle)"
+)
+STAGE_SECONDS = Histogram(
+    "job_stage_seconds", "Duración de cada etapa del job", ["worker", "stage"], buckets=STAGE_BUCKETS
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "queue_wait_seconds", "Tiempo desde la publicación del mensaje hasta su consumo", ["queue"],
+    buckets=STAGE_BUCKETS
+)
+UPLOAD_BYTES_TOTAL = Counter(
+    "upload_bytes_total", "Bytes subidos a MinIO", ["artifact"]
+)
+UPLOAD_BYTES_PER_SECOND = Gauge(
+    "upload_bytes_per_second", "Throughput de la última subida", ["artifact"]
+)
+
+
+def start_metrics_server(default_port: int) -> int:
+    """Levanta el listener HTTP de /metrics (puerto METRICS_PORT o el por defecto)."""
+    port = int(os.getenv("METRICS_PORT", str(default_port)))
+    start_http_server(port)
+    return port
+
+def observe_stage_timer(worker: str, timer: StageTimer):
+    for stage, seconds in timer.durations.items():
+        STAGE_SECONDS.labels(worker=worker, stage=stage).observe(seconds)
+
+def observe_simulation(minutes: int, loop_seconds: Optional[float]):
+    SIMULATED_MINUTES_TOTAL.inc(minutes)
+    if loop_seconds:
+        SIMULATION_MINUTES_PER_SECOND.set(minutes / loop_seconds)
+
+def observe_upload(artifact: str, n_bytes: int, seconds: float):
+    UPLOAD_BYTES_TOTAL.labels(artifact=artifact).inc(n_bytes)
+    if seconds > 0:
+        UPLOAD_BYTES_PER_SECOND.labels(artifact=artifact).set(n_bytes / seconds)
+
+def observe_queue_wait(queue: str, properties, data: dict):
+    """
+    Usa `published_at` (epoch s) del mensaje (dict o modelo) o, si no está, el
+    timestamp AMQP de las propiedades. Sin ninguno de los dos no se registra nada.
+    """
+    published_at = data.get("published_at") if isinstance(data, dict) else getattr(data, "published_at", None)
+    if published_at is None and properties is not None:
+        published_at = getattr(properties, "timestamp", None)
+    if published_at is None:
+        return
+    QUEUE_WAIT_SECONDS.labels(queue=queue).observe(max(0.0, time.time() - float(published_at)))
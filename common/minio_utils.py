@@ -0,0 +1,106 @@
+import os
+import threading
+from contextlib import contextmanager
+from minio import Minio
+from common.common_imports import *
+
+
+def create_minio_client() -> Minio:
+    return Minio(
+        MINIO_URL,
+        access_key=MINIO_ACCESS,
+        secret_key=MINIO_SECRET,
+        secure=False
+    )
+
+def ensure_bucket(client: Minio, bucket: str = MINIO_BUCKET) -> bool:
+    """Crea el bucket si no existe. Devuelve True si fue creado."""
+    if client.bucket_exists(bucket):
+        return False
+    client.make_bucket(bucket)
+    return True
+
+def build_object_url(object_name: str, bucket: str = MINIO_BUCKET) -> str:
+    return f"http://{MINIO_URL}/{bucket}/{object_name}"
+
+
+class MinioUploadSink:
+    """
+    Destino de subida en proceso: los artefactos se escriben directamente
+    sobre un stream que se sube a MinIO con put_object multipart, sin
+    pasar por disco local ni por la cola de subida.
+    """
+    def __init__(self, client: Minio, remote_folder: str, bucket: str = MINIO_BUCKET,
+                 part_size: int = MINIO_PART_SIZE):
+        self.client = client
+        self.remote_folder = remote_folder
+        self.bucket = bucket
+        self.part_size = part_size
+
+    def object_name(self, name: str) -> str:
+        return f"{self.remote_folder}/{name}"
+
+    def object_url(self, name: str) -> str:
+        return build_object_url(self.object_name(name), self.bucket)
+
+    @contextmanager
+    def stream(self, name: str, content_type: str = "application/octet-stream"):
+        """
+        Devuelve un file-like binario. Todo lo que se escribe se sube en
+        partes de `part_size` mientras se sigue generando el archivo.
+        """
+        object_name = self.object_name(name)
+        read_fd, write_fd = os.pipe()
+        reader = os.fdopen(read_fd, "rb")
+        writer = os.fdopen(write_fd, "wb")
+        errors = []
+
+        def _upload():
+            try:
+                self.client.put_object(
+                    bucket_name=self.bucket,
+                    object_name=object_name,
+                    data=reader,
+                    length=-1,
+                    part_size=self.part_size,
+                    content_type=content_type
+                )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                reader.close()
+
+        uploader = threading.Thread(target=_upload, name=f"minio-{name}", daemon=True)
+        uploader.start()
+        try:
+            yield writer
+        except Exception:
+            # El stream quedó incompleto: cerramos y eliminamos el objeto parcial
+            self._close_quietly(writer)
+            uploader.join()
+            self._remove_quietly(object_name)
+            if errors:
+                # Un BrokenPipe en la escritura suele venir de un fallo de subida
+                raise errors[0]
+            raise
+        self._close_quietly(writer)
+        uploader.join()
+        if errors:
+            raise errors[0]
+
+    def remove(self, name: str):
+        """Elimina un objeto ya subido (p.ej. al abandonar la subida directa)."""
+        self._remove_quietly(self.object_name(name))
+
+    @staticmethod
+    def _close_quietly(writer):
+        try:
+            writer.close()
+        except OSError:
+            pass
+
+    def _remove_quietly(self, object_name: str):
+        try:
+            self.client.remove_object(self.bucket, object_name)
+        except Exception:
+            pass
@@ -1,6 +1,8 @@
-from pydantic import BaseModel
+import json
+import hashlib
+from pydantic import BaseModel, TypeAdapter, Discriminator, Tag, model_validator
 from datetime import datetime
-from typing import List
+from typing import Annotated, Any, Dict, List, Optional, Literal, Tuple, Union
 
 class Preset(BaseModel):
     T_base: float
@@ -81,10 +83,120 @@ class Preset(BaseModel):
     temp_optimal_growth: float
     temp_max_growth: float
 
+class ExportOptions(BaseModel):
+    csv_compression: Optional[Literal["gzip", "zstd"]] = None
+    csv_engine: Literal["pandas", "pyarrow"] = "pandas"
+    csv_partition: Literal["none", "day", "week"] = "none"
+    precision: Literal["full", "compact"] = "full"  # compact: float32/int32 en memoria, CSV, JSON y Parquet
+
+class StopOptions(BaseModel):
+    """Condiciones de parada adicionales al peso objetivo (se evalúan al cierre de cada día)."""
+    survivors_below: Optional[int] = None
+    daily_mortality_above: Optional[float] = None
+
 class SimulationPayload(BaseModel):
+    days: int
+    seed: int
+    start_time: datetime  # con zona: timestamp_utc sale en UTC con "+00:00" en CSV/JSON
+    tank_id: int
+    job_id: str
+    preset: Preset
+    export: ExportOptions = ExportOptions()
+    profile: bool = False
+    output_mode: Literal["rows", "daily", "kpis"] = "rows"
+    stop: StopOptions = StopOptions()
+    dt_minutes: Literal[1, 5, 15, 60] = 1  # paso de tiempo de la simulación
+    timeout_s: Optional[float] = None  # plazo de ejecución; si vence el job termina en 'timeout'
+    memory_budget_mb: Optional[int] = None  # pico de RSS máximo: exporta por bloques durante la simulación
+
+class LatinHypercube(BaseModel):
+    ranges: Dict[str, Tuple[float, float]]
+    n_points: int
+    seed: int = 0
+
+class SweepPayload(BaseModel):
+    """Barrido de parámetros sobre `preset`: rejilla (`grid`) o hipercubo latino (`lhs`)."""
     days: int
     seed: int
     start_time: datetime
     tank_id: int
     job_id: str
     preset: Preset
+    grid: Dict[str, List[float]] = {}
+    lhs: Optional[LatinHypercube] = None
+    max_workers: Optional[int] = None
+    dt_minutes: Literal[1, 5, 15, 60] = 1
+    timeout_s: Optional[float] = None
+
+    @model_validator(mode="after")
+    def check_sweep_fields(self):
+        if bool(self.grid) == (self.lhs is not None):
+            raise ValueError("El barrido necesita exactamente uno de 'grid' o 'lhs'")
+        fields = set(self.grid) | set(self.lhs.ranges if self.lhs else {})
+        unknown = fields - set(Preset.model_fields)
+        if unknown:
+            raise ValueError(f"Campos de barrido que no existen en Preset: {sorted(unknown)}")
+        return self
+
+# ==== Mensajes de las colas ====
+class SimulationJobMessage(BaseModel):
+    """Mensaje de la cola de simulaciones; los productores antiguos no envían 'type'."""
+    type: Literal["simulation"] = "simulation"
+    data: SimulationPayload
+    published_at: Optional[float] = None
+
+class SweepJobMessage(BaseModel):
+    type: Literal["sweep"]
+    data: SweepPayload
+    published_at: Optional[float] = None
+
+def _job_message_type(value) -> str:
+    kind = value.get("type") if isinstance(value, dict) else getattr(value, "type", None)
+    return kind or "simulation"
+
+JobMessage = Annotated[
+    Union[Annotated[SimulationJobMessage, Tag("simulation")], Annotated[SweepJobMessage, Tag("sweep")]],
+    Discriminator(_job_message_type),
+]
+JOB_MESSAGE_ADAPTER = TypeAdapter(JobMessage)
+
+def parse_job_message(body: bytes) -> Union[SimulationJobMessage, SweepJobMessage]:
+    """Decodifica y valida el mensaje en un solo paso desde los bytes (pydantic-core)."""
+    return JOB_MESSAGE_ADAPTER.validate_json(body)
+
+
+class ResultQuery(BaseModel):
+    """
+    Consulta analítica sobre los Parquet guardados de varios jobs/tanques
+    (query_server). Los filtros son conjuntivos: [columna, operador, valor].
+    'day' (minute_index // 1440) se puede usar en filtros y en group_by de 'rows'.
+    """
+    kind: Literal["rows", "daily", "sweep"] = "rows"
+    tank_ids: Optional[List[int]] = None
+    job_ids: Optional[List[str]] = None
+    columns: Optional[List[str]] = None
+    filters: List[Tuple[str, Literal["==", "!=", "<", "<=", ">", ">=", "in"], Any]] = []
+    start_time: Optional[datetime] = None  # timestamp_utc >= start_time (solo 'rows')
+    end_time: Optional[datetime] = None    # timestamp_utc < end_time (solo 'rows')
+    group_by: List[str] = []
+    aggregations: Dict[str, List[Literal["mean", "min", "max", "sum", "count", "stddev"]]] = {}
+    limit: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_query_fields(self):
+        if self.group_by and not self.aggregations:
+            raise ValueError("'group_by' necesita al menos una agregación")
+        if self.aggregations and self.columns:
+            raise ValueError("Con agregaciones las columnas salen de 'group_by' y 'aggregations'; no uses 'columns'")
+        return self
+
+
+def payload_fingerprint(payload: BaseModel) -> str:
+    """
+    Huella sha256 de un payload sin job_id, profile, timeout_s ni
+    memory_budget_mb: dos payloads con la misma huella producen los mismos
+    artefactos.
+    """
+    fields = payload.model_dump(mode="json", exclude={"job_id", "profile", "timeout_s", "memory_budget_mb"})
+    canonical = json.dumps({"type": type(payload).__name__, **fields}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
@@ -1,5 +1,10 @@
 import pika
-from typing import Callable
+from typing import Callable, Iterable
+
+def declare_queue(channel, queue_name: str, max_priority: int = 0):
+    """Cola durable; con max_priority > 0 se declara como cola de prioridad (x-max-priority)."""
+    arguments = {"x-max-priority": max_priority} if max_priority > 0 else None
+    channel.queue_declare(queue=queue_name, durable=True, arguments=arguments)
 
 def create_rabbit_connection(url: str, queue_name: str, on_message: Callable):
     connection = pika.BlockingConnection(pika.URLParameters(url))
@@ -7,3 +12,19 @@ def create_rabbit_connection(url: str, queue_name: str, on_message: Callable):
     channel.queue_declare(queue=queue_name, durable=True)
     channel.basic_consume(queue=queue_name, on_message_callback=on_message)
     return connection, channel
+
+def create_lane_consumer(url: str, queue_name: str, prefetch: int, on_message: Callable,
+                         declare_queues: Iterable[str] = (), max_priority: int = 0):
+    """
+    Conexión y canal propios para un carril (cola), con su prefetch: un carril
+    largo con prefetch 1 no acapara mensajes mientras simula. pika no es
+    thread-safe, así que cada hilo consumidor abre la suya; declare_queues son
+    las otras colas en las que publica el carril (reenvío al carril largo).
+    """
+    connection = pika.BlockingConnection(pika.URLParameters(url))
+    channel = connection.channel()
+    for name in dict.fromkeys([queue_name, *declare_queues]):
+        declare_queue(channel, name, max_priority)
+    channel.basic_qos(prefetch_count=prefetch)
+    channel.basic_consume(queue=queue_name, on_message_callback=on_message)
+    return connection, channel
@@ -1,13 +1,24 @@
 import redis
-import json
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 from common.job_status import *
+from common.serialization import dumps_str, loads
+
+
+# Borra el lock solo si sigue siendo de ARGV[1] (GET + DEL atómico)
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
 
 
 class RedisClient:
     def __init__(self, url: str):
         self.client = redis.Redis.from_url(url, decode_responses=True)
+        self._release_lock = self.client.register_script(RELEASE_LOCK_SCRIPT)
 
     def register_job(self, job_id: str, data: Dict[str, Any]):
         self.client.hset(f"{job_id}", mapping=data)
@@ -26,7 +37,7 @@ class RedisClient:
         return self.client.exists(f"{job_id}") == 1
     
     def publish(self, channel, message: dict):
-        self.client.publish(channel, json.dumps(message))
+        self.client.publish(channel, dumps_str(message))
 
     def publish_progress(self, job_id: str, channel: str, status: str, progress: float, url: str | None = None):
         data = {
@@ -43,4 +54,51 @@ class RedisClient:
             "id": job_id,
             **data
         }
-        self.publish(channel, json.dumps(event))
\ No newline at end of file
+        self.publish(channel, dumps_str(event))  # doble codificación: formato histórico del canal
+
+    # --- Cancelación cooperativa (la consulta run_simulation vía CancellationToken) ---
+    def request_cancel(self, job_id: str, ttl_s: int = 86400):
+        self.client.set(f"{job_id}:cancel", 1, ex=ttl_s)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return self.client.exists(f"{job_id}:cancel") == 1
+
+    # --- Deduplicación de jobs idénticos (huella del payload sin job_id) ---
+    def coalesce_job(
+        self, fingerprint: str, job_id: str, lock_ttl_s: int, poll_s: float, max_wait_s: float
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Devuelve (None, None) si `job_id` queda como líder de la huella (lock
+        SET NX con TTL). Si otro job idéntico está en vuelo, espera a que
+        publique su resultado y devuelve (job_id del líder, resultado). Si el
+        líder falla o su lock caduca, el primer seguidor en llegar toma el relevo.
+        Tras `max_wait_s` sin resultado devuelve (job_id del líder, None): el
+        seguidor simula por su cuenta en vez de bloquear el consumidor.
+        """
+        lock_key, result_key = f"dedup:{fingerprint}:leader", f"dedup:{fingerprint}:result"
+        deadline = time.monotonic() + max_wait_s
+        while True:
+            shared = self.client.get(result_key)
+            if shared is None and self.client.set(lock_key, job_id, nx=True, ex=lock_ttl_s):
+                # El líder anterior pudo publicar justo entre el GET y el SET
+                shared = self.client.get(result_key)
+                if shared is None:
+                    return None, None
+                self._release_lock(keys=[lock_key], args=[job_id])
+            if shared is not None:
+                result = loads(shared)
+                return result.pop("leader_job_id"), result
+            if time.monotonic() >= deadline:
+                return self.client.get(lock_key) or "", None
+            time.sleep(poll_s)
+
+    def share_job_result(self, fingerprint: str, job_id: str, result: Dict[str, Any], window_s: int):
+        """El líder publica sus artefactos para los seguidores durante `window_s` y libera su lock."""
+        pipe = self.client.pipeline()
+        pipe.set(f"dedup:{fingerprint}:result", dumps_str({**result, "leader_job_id": job_id}), ex=window_s)
+        self._release_lock(keys=[f"dedup:{fingerprint}:leader"], args=[job_id], client=pipe)
+        pipe.execute()
+
+    def release_fingerprint(self, fingerprint: str, job_id: str):
+        """El líder falló: libera el lock (si sigue siendo suyo) para que un seguidor simule."""
+        self._release_lock(keys=[f"dedup:{fingerprint}:leader"], args=[job_id])
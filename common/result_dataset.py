@@ -0,0 +1,228 @@
+"""
+Los Parquet guardados en SIMULATIONS_OUT_DIR como un único dataset de
+pyarrow, particionado por tank_id y job_id (tomados del nombre de cada
+archivo), para consultas entre jobs sin mover los datos crudos.
+
+- Los filtros sobre tank_id/job_id descartan archivos enteros antes de
+  abrirlos. El resto de filtros se empujan al escaneo y usan las
+  estadísticas de row group (un row group por día) para saltarse días.
+- Solo se leen las columnas pedidas o necesarias para filtrar/agregar.
+- Las agregaciones corren en un plan de Acero (scan -> filter -> project ->
+  aggregate) en streaming, sin materializar las filas.
+"""
+import os
+import re
+import pyarrow as pa
+import pyarrow.acero as acero
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from typing import Iterator, List, Optional, Tuple
+from common.models import ResultQuery
+from common.storage_lifecycle import job_id_from_entry
+
+MINUTES_PER_DAY = 1440
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Sufijo del nombre (sin .parquet) de cada tipo de resultado
+KIND_PATTERNS = {
+    "rows": re.compile(r"_tank_\d+_seed-?\d+$"),
+    "daily": re.compile(r"_tank_\d+_daily$"),
+    "sweep": re.compile(r"_tank_\d+_sweep$"),
+}
+PARTITION_FIELDS = [pa.field("tank_id", pa.int32()), pa.field("job_id", pa.string())]
+
+_COMPARISONS = {
+    "==": lambda f, v: f == v,
+    "!=": lambda f, v: f != v,
+    "<": lambda f, v: f < v,
+    "<=": lambda f, v: f <= v,
+    ">": lambda f, v: f > v,
+    ">=": lambda f, v: f >= v,
+    "in": lambda f, v: f.isin(v),
+}
+
+
+class QueryError(ValueError):
+    """Consulta inválida para los datos guardados (columna desconocida, etc.)."""
+
+
+def list_result_files(
+    out_dir: str,
+    kind: str,
+    tank_ids: Optional[List[int]] = None,
+    job_ids: Optional[List[str]] = None
+) -> List[Tuple[str, int, str]]:
+    """(ruta, tank_id, job_id) de cada Parquet de `kind`, ya filtrado por partición."""
+    pattern = KIND_PATTERNS[kind]
+    files = []
+    if not os.path.isdir(out_dir):
+        return files
+    for tank_folder in sorted(os.listdir(out_dir)):
+        if not tank_folder.startswith("tank_"):
+            continue
+        tank_id = int(tank_folder[len("tank_"):])
+        if tank_ids is not None and tank_id not in tank_ids:
+            continue
+        tank_path = os.path.join(out_dir, tank_folder)
+        for name in sorted(os.listdir(tank_path)):
+            if not name.endswith(".parquet") or not pattern.search(name[:-len(".parquet")]):
+                continue
+            job_id = job_id_from_entry(name)
+            if job_ids is not None and job_id not in job_ids:
+                continue
+            files.append((os.path.join(tank_path, name), tank_id, job_id))
+    return files
+
+def open_result_dataset(files: List[Tuple[str, int, str]]) -> ds.Dataset:
+    """
+    Dataset sobre `files` con tank_id/job_id como claves de partición: cada
+    fragmento lleva su expresión (tank_id == t) & (job_id == j), que pyarrow
+    usa para podar fragmentos y para rellenar las columnas que el archivo no tiene.
+    """
+    schema = pa.unify_schemas([pq.read_schema(path) for path, _, _ in files], promote_options="permissive")
+    for field in PARTITION_FIELDS:
+        if field.name not in schema.names:
+            schema = schema.append(field)
+    partitions = [(ds.field("tank_id") == tank_id) & (ds.field("job_id") == job_id) for _, tank_id, job_id in files]
+    return ds.FileSystemDataset.from_paths(
+        [path for path, _, _ in files],
+        schema=schema,
+        format=ds.ParquetFileFormat(),
+        filesystem=pafs.LocalFileSystem(),
+        partitions=partitions,
+    )
+
+
+def _column_expression(name: str, schema: pa.Schema, kind: str) -> ds.Expression:
+    if name == "day" and kind == "rows" and "day" not in schema.names:
+        return pc.divide(ds.field("minute_index"), pa.scalar(MINUTES_PER_DAY, pa.int32()))
+    if name not in schema.names:
+        raise QueryError(f"Columna desconocida para '{kind}': {name}")
+    return ds.field(name)
+
+def _source_columns(name: str, schema: pa.Schema) -> List[str]:
+    """Columnas físicas que hay que leer para calcular `name`."""
+    return ["minute_index"] if name == "day" and "day" not in schema.names else [name]
+
+def build_filter(query: ResultQuery, schema: pa.Schema) -> Optional[ds.Expression]:
+    expressions = []
+    if query.tank_ids is not None:
+        expressions.append(ds.field("tank_id").isin(query.tank_ids))
+    if query.job_ids is not None:
+        expressions.append(ds.field("job_id").isin(query.job_ids))
+    for column, op, value in query.filters:
+        expressions.append(_COMPARISONS[op](_column_expression(column, schema, query.kind), value))
+    if query.start_time is not None or query.end_time is not None:
+        if "timestamp_utc" not in schema.names:
+            raise QueryError(f"'{query.kind}' no tiene timestamp_utc para filtrar por fechas")
+        timestamp_type = schema.field("timestamp_utc").type
+        if query.start_time is not None:
+            expressions.append(ds.field("timestamp_utc") >= pa.scalar(query.start_time, timestamp_type))
+        if query.end_time is not None:
+            expressions.append(ds.field("timestamp_utc") < pa.scalar(query.end_time, timestamp_type))
+    if not expressions:
+        return None
+    combined = expressions[0]
+    for expression in expressions[1:]:
+        combined = combined & expression
+    return combined
+
+def _filter_columns(query: ResultQuery, schema: pa.Schema) -> List[str]:
+    columns = [column for column, _, _ in query.filters]
+    if query.start_time is not None or query.end_time is not None:
+        columns.append("timestamp_utc")
+    return [source for column in columns for source in _source_columns(column, schema)]
+
+
+def _aggregate(dataset: ds.Dataset, query: ResultQuery, expression: Optional[ds.Expression]) -> pa.Table:
+    schema = dataset.schema
+    outputs = list(query.group_by) + [column for column in query.aggregations if column not in query.group_by]
+    read = sorted({source for name in outputs for source in _source_columns(name, schema)} | set(_filter_columns(query, schema)))
+    scan_options = {"columns": read}
+    if expression is not None:
+        scan_options["filter"] = expression
+    prefix = "hash_" if query.group_by else ""
+    aggregates = [
+        (column, f"{prefix}{function}", None, f"{column}_{function}")
+        for column, functions in query.aggregations.items() for function in functions
+    ]
+    plan = [acero.Declaration("scan", acero.ScanNodeOptions(dataset, **scan_options))]
+    if expression is not None:
+        # El scan solo poda fragmentos/row groups: el filtro por fila lo aplica este nodo
+        plan.append(acero.Declaration("filter", acero.FilterNodeOptions(expression)))
+    plan.append(acero.Declaration("project", acero.ProjectNodeOptions(
+        [_column_expression(name, schema, query.kind) for name in outputs], outputs
+    )))
+    plan.append(acero.Declaration("aggregate", acero.AggregateNodeOptions(aggregates, keys=query.group_by or None)))
+    table = acero.Declaration.from_sequence(plan).to_table()
+    if query.group_by:
+        table = table.sort_by([(key, "ascending") for key in query.group_by])
+    return table.slice(0, query.limit) if query.limit is not None else table
+
+def _scan_batches(dataset: ds.Dataset, query: ResultQuery, expression: Optional[ds.Expression]) -> Tuple[pa.Schema, Iterator[pa.RecordBatch]]:
+    schema = dataset.schema
+    names = query.columns or schema.names
+    scanner = dataset.scanner(
+        columns={name: _column_expression(name, schema, query.kind) for name in names},
+        filter=expression,
+    )
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        remaining = query.limit
+        for batch in scanner.to_batches():
+            if remaining is not None:
+                if remaining <= 0:
+                    return
+                batch = batch.slice(0, remaining)
+                remaining -= batch.num_rows
+            if batch.num_rows:
+                yield batch
+
+    return scanner.projected_schema, batches()
+
+
+def run_query(query: ResultQuery, out_dir: str) -> Tuple[pa.Schema, Iterator[pa.RecordBatch]]:
+    """
+    Ejecuta `query` y devuelve (esquema, iterador de RecordBatch). Sin
+    agregaciones los lotes salen del escaneo según se leen; con
+    agregaciones se devuelve la tabla agregada (pequeña) por lotes.
+    """
+    files = list_result_files(out_dir, query.kind, query.tank_ids, query.job_ids)
+    if not files:
+        return pa.schema([]), iter(())
+    dataset = open_result_dataset(files)
+    expression = build_filter(query, dataset.schema)
+    if query.aggregations:
+        table = _aggregate(dataset, query, expression)
+        return table.schema, iter(table.to_batches())
+    return _scan_batches(dataset, query, expression)
+
+class _DrainSink:
+    """File-like mínimo para el writer IPC: acumula lo escrito hasta drain()."""
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+def arrow_ipc_stream(schema: pa.Schema, batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+    """Serializa los lotes como Arrow IPC (formato stream), un mensaje por lote."""
+    sink = _DrainSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    for batch in batches:
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
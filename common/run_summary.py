@@ -0,0 +1,217 @@
+"""
+Estadísticas y eventos de una corrida, calculados al exportar y guardados
+junto a los chunks del cache server (stats.json y events.json en la carpeta
+'{job_id}_cache'), para que los clientes no descarguen todos los chunks.
+
+RunSummary se alimenta por bloques (todo el DataFrame o cada vaciado de
+StreamingExportCollector) con operaciones numpy en bloque:
+
+- percentiles exactos: por columna se guardan los valores distintos con su
+  frecuencia. Los valores de salida vienen redondeados a 3-4 decimales, así
+  que su número está acotado por el rango y no por la duración;
+- episodios (rachas de minutos consecutivos) de recambio de agua, picos de
+  alimentación e hipoxia (O2 por debajo de O2_crit), que pueden cruzar
+  bloques; y las siembras (stock_add) minuto a minuto.
+"""
+import tempfile
+import numpy as np
+from common.common_imports import *
+
+STATS_FILE = "stats.json"
+EVENTS_FILE = "events.json"
+STATS_COLUMNS = ("temperature_C", "salinity_ppt", "oxygen_mgL", "pH", "deaths")
+STATS_PERCENTILES = (5, 25, 50, 75, 95)
+EPISODE_FLAGS = ("waterchange", "feed_spike")
+
+
+def _round(value) -> float:
+    # 6 decimales: suficiente para 3-4 decimales de salida y limpia el ruido de float32
+    return round(float(value), 6)
+
+
+class ColumnStats:
+    """Histograma exacto (valor, frecuencia) de una columna, combinable por bloques."""
+    def __init__(self):
+        self.values = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.total = 0.0
+
+    def add(self, values: np.ndarray) -> None:
+        values = np.asarray(values)
+        values = values[np.isfinite(values)] if values.dtype.kind == "f" else values
+        if not len(values):
+            return
+        self.total += float(values.sum(dtype=np.float64))
+        unique, counts = np.unique(values, return_counts=True)
+        if len(self.values):
+            unique = np.concatenate([self.values, unique.astype(self.values.dtype, copy=False)])
+            counts = np.concatenate([self.counts, counts])
+            order = np.argsort(unique, kind="stable")
+            unique, counts = unique[order], counts[order]
+            starts = np.flatnonzero(np.r_[True, unique[1:] != unique[:-1]])
+            unique, counts = unique[starts], np.add.reduceat(counts, starts)
+        self.values, self.counts = unique, counts
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def percentile(self, q: float) -> float:
+        """Mismo resultado que np.percentile (interpolación lineal) sobre todos los valores."""
+        cumulative = np.cumsum(self.counts)
+        position = q / 100 * (cumulative[-1] - 1)
+        low, high = int(np.floor(position)), int(np.ceil(position))
+        v_low = self.values[np.searchsorted(cumulative, low, side="right")]
+        v_high = self.values[np.searchsorted(cumulative, high, side="right")]
+        return float(v_low) + (position - low) * (float(v_high) - float(v_low))
+
+    def as_dict(self) -> Dict[str, Any]:
+        if not len(self.values):
+            return {"count": 0}
+        summary = {
+            "count": self.count,
+            "min": _round(self.values[0]),
+            "max": _round(self.values[-1]),
+            "mean": _round(self.total / self.count),
+        }
+        summary.update({f"p{q}": _round(self.percentile(q)) for q in STATS_PERCENTILES})
+        return summary
+
+
+class EpisodeTracker:
+    """
+    Rachas de pasos consecutivos donde `mask` es cierto. Una racha abierta al
+    final de un bloque continúa en el siguiente si empieza en el paso contiguo.
+    Con `values` guarda además el mínimo de cada racha.
+    """
+    def __init__(self, dt_minutes: int):
+        self.dt_minutes = dt_minutes
+        self.episodes: List[Dict[str, Any]] = []
+        self.open: Optional[Dict[str, Any]] = None
+
+    def add(self, minutes: np.ndarray, mask: np.ndarray, values: Optional[np.ndarray] = None) -> None:
+        mask = np.asarray(mask, dtype=bool)
+        if not len(mask):
+            return
+        if self.open is not None and not (mask[0] and minutes[0] == self.open["end_minute"] + self.dt_minutes):
+            self._close()
+        edges = np.diff(np.r_[0, mask.astype(np.int8), 0])
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)  # ends exclusivo
+        if not len(starts):
+            return
+        lows = None
+        if values is not None:
+            # reduceat sobre [inicio, fin) de cada racha: los tramos pares son las rachas
+            bounds = np.column_stack([starts, ends]).ravel()
+            lows = np.minimum.reduceat(np.asarray(values), bounds[bounds < len(mask)])[::2]
+        for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+            episode = {"start_minute": int(minutes[start]), "end_minute": int(minutes[end - 1]), "steps": end - start}
+            if lows is not None:
+                episode["min"] = float(lows[i])
+            if i == 0 and self.open is not None:
+                # continuación de la racha del bloque anterior
+                episode["start_minute"] = self.open["start_minute"]
+                episode["steps"] += self.open["steps"]
+                if lows is not None:
+                    episode["min"] = min(episode["min"], self.open["min"])
+                self.open = None
+            if i < len(starts) - 1 or end < len(mask):
+                self.episodes.append(episode)
+            else:
+                self.open = episode
+
+    def _close(self) -> None:
+        if self.open is not None:
+            self.episodes.append(self.open)
+            self.open = None
+
+    def result(self, value_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        self._close()
+        out = []
+        for episode in self.episodes:
+            item = {
+                "start_minute": episode["start_minute"],
+                "end_minute": episode["end_minute"],
+                "minutes": episode["steps"] * self.dt_minutes,
+            }
+            if value_key:
+                item[value_key] = _round(episode["min"])
+            out.append(item)
+        return out
+
+
+class RunSummary:
+    def __init__(self, start_time: datetime, dt_minutes: int, hypoxia_threshold: float):
+        self.start_time = start_time
+        self.dt_minutes = dt_minutes
+        self.hypoxia_threshold = hypoxia_threshold
+        self.rows = 0
+        self.columns = {name: ColumnStats() for name in STATS_COLUMNS}
+        self.flags = {name: EpisodeTracker(dt_minutes) for name in EPISODE_FLAGS}
+        self.hypoxia = EpisodeTracker(dt_minutes)
+        self.stocking: List[Dict[str, int]] = []
+        self.total_deaths = 0
+        self.final_survivors: Optional[int] = None
+
+    @classmethod
+    def for_env(cls, env) -> "RunSummary":
+        return cls(env.start_time, env.dt_minutes, env.mort_config.o2_critical_threshold)
+
+    def add(self, cols) -> None:
+        """Añade un bloque de filas (DataFrame o dict de columnas) en orden de minute_index."""
+        minutes = np.asarray(cols["minute_index"])
+        if not len(minutes):
+            return
+        self.rows += len(minutes)
+        for name, stats in self.columns.items():
+            stats.add(np.asarray(cols[name]))
+        for name, tracker in self.flags.items():
+            tracker.add(minutes, np.asarray(cols[name]))
+        oxygen = np.asarray(cols["oxygen_mgL"])
+        self.hypoxia.add(minutes, oxygen < self.hypoxia_threshold, oxygen)
+        stock_add = np.asarray(cols["stock_add"])
+        stocked = np.flatnonzero(stock_add)
+        self.stocking.extend(
+            {"minute": minute, "count": count}
+            for minute, count in zip(minutes[stocked].tolist(), stock_add[stocked].tolist())
+        )
+        self.total_deaths += int(np.asarray(cols["deaths"]).sum())
+        self.final_survivors = int(np.asarray(cols["survivors"])[-1])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "minutes": self.rows * self.dt_minutes,
+            "columns": {name: stats.as_dict() for name, stats in self.columns.items()},
+            "totals": {
+                "deaths": self.total_deaths,
+                "stocked": sum(event["count"] for event in self.stocking),
+                "final_survivors": self.final_survivors,
+            },
+        }
+
+    def events(self) -> Dict[str, Any]:
+        events = {
+            "start_time": self.start_time.isoformat(),
+            "dt_minutes": self.dt_minutes,
+            "stock_add": self.stocking,
+            "hypoxia": {
+                "threshold_mgL": self.hypoxia_threshold,
+                "episodes": self.hypoxia.result(value_key="min_oxygen_mgL"),
+            },
+        }
+        for name, tracker in self.flags.items():
+            events[name] = tracker.result()
+        return events
+
+    def write(self, folder: str) -> Dict[str, str]:
+        """Escribe stats.json y events.json en `folder` (tmp + rename: nunca se sirven a medias)."""
+        os.makedirs(folder, exist_ok=True)
+        paths = {}
+        for name, content in ((STATS_FILE, self.stats()), (EVENTS_FILE, self.events())):
+            fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=f".{name}_")
+            with os.fdopen(fd, "w") as f:
+                json.dump(content, f, separators=(",", ":"))
+            paths[name] = os.path.join(folder, name)
+            os.replace(tmp_path, paths[name])
+        return paths
@@ -0,0 +1,66 @@
+"""
+Planificación de jobs de simulación por tamaño: cada payload se estima en
+días-tanque equivalentes y se enruta a un carril corto (interactivo) o largo
+(batch) con una prioridad AMQP mayor cuanto más pequeño es el job.
+
+Las colas solo aceptan prioridades si se declaran con x-max-priority
+(RABBITMQ_MAX_PRIORITY > 0); RabbitMQ no permite cambiar ese argumento en
+una cola durable ya existente, así que activarlo exige recrear las colas.
+"""
+import math
+import pika
+from common.common_imports import *
+from common.models import SimulationPayload, SweepPayload
+from common.serialization import dumps
+
+LANES = ("short", "long")
+
+# Coste relativo por modo de salida: 'rows' incluye exportación y chunks de caché
+OUTPUT_MODE_COST = {"rows": 1.0, "daily": 0.6, "kpis": 0.6}
+
+
+def estimate_job_cost(payload: Union[SimulationPayload, SweepPayload]) -> float:
+    """
+    Coste estimado en días-tanque equivalentes (1 = un día a paso de 1 minuto
+    con filas por minuto). Escala con días, paso, modo de salida y, en
+    barridos, con el número de puntos.
+    """
+    cost = payload.days / payload.dt_minutes
+    if isinstance(payload, SweepPayload):
+        points = payload.lhs.n_points if payload.lhs else math.prod(len(values) for values in payload.grid.values())
+        return cost * points * OUTPUT_MODE_COST["kpis"]
+    return cost * OUTPUT_MODE_COST[payload.output_mode]
+
+def job_lane(cost: float) -> str:
+    return "long" if cost > LONG_LANE_MIN_DAYS else "short"
+
+def job_priority(cost: float, max_priority: int = RABBITMQ_MAX_PRIORITY) -> int:
+    """Prioridad AMQP (0..max_priority): baja un nivel cada vez que se duplica el coste."""
+    if max_priority <= 0:
+        return 0
+    return max(0, max_priority - int(math.log2(1 + cost)))
+
+def route_job(payload: Union[SimulationPayload, SweepPayload]) -> Tuple[str, str, int]:
+    """Devuelve (carril, cola, prioridad) del payload."""
+    cost = estimate_job_cost(payload)
+    lane = job_lane(cost)
+    return lane, LANE_QUEUES[lane], job_priority(cost)
+
+def publish_job(channel, data: Union[dict, bytes], payload: Union[SimulationPayload, SweepPayload]) -> str:
+    """
+    Publica el mensaje del job en la cola de su carril, con su prioridad.
+    `data` puede ser el cuerpo ya codificado (se reenvía tal cual). Devuelve el carril.
+    """
+    lane, queue_name, priority = route_job(payload)
+    channel.basic_publish(
+        exchange="",
+        routing_key=queue_name,
+        body=data if isinstance(data, bytes) else dumps(data, default=str),
+        properties=pika.BasicProperties(
+            delivery_mode=2,
+            priority=priority,
+            timestamp=int(time.time()),
+            headers={"lane": lane},
+        ),
+    )
+    return lane
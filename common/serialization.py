@@ -0,0 +1,86 @@
+"""
+Capa de serialización JSON para mensajes de RabbitMQ, eventos de Redis y
+resultados compartidos. Usa orjson o msgspec si están instalados y, si no,
+la librería estándar; SIMULATIONS_JSON_BACKEND fuerza uno concreto.
+
+Los mensajes de simulación se validan directamente desde los bytes con
+pydantic-core (models.parse_job_message). El de subida es un dataclass sin
+pydantic, para que el uploader arranque sin cargarlo.
+"""
+import json
+import importlib
+import dataclasses
+from common.common_imports import *
+
+JSON_BACKENDS = ("orjson", "msgspec", "json")
+
+
+def _stdlib_codec():
+    def dumps(obj, default=None) -> bytes:
+        return json.dumps(obj, default=default, separators=(",", ":")).encode()
+    return dumps, json.loads
+
+def _orjson_codec():
+    orjson = importlib.import_module("orjson")
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(obj, default=None) -> bytes:
+        return orjson.dumps(obj, default=default, option=options)
+    return dumps, orjson.loads
+
+def _msgspec_codec():
+    msgspec_json = importlib.import_module("msgspec.json")
+
+    def dumps(obj, default=None) -> bytes:
+        return msgspec_json.encode(obj, enc_hook=default)
+    return dumps, msgspec_json.decode
+
+_CODECS = {"orjson": _orjson_codec, "msgspec": _msgspec_codec, "json": _stdlib_codec}
+
+
+def load_codec(backend: Optional[str] = None) -> Tuple[str, Callable, Callable]:
+    """(nombre, dumps, loads) del backend pedido o del primero disponible."""
+    candidates = [backend] if backend else JSON_BACKENDS
+    for name in candidates:
+        try:
+            dumps, loads = _CODECS[name]()
+            return name, dumps, loads
+        except ImportError:
+            continue
+    raise ImportError(f"Backend JSON no disponible: {backend}")
+
+JSON_BACKEND, _dumps, _loads = load_codec(os.getenv("SIMULATIONS_JSON_BACKEND") or None)
+
+
+def dumps(obj: Any, default: Optional[Callable] = None) -> bytes:
+    """JSON compacto en bytes (lo que aceptan pika y redis sin recodificar)."""
+    return _dumps(obj, default)
+
+def dumps_str(obj: Any, default: Optional[Callable] = None) -> str:
+    return _dumps(obj, default).decode()
+
+def loads(data: Union[bytes, str]) -> Any:
+    return _loads(data)
+
+
+@dataclass
+class UploadMessage:
+    """Mensaje de UPLOAD_QUEUE (main_worker -> uploader_worker)."""
+    job_id: str
+    tank_id: int
+    csv_path: Optional[str] = None
+    parquet_path: Optional[str] = None
+    cache_url: Optional[str] = None
+    cache_path: Optional[str] = None
+    published_at: Optional[float] = None
+
+    def __post_init__(self):
+        self.tank_id = int(self.tank_id)
+
+    @classmethod
+    def from_json(cls, data: Union[bytes, str]) -> "UploadMessage":
+        fields = loads(data)
+        return cls(**{name: fields[name] for name in cls.__dataclass_fields__ if name in fields})
+
+    def to_json(self) -> bytes:
+        return dumps(dataclasses.asdict(self))
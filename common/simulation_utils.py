@@ -1,33 +1,231 @@
-import os, json, pandas as pd
+import os, json, pandas as pd, pyarrow as pa
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Any, List, Tuple
 from tank_simulator.environment import SimulationEnvironment
 from tank_simulator.orchestration import run_simulation
-import requests
+from tank_simulator.instrumentation import StageTimer, NULL_TIMER
+from tank_simulator.cancellation import CancellationToken
+from tank_simulator.sweep import run_sweep, expand_grid, latin_hypercube
+from tank_simulator.collectors import make_collector
+from tank_simulator.stop_conditions import StopCondition, survivors_below, daily_mortality_above
+from common.models import ExportOptions, SweepPayload, StopOptions
+from common.logger import get_logger
+from common.storage_lifecycle import path_size, remove_path, job_entries, link_entry
+from common.streaming_export import StreamingExportCollector, plan_memory_budget
+from common.run_summary import RunSummary
+from common.export_utils import (
+    write_csv, write_parquet, csv_extension, iter_csv_partitions, output_schema, apply_precision,
+    minute_timestamps, json_records, JSON_WRITER_THREADS
+)
+
+CHUNK_SIZE = 50000  # filas por chunk JSON del cache server
+
+logger = get_logger("SimulationUtils")
+
+def job_profile_path(out_dir: str, tank_id: int, job_id: str) -> str:
+    """Ruta del perfil cProfile de un job, junto a sus artefactos."""
+    return os.path.join(out_dir, f"tank_{tank_id}", f"{job_id}_profile.prof")
+
+def remove_job_artifacts(out_dir: str, tank_id: int, job_id: str) -> List[str]:
+    """Borra los artefactos locales (parciales o no) de un job: todo lo que empieza por '{job_id}_'."""
+    removed = job_entries(out_dir, tank_id, job_id)
+    for path in removed:
+        remove_path(path)
+    return removed
+
+def alias_job_artifacts(leader_id: str, job_id: str, shared: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Entradas locales propias para un job deduplicado: Parquet/CSV y carpeta
+    de chunks del líder enlazados como '{job_id}_*' (hardlinks), con
+    index.json reescrito con su job_id. Así el cache server lo sirve bajo
+    /cache/{job_id}/ y cada job sube y borra sus archivos sin romper los del
+    otro. Devuelve `shared` con las rutas nuevas; OSError si el líder ya
+    borró alguna.
+    """
+    paths = dict(shared.get("paths", {}))
+    for key in ("csv", "parquet"):
+        if paths.get(key):
+            paths[key] = link_entry(paths[key], leader_id, job_id)
+    cache_path = shared.get("cache_path")
+    if cache_path:
+        cache_path = link_entry(cache_path, leader_id, job_id)
+        index_path = os.path.join(cache_path, "index.json")
+        with open(index_path) as f:
+            index = json.load(f)
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({**index, "job_id": job_id}, f, indent=2)
+        os.replace(tmp_path, index_path)  # no escribe sobre el hardlink del líder
+    return {**shared, "paths": paths, "cache_path": cache_path}
+
+def rows_to_dataframe(rows: List[Dict[str, Any]], env: SimulationEnvironment) -> pd.DataFrame:
+    """Construye el DataFrame una sola vez y añade timestamp_utc como columna datetime64 (UTC, con zona si start_time la tiene)."""
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        df.insert(0, "timestamp_utc", minute_timestamps(env.start_time, df["minute_index"].to_numpy(), env.dt_minutes))
+    return df
+
 
 def export_results(
     rows: List[Dict[str, Any]], 
     env: SimulationEnvironment, 
     out_dir: str,
-    job_id: str
+    job_id: str,
+    sink=None,
+    options: ExportOptions = None,
+    timer: StageTimer = None
 ) -> Dict[str, str]:
-    df = pd.DataFrame(rows)
+    return export_dataframe(rows_to_dataframe(rows, env), env, out_dir, job_id, sink=sink, options=options, timer=timer)
+
+
+def export_dataframe(
+    df: pd.DataFrame,
+    env: SimulationEnvironment,
+    out_dir: str,
+    job_id: str,
+    sink=None,
+    options: ExportOptions = None,
+    timer: StageTimer = None
+) -> Dict[str, str]:
+    options = options or ExportOptions()
+    timer = timer or NULL_TIMER
+    df = apply_precision(df, options)
+
+    if sink is not None:
+        try:
+            return stream_results(df, sink, options, env.steps_per_day, timer)
+        except Exception as e:
+            # Fallback: escribir a disco y dejar que el uploader_worker suba los archivos
+            logger.warning(f"[!] No se pudo subir directamente a MinIO, se escribe a disco: {e}")
+
     tank_folder = os.path.join(out_dir, f"tank_{env.tank_id}")
     os.makedirs(tank_folder, exist_ok=True)
     base_filename = f"{job_id}_tank_{env.tank_id}_seed{env.seed}"
-    csv_path = os.path.join(tank_folder, f"{base_filename}.csv")
     pq_path = os.path.join(tank_folder, f"{base_filename}.parquet")
 
-    df.to_csv(csv_path, index=False)
+    if options.csv_partition == "none":
+        csv_path = os.path.join(tank_folder, f"{base_filename}{csv_extension(options)}")
+        csv_folder = tank_folder
+    else:
+        # Particionado: csv_path apunta a la carpeta con un archivo por día/semana
+        csv_path = os.path.join(tank_folder, f"{base_filename}_csv")
+        csv_folder = csv_path
+        os.makedirs(csv_folder, exist_ok=True)
+
+    with timer.stage("csv_write"):
+        for suffix, part in iter_csv_partitions(df, options):
+            part_path = os.path.join(csv_folder, f"{base_filename}{suffix}{csv_extension(options)}")
+            with open(part_path, "wb") as f:
+                write_csv(part, f, options)
+    timer.add_bytes("csv_write", path_size(csv_path))
     try:
-        df.to_parquet(pq_path, index=False)
+        with timer.stage("parquet_write"):
+            write_parquet(df, pq_path, env.steps_per_day, schema=output_schema(options))
+        timer.add_bytes("parquet_write", path_size(pq_path))
     except Exception as e:
-        print(f"Warning: Could not save parquet file. {e}")
+        logger.warning(f"[!] No se pudo guardar el Parquet: {e}")
         pq_path = None
 
     return {"csv": csv_path, "parquet": pq_path}
 
 
+def stream_results(df: pd.DataFrame, sink, options: ExportOptions, rows_per_group: int,
+                   timer: StageTimer = None) -> Dict[str, str]:
+    """
+    Escribe Parquet y CSV directamente sobre el sink de subida (sin disco local).
+    Si una parte falla se borran las ya subidas antes de propagar el error: el
+    fallback a disco vuelve a subirlo todo por la cola.
+    """
+    timer = timer or NULL_TIMER
+    streamed = []
+    try:
+        with timer.stage("parquet_upload"):
+            with sink.stream("output.parquet", content_type="application/octet-stream") as f:
+                write_parquet(df, f, rows_per_group, schema=output_schema(options))
+            streamed.append("output.parquet")
+
+        csv_names = []
+        with timer.stage("csv_upload"):
+            for suffix, part in iter_csv_partitions(df, options):
+                name = f"output{suffix}{csv_extension(options)}"
+                if options.csv_partition != "none":
+                    name = f"csv/{name}"
+                with sink.stream(name, content_type="text/csv") as f:
+                    write_csv(part, f, options)
+                streamed.append(name)
+                csv_names.append(name)
+    except Exception:
+        for name in streamed:
+            sink.remove(name)
+        raise
+
+    return {
+        "csv": None,
+        "parquet": None,
+        "csv_url": sink.object_url(csv_names[0] if len(csv_names) == 1 else "csv/"),
+        "parquet_url": sink.object_url("output.parquet"),
+    }
+
+
+def build_stop_conditions(stop: StopOptions = None) -> List[StopCondition]:
+    conditions = []
+    if stop is not None and stop.survivors_below is not None:
+        conditions.append(survivors_below(stop.survivors_below))
+    if stop is not None and stop.daily_mortality_above is not None:
+        conditions.append(daily_mortality_above(stop.daily_mortality_above))
+    return conditions
+
+def write_table(df: pd.DataFrame, out_dir: str, tank_id: int, base_filename: str,
+                timer: StageTimer = None) -> Dict[str, str]:
+    """Escribe una tabla de resultados (KPIs, agregados diarios) en CSV y Parquet."""
+    timer = timer or NULL_TIMER
+    tank_folder = os.path.join(out_dir, f"tank_{tank_id}")
+    os.makedirs(tank_folder, exist_ok=True)
+    csv_path = os.path.join(tank_folder, f"{base_filename}.csv")
+    pq_path = os.path.join(tank_folder, f"{base_filename}.parquet")
+    with timer.stage("csv_write"):
+        df.to_csv(csv_path, index=False)
+    with timer.stage("parquet_write"):
+        df.to_parquet(pq_path, index=False)
+    return {"csv": csv_path, "parquet": pq_path}
+
+
+def simulate_tank_summary(
+    days: int,
+    config_dict: dict,
+    seed: int,
+    start_time: datetime,
+    tank_id: int,
+    output_mode: str,
+    stop: StopOptions = None,
+    progress_callback=None,
+    timer: StageTimer = None,
+    dt_minutes: int = 1,
+    cancel_token: CancellationToken = None
+):
+    """
+    Corrida sin filas por minuto: output_mode 'daily' devuelve un DataFrame
+    con un día por fila; 'kpis' devuelve el dict de KPIs finales.
+    """
+    timer = timer or NULL_TIMER
+    with timer.stage("env_build"):
+        env = SimulationEnvironment(
+            days=days,
+            config_dict=config_dict,
+            seed=seed,
+            start_time=start_time,
+            tank_id=tank_id,
+            dt_minutes=dt_minutes,
+        )
+    result = run_simulation(
+        env, progress_callback=progress_callback, timer=timer,
+        collector=make_collector(output_mode), stop_conditions=build_stop_conditions(stop),
+        cancel_token=cancel_token
+    )
+    return pd.DataFrame(result) if output_mode == "daily" else result
+
+
 def simulate_tank_data(
     days: int,
     config_dict: dict,
@@ -36,37 +234,141 @@ def simulate_tank_data(
     out_dir: str,
     tank_id: int,
     job_id: str,
-    progress_callback=None
+    progress_callback=None,
+    sink=None,
+    export_options: ExportOptions = None,
+    timer: StageTimer = None,
+    stop: StopOptions = None,
+    dt_minutes: int = 1,
+    cancel_token: CancellationToken = None,
+    chunk_size: int = None,
+    memory_budget_bytes: int = None
 ) -> Tuple[pd.DataFrame, Dict[str, str]]:
-    env = SimulationEnvironment(
-        days=days,
-        config_dict=config_dict,
-        seed=seed,
-        start_time=start_time,
-        tank_id=tank_id,
+    """
+    Simula y exporta las filas por minuto. Con `chunk_size` los chunks del
+    cache server (y sus stats.json/events.json) se generan en un hilo a la
+    vez que se escriben CSV/Parquet (paths["cache"] = carpeta de chunks).
+    paths["rows"] = filas exportadas.
+
+    Con `memory_budget_bytes` las filas se exportan por bloques de días
+    durante la simulación (StreamingExportCollector) y se devuelve
+    (None, paths): el pico de memoria queda acotado por el presupuesto y no
+    depende de `days`. En ese modo se escribe siempre a disco (se ignora `sink`).
+    """
+    timer = timer or NULL_TIMER
+    with timer.stage("env_build"):
+        env = SimulationEnvironment(
+            days=days,
+            config_dict=config_dict,
+            seed=seed,
+            start_time=start_time,
+            tank_id=tank_id,
+            dt_minutes=dt_minutes,
+        )
+
+    if memory_budget_bytes:
+        plan = plan_memory_budget(memory_budget_bytes, env.steps_per_day, chunk_size or CHUNK_SIZE)
+        collector = StreamingExportCollector(out_dir, job_id, export_options, plan, write_chunks=bool(chunk_size), timer=timer)
+        try:
+            paths = run_simulation(
+                env, progress_callback=progress_callback, timer=timer, collector=collector,
+                stop_conditions=build_stop_conditions(stop), cancel_token=cancel_token
+            )
+        finally:
+            collector.close()
+        return None, paths
+
+    rows = run_simulation(
+        env, progress_callback=progress_callback, timer=timer, stop_conditions=build_stop_conditions(stop),
+        cancel_token=cancel_token
     )
+    with timer.stage("dataframe_build"):
+        df = apply_precision(rows_to_dataframe(rows, env), export_options)
+    del rows
+    if not chunk_size:
+        paths = export_dataframe(df, env, out_dir, job_id, sink=sink, options=export_options, timer=timer)
+    else:
+        with ThreadPoolExecutor(max_workers=1) as background:
+            chunking = background.submit(generate_chunks, df, job_id, tank_id, out_dir, chunk_size, timer, RunSummary.for_env(env))
+            paths = export_dataframe(df, env, out_dir, job_id, sink=sink, options=export_options, timer=timer)
+            paths["cache"] = chunking.result()
+    paths["rows"] = len(df)
+    return df, paths
 
-    rows = run_simulation(env, progress_callback=progress_callback)
-    paths = export_results(rows, env, out_dir, job_id)
-    return pd.DataFrame(rows), paths
 
+def sweep_points(payload: SweepPayload) -> List[Dict[str, Any]]:
+    if payload.lhs is not None:
+        return latin_hypercube(payload.lhs.ranges, payload.lhs.n_points, payload.lhs.seed)
+    return expand_grid(payload.grid)
 
-def generate_chunks(df: pd.DataFrame, job_id: str, tank_id: int, out_dir: str, chunk_size=50000):
+def run_sweep_job(
+    payload: SweepPayload,
+    out_dir: str,
+    progress_callback=None,
+    timer: StageTimer = None,
+    cancel_token: CancellationToken = None
+) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Ejecuta el barrido y escribe la tabla de KPIs (una fila por punto) en CSV y Parquet."""
+    timer = timer or NULL_TIMER
+    points = sweep_points(payload)
+    with timer.stage("sweep"):
+        results = run_sweep(
+            payload.preset.model_dump(),
+            points,
+            days=payload.days,
+            seed=payload.seed,
+            start_time=payload.start_time,
+            tank_id=payload.tank_id,
+            max_workers=payload.max_workers,
+            progress_callback=progress_callback,
+            cancel_token=cancel_token,
+            dt_minutes=payload.dt_minutes,
+        )
+    df = pd.DataFrame(results)
+    paths = write_table(df, out_dir, payload.tank_id, f"{payload.job_id}_tank_{payload.tank_id}_sweep", timer)
+    return df, paths
+
+
+def generate_chunks(df: pd.DataFrame, job_id: str, tank_id: int, out_dir: str, chunk_size=CHUNK_SIZE,
+                    timer: StageTimer = None, summary: RunSummary = None):
+    """
+    Chunks JSON del cache server. Con `summary` escribe antes sus
+    stats.json/events.json en la misma carpeta (index.json sigue siendo lo último).
+    """
+    timer = timer or NULL_TIMER
+    if summary is not None:
+        with timer.stage("run_summary"):
+            summary.add(df)
+            summary.write(os.path.join(out_dir, f"tank_{tank_id}", f"{job_id}_cache"))
+    with timer.stage("chunking"):
+        cache_folder = _write_chunks(df, job_id, tank_id, out_dir, chunk_size)
+    timer.add_bytes("chunking", path_size(cache_folder))
+    return cache_folder
+
+def _write_chunks(df: pd.DataFrame, job_id: str, tank_id: int, out_dir: str, chunk_size: int) -> str:
+    """
+    Los chunks son slices sin copia de una única tabla Arrow (que a su vez
+    envuelve los buffers numpy del DataFrame) y se codifican y escriben en
+    paralelo: json_records y la escritura a disco liberan el GIL.
+    """
     tank_folder = os.path.join(out_dir, f"tank_{tank_id}")
     cache_folder = os.path.join(tank_folder, f"{job_id}_cache")
     os.makedirs(cache_folder, exist_ok=True)
 
-    chunks = []
-    total_rows = len(df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    total_rows = table.num_rows
+    starts = range(0, total_rows, chunk_size)
+
+    def _write(index: int) -> str:
+        chunk_path = os.path.join(cache_folder, f"chunk_{index + 1}.json")
+        with open(chunk_path, "wb") as f:
+            f.write(json_records(table.slice(starts[index], chunk_size)))
+        return chunk_path
 
-    for i, start in enumerate(range(0, total_rows, chunk_size)):
-        end = start + chunk_size
-        chunk_df = df.iloc[start:end]
-        chunk_path = os.path.join(cache_folder, f"chunk_{i+1}.json")
-        chunk_df.to_json(chunk_path, orient="records")
-        chunks.append(chunk_path)
+    with ThreadPoolExecutor(max_workers=max(1, min(JSON_WRITER_THREADS, len(starts)))) as pool:
+        chunks = list(pool.map(_write, range(len(starts))))
 
-    # Metadata
+    # Metadata (se escribe al final: su presencia indica chunks completos)
     metadata = {
         "job_id": job_id,
         "rows": total_rows,
@@ -80,9 +382,10 @@ def generate_chunks(df: pd.DataFrame, job_id: str, tank_id: int, out_dir: str, c
     return cache_folder
 
 def check_cache_server_alive(cache_server_url: str) -> bool:
-    print(f"{cache_server_url}/health")
+    import requests  # solo se usa aquí; evita pagar su import en el arranque
+    health_url = f"{cache_server_url}/health"
+    logger.debug(f"Comprobando cache server en {health_url}")
     try:
-        health_url = f"{cache_server_url}/health"
         response = requests.get(health_url, timeout=2)
         return response.status_code == 200
     except Exception:
@@ -0,0 +1,299 @@
+"""
+Ciclo de vida del almacenamiento local (SIMULATIONS_OUT_DIR/tank_{id}/).
+
+Cada job deja entradas con prefijo '{job_id}_' en la carpeta de su tanque
+(Parquet, CSV o carpeta de CSV particionados, carpeta de chunks '_cache' y
+perfil). El gestor:
+
+- construye un manifiesto (manifest.json en la raíz) con tamaño, última
+  modificación y último acceso de cada job;
+- borra Parquet/CSV en cuanto el uploader los sube a MinIO; con keep-hot la
+  carpeta de chunks se conserva para que el cache server la siga sirviendo;
+- expulsa jobs por TTL (sin accesos en STORAGE_TTL_S) y por cuota
+  (STORAGE_QUOTA_BYTES), empezando por el de acceso más antiguo (LRU).
+
+El último acceso es el mtime de la carpeta '_cache', que el cache server
+actualiza (touch_job_folder) en cada petición: así varios procesos lo marcan
+sin coordinarse. Solo depende de la librería estándar.
+
+Se ejecuta como tarea de fondo del cache server o como worker propio:
+
+    python -m common.storage_lifecycle [--once]
+"""
+import shutil
+import tempfile
+import argparse
+from common.common_imports import *
+from common.logger import get_logger
+
+logger = get_logger("StorageLifecycle")
+
+MANIFEST_NAME = "manifest.json"
+CACHE_SUFFIX = "_cache"
+UPLOADED_MARKER = ".uploaded"  # dentro de la carpeta '_cache': los datos ya están en MinIO
+ARTIFACT_SUFFIXES = (CACHE_SUFFIX, "_profile.prof")
+
+
+def job_id_from_entry(name: str) -> Optional[str]:
+    """job_id de una entrada de la carpeta de tanque, o None si no es de un job."""
+    if "_tank_" in name:
+        return name.split("_tank_", 1)[0]
+    for suffix in ARTIFACT_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return None
+
+def path_size(path: str) -> int:
+    """Tamaño en bytes de un archivo o de todos los archivos de una carpeta."""
+    if not path or not os.path.exists(path):
+        return 0
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(folder, name))
+        for folder, _, files in os.walk(path) for name in files
+    )
+
+def remove_path(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+def _link_or_copy(source: str, target: str) -> None:
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copy2(source, target)  # sistema de archivos sin hardlinks
+
+def link_entry(path: str, source_job_id: str, job_id: str) -> str:
+    """
+    Crea la entrada de `job_id` equivalente a `path` ('{source_job_id}_x' ->
+    '{job_id}_x') con hardlinks a sus archivos: los mismos datos sin copiarlos,
+    y cada job borra sus entradas sin tocar las del otro. Una carpeta se
+    recrea con sus archivos enlazados (sin la marca de subida).
+    """
+    name = os.path.basename(path)
+    target = os.path.join(os.path.dirname(path), job_id + name[len(source_job_id):])
+    if os.path.isdir(path):
+        shutil.copytree(path, target, copy_function=_link_or_copy, dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns(UPLOADED_MARKER))
+    else:
+        _link_or_copy(path, target)
+    return target
+
+def job_entries(out_dir: str, tank_id: int, job_id: str) -> List[str]:
+    """
+    Rutas de todas las entradas de un job en su carpeta de tanque. Se compara
+    el job_id completo ('{job_id}_tank_*', '{job_id}_cache', ...), no un
+    prefijo: el job 'abc' no incluye las entradas de 'abc_2'.
+    """
+    tank_folder = os.path.join(out_dir, f"tank_{tank_id}")
+    if not os.path.isdir(tank_folder):
+        return []
+    return [os.path.join(tank_folder, name) for name in sorted(os.listdir(tank_folder))
+            if job_id_from_entry(name) == job_id]
+
+def touch_job_folder(folder: str) -> None:
+    """Marca el acceso a la carpeta de chunks de un job (mtime = ahora)."""
+    try:
+        os.utime(folder)
+    except OSError:
+        pass
+
+
+@dataclass
+class StorageJob:
+    job_id: str
+    tank_id: int
+    paths: List[str]
+    size_bytes: int
+    modified_at: float  # última escritura de cualquier entrada
+    last_access: float  # último acceso desde el cache server (o modified_at)
+    uploaded: bool
+
+    @property
+    def pending_upload(self) -> bool:
+        """Tiene Parquet/CSV locales que aún no se han subido a MinIO."""
+        return not self.uploaded and any(not path.endswith(ARTIFACT_SUFFIXES) for path in self.paths)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "tank_id": self.tank_id,
+            "size_bytes": self.size_bytes,
+            "modified_at": self.modified_at,
+            "last_access": self.last_access,
+            "uploaded": self.uploaded,
+            "pending_upload": self.pending_upload,
+            "entries": [os.path.basename(path) for path in self.paths],
+        }
+
+
+class StorageManager:
+    def __init__(
+        self,
+        out_dir: str = SIMULATIONS_OUT_DIR,
+        ttl_s: float = STORAGE_TTL_S,
+        quota_bytes: int = STORAGE_QUOTA_BYTES,
+        keep_hot: bool = STORAGE_KEEP_HOT,
+        min_age_s: float = STORAGE_MIN_AGE_S
+    ):
+        self.out_dir = out_dir
+        self.ttl_s = ttl_s            # 0 = sin TTL
+        self.quota_bytes = quota_bytes  # 0 = sin cuota
+        self.keep_hot = keep_hot
+        self.min_age_s = min_age_s    # no se toca un job escrito hace menos de esto (puede estar en curso)
+
+    # ---- Manifiesto ----
+    def scan(self) -> Dict[str, StorageJob]:
+        """Recorre las carpetas de tanque y agrupa sus entradas por job."""
+        jobs: Dict[str, StorageJob] = {}
+        if not os.path.isdir(self.out_dir):
+            return jobs
+        for tank_folder in sorted(os.listdir(self.out_dir)):
+            tank_path = os.path.join(self.out_dir, tank_folder)
+            if not tank_folder.startswith("tank_") or not os.path.isdir(tank_path):
+                continue
+            tank_id = int(tank_folder[len("tank_"):])
+            for name in sorted(os.listdir(tank_path)):
+                job_id = job_id_from_entry(name)
+                if job_id is None:
+                    continue
+                path = os.path.join(tank_path, name)
+                try:
+                    accessed = os.path.getmtime(path)
+                    # El mtime de '_cache' es el último acceso; la escritura la fecha index.json
+                    index = os.path.join(path, "index.json")
+                    modified = os.path.getmtime(index) if name.endswith(CACHE_SUFFIX) and os.path.exists(index) else accessed
+                    size = path_size(path)
+                except OSError:
+                    continue  # borrada mientras se recorría
+                job = jobs.setdefault(job_id, StorageJob(job_id, tank_id, [], 0, 0.0, 0.0, False))
+                job.paths.append(path)
+                job.size_bytes += size
+                job.modified_at = max(job.modified_at, modified)
+                if name.endswith(CACHE_SUFFIX):
+                    job.last_access = max(job.last_access, accessed)
+                    job.uploaded = job.uploaded or os.path.exists(os.path.join(path, UPLOADED_MARKER))
+        for job in jobs.values():
+            job.last_access = max(job.last_access, job.modified_at)
+        return jobs
+
+    def write_manifest(self, jobs: Dict[str, StorageJob]) -> Dict[str, Any]:
+        """Escribe manifest.json de forma atómica (tmp + rename) y lo devuelve."""
+        manifest = {
+            "generated_at": time.time(),
+            "total_bytes": sum(job.size_bytes for job in jobs.values()),
+            "quota_bytes": self.quota_bytes,
+            "jobs": sorted((job.as_dict() for job in jobs.values()), key=lambda job: job["last_access"]),
+        }
+        os.makedirs(self.out_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.out_dir, prefix=".manifest_")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.out_dir, MANIFEST_NAME))
+        return manifest
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.out_dir, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # ---- Limpieza tras la subida ----
+    def release_uploaded(self, job_id: str, tank_id: int, uploaded_paths: List[str]) -> List[str]:
+        """
+        Llamado por el uploader al terminar: borra los archivos ya subidos y,
+        sin keep-hot, también el resto del job. Con keep-hot la carpeta de
+        chunks queda marcada como subida y pasa a depender de TTL/cuota.
+        """
+        removed = []
+        for path in uploaded_paths:
+            if path and os.path.exists(path):
+                remove_path(path)
+                removed.append(path)
+        for path in job_entries(self.out_dir, tank_id, job_id):
+            if self.keep_hot and path.endswith(CACHE_SUFFIX):
+                open(os.path.join(path, UPLOADED_MARKER), "w").close()
+                continue
+            if not self.keep_hot:
+                remove_path(path)
+                removed.append(path)
+        return removed
+
+    # ---- Expulsión por TTL y cuota ----
+    def evict_job(self, job: StorageJob) -> None:
+        for path in job.paths:
+            remove_path(path)
+
+    def enforce(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Una pasada de expulsión. TTL: cualquier job sin accesos en ttl_s
+        (también uno con subida pendiente: a esas alturas la subida falló).
+        Cuota: por LRU, solo jobs que no esperan subida, hasta bajar de la
+        cuota. Devuelve el manifiesto resultante con los jobs expulsados.
+        """
+        now = time.time() if now is None else now
+        jobs = self.scan()
+        evicted = []
+
+        def evict(job: StorageJob, reason: str):
+            self.evict_job(job)
+            evicted.append({"job_id": job.job_id, "tank_id": job.tank_id, "size_bytes": job.size_bytes, "reason": reason})
+            del jobs[job.job_id]
+
+        settled = [job for job in jobs.values() if now - job.modified_at >= self.min_age_s]
+        if self.ttl_s:
+            for job in settled:
+                if now - job.last_access > self.ttl_s:
+                    evict(job, "ttl")
+
+        total = sum(job.size_bytes for job in jobs.values())
+        if self.quota_bytes and total > self.quota_bytes:
+            candidates = sorted(
+                (job for job in settled if job.job_id in jobs and not job.pending_upload),
+                key=lambda job: job.last_access
+            )
+            for job in candidates:
+                if total <= self.quota_bytes:
+                    break
+                total -= job.size_bytes
+                evict(job, "quota")
+            if total > self.quota_bytes:
+                logger.warning(f"[!] Almacenamiento sobre cuota tras expulsar: {total} > {self.quota_bytes} bytes")
+
+        manifest = self.write_manifest(jobs)
+        manifest["evicted"] = evicted
+        if evicted:
+            freed = sum(job["size_bytes"] for job in evicted)
+            logger.info(f"[✔] Expulsados {len(evicted)} jobs ({freed} bytes). Total: {manifest['total_bytes']} bytes")
+        return manifest
+
+    def run_forever(self, interval_s: float = STORAGE_SWEEP_INTERVAL_S) -> None:
+        while True:
+            try:
+                self.enforce()
+            except Exception as e:
+                logger.error(f"[!] Error en la pasada de almacenamiento: {e}")
+            time.sleep(interval_s)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Expulsión por TTL/cuota y manifiesto de SIMULATIONS_OUT_DIR")
+    parser.add_argument("--once", action="store_true", help="Una sola pasada e imprime el manifiesto")
+    args = parser.parse_args(argv)
+    manager = StorageManager()
+    if args.once:
+        print(json.dumps(manager.enforce(), indent=2))
+        return 0
+    logger.info(f"[*] Gestionando {manager.out_dir} cada {STORAGE_SWEEP_INTERVAL_S}s")
+    manager.run_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,225 @@
+"""
+Exportación incremental de las filas por minuto con memoria acotada.
+
+StreamingExportCollector recibe cada día de run_simulation y, cada
+`buffer_days`, vacía el bloque a Parquet (un writer abierto toda la
+corrida), CSV (se añade sin cabecera) y chunks JSON del cache server, y
+acumula sus estadísticas/eventos (RunSummary).
+Nunca existen la lista de filas ni el DataFrame completo, y cada chunk se
+codifica por tramos: la memoria depende del tamaño del bloque y del tramo,
+no de `days` ni de CHUNK_SIZE. plan_memory_budget elige ambos a partir de un
+presupuesto de bytes para el proceso entero.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from common.common_imports import *
+from common.models import ExportOptions
+from common.storage_lifecycle import path_size
+from common.run_summary import RunSummary
+from common.export_utils import (
+    minute_timestamps, to_parquet_table, open_parquet_writer, write_csv, csv_extension,
+    iter_csv_partitions, json_records, output_schema, apply_precision
+)
+from tank_simulator.collectors import OutputCollector
+from tank_simulator.instrumentation import StageTimer, NULL_TIMER, current_rss_bytes
+
+# Memoria por fila retenida en un vaciado (bloque de columnas, DataFrame,
+# tabla Arrow, texto CSV) y por fila codificada a JSON a la vez. Medidos con
+# el preset de referencia (~300 B y ~2.5 KB) y redondeados al alza.
+BYTES_PER_BUFFERED_ROW = 512
+BYTES_PER_ENCODED_ROW = 3072
+# Writers abiertos, pools de pyarrow, resto del chunk pendiente y fragmentación
+MEMORY_RESERVE_BYTES = 40 * 2**20
+ENCODE_SHARE = 4  # fracción (1/n) de la memoria disponible para codificar JSON
+
+
+@dataclass
+class MemoryPlan:
+    budget_bytes: int
+    baseline_bytes: int  # RSS del proceso al planificar (intérprete, librerías, entorno)
+    buffer_days: int     # días por vaciado a disco
+    chunk_size: int      # filas por chunk JSON (no cambia el formato del cache server)
+    encode_rows: int     # filas que se codifican a JSON de una vez
+
+def plan_memory_budget(
+    budget_bytes: int,
+    steps_per_day: int,
+    chunk_size: int,
+    baseline_bytes: Optional[int] = None
+) -> MemoryPlan:
+    """
+    Reparte lo que queda de `budget_bytes` tras el RSS actual y una reserva
+    fija: 1/ENCODE_SHARE para codificar JSON y el resto para el bloque de
+    días. Falla si no cabe ni un día.
+    """
+    baseline = current_rss_bytes() if baseline_bytes is None else baseline_bytes
+    available = budget_bytes - baseline - MEMORY_RESERVE_BYTES
+    encode_rows = max(1, min(chunk_size, available // ENCODE_SHARE // BYTES_PER_ENCODED_ROW))
+    buffer_rows = (available - encode_rows * BYTES_PER_ENCODED_ROW) // BYTES_PER_BUFFERED_ROW
+    if buffer_rows < steps_per_day:
+        needed = baseline + MEMORY_RESERVE_BYTES + steps_per_day * BYTES_PER_BUFFERED_ROW * ENCODE_SHARE // (ENCODE_SHARE - 1)
+        raise ValueError(
+            f"Presupuesto de memoria insuficiente: {budget_bytes / 2**20:.0f} MB con "
+            f"{baseline / 2**20:.0f} MB ya en uso; hacen falta al menos {needed / 2**20:.0f} MB"
+        )
+    return MemoryPlan(
+        budget_bytes=budget_bytes,
+        baseline_bytes=baseline,
+        buffer_days=int(buffer_rows // steps_per_day),
+        chunk_size=chunk_size,
+        encode_rows=int(encode_rows),
+    )
+
+
+class StreamingExportCollector(OutputCollector):
+    """
+    Escribe los mismos artefactos que export_dataframe + generate_chunks
+    (mismos nombres y contenido) a medida que avanza la simulación.
+    result() devuelve los paths, con "cache" (si write_chunks) y "rows".
+    """
+    def __init__(
+        self,
+        out_dir: str,
+        job_id: str,
+        options: ExportOptions,
+        plan: MemoryPlan,
+        write_chunks: bool = True,
+        timer: StageTimer = None
+    ):
+        self.out_dir = out_dir
+        self.job_id = job_id
+        self.options = options or ExportOptions()
+        self.plan = plan
+        self.write_chunks = write_chunks
+        self.timer = timer or NULL_TIMER
+
+    def start(self, env) -> None:
+        super().start(env)
+        self.env = env
+        tank_folder = os.path.join(self.out_dir, f"tank_{env.tank_id}")
+        os.makedirs(tank_folder, exist_ok=True)
+        self.base_filename = f"{self.job_id}_tank_{env.tank_id}_seed{env.seed}"
+        self.pq_path = os.path.join(tank_folder, f"{self.base_filename}.parquet")
+        if self.options.csv_partition == "none":
+            self.csv_path = os.path.join(tank_folder, f"{self.base_filename}{csv_extension(self.options)}")
+            self.csv_folder = tank_folder
+        else:
+            self.csv_path = os.path.join(tank_folder, f"{self.base_filename}_csv")
+            self.csv_folder = self.csv_path
+            os.makedirs(self.csv_folder, exist_ok=True)
+        self.cache_folder = os.path.join(tank_folder, f"{self.job_id}_cache")
+        if self.write_chunks:
+            os.makedirs(self.cache_folder, exist_ok=True)
+
+        self.blocks: List[Dict[str, np.ndarray]] = []
+        self.rows = 0
+        self.parquet_writer = None
+        self.csv_started: Set[str] = set()
+        self.pending_chunk: Optional[pd.DataFrame] = None
+        self.n_chunks = 0
+        self.summary = RunSummary.for_env(env)
+
+    def add_day(self, day, state) -> None:
+        self.blocks.append(apply_precision(day, self.options))
+        if len(self.blocks) >= self.plan.buffer_days:
+            self._flush()
+
+    def result(self, env, state, stop_reason: str) -> Dict[str, Any]:
+        self._flush()
+        if self.write_chunks:
+            with self.timer.stage("run_summary"):
+                self.summary.write(self.cache_folder)
+            with self.timer.stage("chunking"):
+                if self.pending_chunk is not None:
+                    self._write_chunk(self.pending_chunk)
+                    self.pending_chunk = None
+                with open(os.path.join(self.cache_folder, "index.json"), "w") as f:
+                    json.dump({
+                        "job_id": self.job_id,
+                        "rows": self.rows,
+                        "chunks": self.n_chunks,
+                        "chunk_size": self.plan.chunk_size
+                    }, f, indent=2)
+        self.close()
+        self.timer.add_bytes("csv_write", path_size(self.csv_path))
+        self.timer.add_bytes("parquet_write", path_size(self.pq_path))
+        if self.write_chunks:
+            self.timer.add_bytes("chunking", path_size(self.cache_folder))
+        paths = {"csv": self.csv_path, "parquet": self.pq_path, "rows": self.rows}
+        if self.write_chunks:
+            paths["cache"] = self.cache_folder
+        return paths
+
+    def close(self) -> None:
+        """Cierra el writer Parquet (también si la corrida se interrumpe)."""
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+
+    # ---- Vaciado de un bloque de días ----
+    def _flush(self) -> None:
+        if not self.blocks:
+            return
+        cols = {key: np.concatenate([block[key] for block in self.blocks]) for key in self.blocks[0]}
+        self.blocks = []
+        df = pd.DataFrame(cols, copy=False)
+        del cols
+        df.insert(0, "timestamp_utc", minute_timestamps(self.env.start_time, df["minute_index"].to_numpy(), self.dt_minutes))
+        self.rows += len(df)
+
+        with self.timer.stage("csv_write"):
+            self._append_csv(df)
+        with self.timer.stage("parquet_write"):
+            table = to_parquet_table(df, output_schema(self.options))
+            if self.parquet_writer is None:
+                self.parquet_writer = open_parquet_writer(self.pq_path, table.schema)
+            self.parquet_writer.write_table(table, row_group_size=self.env.steps_per_day)
+            del table
+        if self.write_chunks:
+            with self.timer.stage("run_summary"):
+                self.summary.add(df)
+            with self.timer.stage("chunking"):
+                self._append_chunks(df)
+
+    def _append_csv(self, df: pd.DataFrame) -> None:
+        for suffix, part in iter_csv_partitions(df, self.options):
+            part_path = os.path.join(self.csv_folder, f"{self.base_filename}{suffix}{csv_extension(self.options)}")
+            header = part_path not in self.csv_started
+            with open(part_path, "wb" if header else "ab") as f:
+                write_csv(part, f, self.options, header=header)
+            self.csv_started.add(part_path)
+
+    def _append_chunks(self, df: pd.DataFrame) -> None:
+        """Chunks de exactamente chunk_size filas; el resto espera al siguiente bloque."""
+        chunk_size = self.plan.chunk_size
+        start = 0
+        if self.pending_chunk is not None:
+            start = chunk_size - len(self.pending_chunk)
+            head = pd.concat([self.pending_chunk, df.iloc[:start]], ignore_index=True)
+            self.pending_chunk = None
+            if len(head) < chunk_size:
+                self.pending_chunk = head
+                return
+            self._write_chunk(head)
+        full_end = start + (len(df) - start) // chunk_size * chunk_size
+        if full_end > start:
+            table = pa.Table.from_pandas(df.iloc[start:full_end], preserve_index=False)
+            for offset in range(0, table.num_rows, chunk_size):
+                self._write_table_chunk(table.slice(offset, chunk_size))
+        if full_end < len(df):
+            self.pending_chunk = df.iloc[full_end:].copy()
+
+    def _write_chunk(self, df: pd.DataFrame) -> None:
+        self._write_table_chunk(pa.Table.from_pandas(df, preserve_index=False))
+
+    def _write_table_chunk(self, table: pa.Table) -> None:
+        """Codifica el chunk por tramos de encode_rows y une sus registros en un único array JSON."""
+        self.n_chunks += 1
+        with open(os.path.join(self.cache_folder, f"chunk_{self.n_chunks}.json"), "wb") as f:
+            f.write(b"[")
+            for offset in range(0, table.num_rows, self.plan.encode_rows):
+                if offset:
+                    f.write(b",")
+                f.write(memoryview(json_records(table.slice(offset, self.plan.encode_rows)))[1:-1])
+            f.write(b"]")
@@ -0,0 +1,44 @@
+"""
+Cancelación cooperativa: run_simulation consulta el token en cada cierre de
+día y, si el job se canceló o venció su plazo, lanza SimulationCancelled.
+La consulta externa (p.ej. una clave de Redis) se hace como mucho una vez
+cada `check_interval_s` para no añadir una ida y vuelta por día simulado.
+"""
+from .common_imports import *
+
+CANCEL_REASONS = ("cancelled", "timeout")
+
+
+class SimulationCancelled(Exception):
+    """La simulación se detuvo por cancelación ('cancelled') o por plazo vencido ('timeout')."""
+    def __init__(self, reason: str):
+        super().__init__(f"Simulación detenida: {reason}")
+        self.reason = reason
+
+
+class CancellationToken:
+    def __init__(
+        self,
+        deadline_s: Optional[float] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+        check_interval_s: float = 1.0
+    ):
+        self.deadline = time.monotonic() + deadline_s if deadline_s else None
+        self.is_cancelled = is_cancelled
+        self.check_interval_s = check_interval_s
+        self.cancelled = False
+        self._last_check = None
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def raise_if_cancelled(self) -> None:
+        now = time.monotonic()
+        if not self.cancelled and self.is_cancelled is not None:
+            if self._last_check is None or now - self._last_check >= self.check_interval_s:
+                self._last_check = now
+                self.cancelled = bool(self.is_cancelled())
+        if self.cancelled:
+            raise SimulationCancelled("cancelled")
+        if self.deadline is not None and now > self.deadline:
+            raise SimulationCancelled("timeout")
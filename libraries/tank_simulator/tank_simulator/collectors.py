@@ -0,0 +1,107 @@
+"""
+Colectores de salida de run_simulation. Reciben cada día ya finalizado
+(columnas numpy con sanidad y redondeo) y deciden qué se conserva:
+todas las filas, agregados diarios o solo los KPIs finales.
+Cada fila es un paso de dt_minutes: los totales en minutos y kg se escalan por dt.
+"""
+from .common_imports import *
+
+from .config_models import SimulationState, SimStateColumns, MINUTES_PER_DAY
+from .kpis import summarize_kpis
+
+OUTPUT_MODES = ("rows", "daily", "kpis")
+
+
+def columns_to_rows(cols: SimStateColumns) -> List[Dict[str, Any]]:
+    keys = list(cols.keys())
+    return [dict(zip(keys, values)) for values in zip(*(cols[k].tolist() for k in keys))]
+
+
+class OutputCollector:
+    """Interfaz: start() antes del bucle, add_day() por cada día procesado y result() al terminar."""
+    dt_minutes = 1
+
+    def start(self, env) -> None:
+        self.dt_minutes = env.dt_minutes
+
+    def add_day(self, day: SimStateColumns, state: SimulationState) -> None:
+        raise NotImplementedError
+
+    def result(self, env, state: SimulationState, stop_reason: str) -> Any:
+        raise NotImplementedError
+
+
+class RowCollector(OutputCollector):
+    """Una fila dict por minuto (comportamiento histórico de run_simulation)."""
+    def __init__(self):
+        self.rows: List[Dict[str, Any]] = []
+
+    def add_day(self, day: SimStateColumns, state: SimulationState) -> None:
+        self.rows.extend(columns_to_rows(day))
+
+    def result(self, env, state: SimulationState, stop_reason: str) -> List[Dict[str, Any]]:
+        return self.rows
+
+
+class DailyCollector(OutputCollector):
+    """Una fila de agregados por día; no se materializa ninguna fila por minuto."""
+    def __init__(self):
+        self.days: List[Dict[str, Any]] = []
+
+    def add_day(self, day: SimStateColumns, state: SimulationState) -> None:
+        summary = {"day": int(day["minute_index"][0] // MINUTES_PER_DAY), "minutes": len(day["minute_index"]) * self.dt_minutes}
+        for key in ("temperature_C", "salinity_ppt", "oxygen_mgL", "pH"):
+            summary[f"{key}_mean"] = round(float(day[key].mean()), 4)
+            summary[f"{key}_min"] = float(day[key].min())
+            summary[f"{key}_max"] = float(day[key].max())
+        summary.update({
+            "feed_kg": round(float(day["feed_kg_min"].sum()) * self.dt_minutes, 6),
+            "deaths": int(day["deaths"].sum()),
+            "stock_add": int(day["stock_add"].sum()),
+            "survivors": int(day["survivors"][-1]),
+            "waterchanges": int(day["waterchange"].sum()),
+            "feed_spike_minutes": int(day["feed_spike"].sum()) * self.dt_minutes,
+            "weight_start_g": float(day["current_weight_g"][0]),
+            "weight_end_g": round(state.current_weight_g, 4),
+            "biomass_start_kg": float(day["biomass_kg"][0]),
+        })
+        self.days.append(summary)
+
+    def result(self, env, state: SimulationState, stop_reason: str) -> List[Dict[str, Any]]:
+        return self.days
+
+
+class KpiCollector(OutputCollector):
+    """Solo acumuladores: memoria constante sin importar la duración de la corrida."""
+    def __init__(self):
+        self.minutes = 0
+        self.total_feed_kg = 0.0
+        self.total_stocked = 0
+        self.final_survivors = None
+
+    def add_day(self, day: SimStateColumns, state: SimulationState) -> None:
+        self.minutes += len(day["minute_index"]) * self.dt_minutes
+        self.total_feed_kg += float(day["feed_kg_min"].sum()) * self.dt_minutes
+        self.total_stocked += int(day["stock_add"].sum())
+        self.final_survivors = int(day["survivors"][-1])
+
+    def result(self, env, state: SimulationState, stop_reason: str) -> Dict[str, Any]:
+        if self.final_survivors is None:
+            return {}
+        return {
+            **summarize_kpis(
+                env,
+                minutes=self.minutes,
+                final_survivors=self.final_survivors,
+                final_weight_g=state.current_weight_g,
+                total_feed_kg=self.total_feed_kg,
+                total_stocked=self.total_stocked,
+            ),
+            "stop_reason": stop_reason,
+        }
+
+
+def make_collector(output_mode: str) -> OutputCollector:
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"output_mode inválido '{output_mode}'. Opciones: {OUTPUT_MODES}")
+    return {"rows": RowCollector, "daily": DailyCollector, "kpis": KpiCollector}[output_mode]()
@@ -1,14 +1,15 @@
 # ==== Librerías base ====
 import os
 import json
+import time
+import importlib
 import numpy as np
-import pandas as pd
 
 # ==== Fechas y tiempo ====
 from datetime import datetime, timedelta
 
 # ==== Tipos genéricos ====
-from typing import List, Dict, Any, Set, Callable, Optional, Tuple
+from typing import List, Dict, Any, Set, Callable, Optional, Tuple, Union
 
 # ==== Utilidades ====
 from functools import partial
@@ -17,16 +18,28 @@ from functools import partial
 from dataclasses import dataclass
 from pydantic import BaseModel, ValidationError
 
+# ==== Importaciones perezosas ====
+# El núcleo de la simulación solo usa numpy; pandas queda disponible como
+# atributo perezoso (common_imports.pd) para quien lo necesite.
+_LAZY_MODULES = {"pd": "pandas"}
+
+def __getattr__(name: str):
+    if name not in _LAZY_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_LAZY_MODULES[name])
+    globals()[name] = module
+    return module
+
 
 __all__ = [
     # Librerías base
-    "os", "json", "np", "pd",
+    "os", "json", "time", "np",
 
     # Tiempo
     "datetime", "timedelta",
 
     # Tipado
-    "List", "Dict", "Any", "Set", "Callable", "Optional", "Tuple",
+    "List", "Dict", "Any", "Set", "Callable", "Optional", "Tuple", "Union",
 
     # Utilidades
     "partial",
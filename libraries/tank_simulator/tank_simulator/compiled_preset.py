@@ -0,0 +1,181 @@
+from .common_imports import *
+from hashlib import sha256
+from functools import lru_cache
+from .config_models import (
+    TemperatureConfig, SalinityConfig, OxygenConfig, pHConfig, FeedConfig,
+    MortalityConfig, SanityConfig, GrowthConfig
+)
+from .preset_schema import PresetSchema
+
+# Presets distintos que se mantienen compilados en memoria por proceso
+PRESET_CACHE_SIZE = int(os.environ.get("TANK_SIMULATOR_PRESET_CACHE_SIZE", "64"))
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledPreset:
+    """
+    Preset validado una sola vez y convertido a las configs inmutables del
+    simulador. No depende de la semilla ni de los días: el mismo objeto sirve
+    para todos los entornos que usen ese preset. Se compara y hashea por
+    `preset_hash`.
+    """
+    preset_hash: str
+    params: PresetSchema
+    volume_L: float
+    initial_N: int
+    temp_config: TemperatureConfig
+    sal_config: SalinityConfig
+    o2_config: OxygenConfig
+    ph_config: pHConfig
+    feed_config: FeedConfig
+    mort_config: MortalityConfig
+    growth_config: GrowthConfig
+    sanity_config: SanityConfig
+
+    def __hash__(self) -> int:
+        return hash(self.preset_hash)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CompiledPreset):
+            return NotImplemented
+        return self.preset_hash == other.preset_hash
+
+
+def canonical_preset_json(config_dict: dict) -> str:
+    """JSON estable del preset (claves ordenadas) para calcular su hash."""
+    return json.dumps(config_dict, sort_keys=True, separators=(",", ":"), default=str)
+
+def preset_hash(config_dict: dict) -> str:
+    return sha256(canonical_preset_json(config_dict).encode()).hexdigest()
+
+
+def compile_preset(config_dict: dict, digest: Optional[str] = None) -> CompiledPreset:
+    """Valida el preset con PresetSchema y construye sus configs (sin caché)."""
+    # 1. VALIDACIÓN ESTRICTA (Estilo "Interface" TS)
+    #    Aquí usamos Pydantic para validar todo el diccionario.
+    try:
+        # Intenta crear el modelo Pydantic a partir del diccionario
+        params_model = PresetSchema(**config_dict)
+    except ValidationError as e:
+        # Si falla, Pydantic da un error MUY detallado
+        print("="*50)
+        print("¡ERROR! El preset de configuración es inválido.")
+        print("Revisa que TODAS las claves estén presentes y tengan el tipo correcto.")
+        print("="*50)
+        raise ValueError(f"Error de validación en el preset:\n{e}")
+    
+    # 2. Crear todas las Configs (ISP)
+    #    Ahora leemos desde 'params_model.clave' en lugar de 'params["clave"]'.
+    #    Esto es 100% seguro porque Pydantic ya lo validó.
+    try:
+        volume_L = params_model.V
+        initial_N = params_model.initial_N 
+
+        temp_config = TemperatureConfig(
+            base=params_model.T_base,
+            amplitude=params_model.A_T,
+            sigma=params_model.sigma_T,
+            drift_per_day=params_model.drift_T_per_day
+        )
+        sal_config = SalinityConfig(
+            base=params_model.S_base,
+            drift_per_min=params_model.drift_S_per_min,
+            sigma=params_model.sigma_S,
+            k_evap_per_deg=params_model.k_evap_per_deg,
+            waterchange_reduction=params_model.waterchange_reduction
+        )
+        o2_config = OxygenConfig(
+            base=params_model.O2_base, amplitude=params_model.A_O2, sigma=params_model.sigma_O2,
+            k_temp=params_model.k_T_O2, hypoxia_min=params_model.hypoxia_min,
+            hypoxia_max=params_model.hypoxia_max, floor=params_model.O2_floor
+        )
+        ph_config = pHConfig(
+             base=params_model.pH_base, amplitude=params_model.A_pH,
+             sigma=params_model.sigma_pH, phase=params_model.pH_phase,
+             k_feed_acid=params_model.k_feed_acid, k_o2_acid=params_model.k_O2_pH,
+             o2_acid_threshold=params_model.O2_pH_threshold,
+             waterchange_recovery_factor=params_model.pH_recovery_on_waterchange,
+             smoothing_alpha=params_model.pH_smoothing_alpha,
+             min_limit=params_model.pH_min_limit,
+             max_limit=params_model.pH_max_limit
+        )
+        feed_config = FeedConfig(
+            base_kg_per_day=params_model.Feed_base,
+            spike_multiplier=params_model.feed_spike_multiplier,
+            noise_min_factor=params_model.feed_noise_min_factor,
+            noise_max_factor=params_model.feed_noise_max_factor,
+            min_feed_kg_min=params_model.feed_min_kg_min
+        )
+        mort_config = MortalityConfig(
+            weight_o2=params_model.alpha, weight_temp=params_model.beta,
+            weight_density=params_model.gamma,
+            o2_critical_threshold=params_model.O2_crit,
+            temp_optimal_threshold=params_model.T_opt,
+            density_optimal_threshold=params_model.rho_opt,
+            shock_factor=params_model.shock_factor,
+            o2_shock_threshold=params_model.O2_crit_for_shock,
+            density_shock_threshold=params_model.density_crit_for_shock,
+            kappa_scaler=params_model.kappa,
+            max_mortality_rate=params_model.max_mortality_rate,
+            weight_salinity=params_model.weight_salinity,
+            salinity_optimal_min=params_model.salinity_optimal_min,
+            salinity_optimal_max=params_model.salinity_optimal_max,
+            salinity_lethal_low=params_model.salinity_lethal_low,
+            salinity_lethal_high=params_model.salinity_lethal_high
+        )
+        growth_config = GrowthConfig(
+            initial_weight_g=params_model.initial_weight_g,
+            target_weight_g=params_model.target_weight_g,
+            fcr=params_model.fcr,
+            feed_table=tuple(tuple(step) for step in params_model.feed_table),
+            temp_min_growth=params_model.temp_min_growth,
+            temp_optimal_growth=params_model.temp_optimal_growth,
+            temp_max_growth=params_model.temp_max_growth
+        )
+        sanity_config = SanityConfig(
+            temp_crit_for_ph=params_model.sanity_temp_crit_for_ph,
+            ph_min_at_crit_temp=params_model.sanity_ph_min_at_crit_temp,
+            ph_fix_noise_min=params_model.sanity_ph_fix_noise_min,
+            ph_fix_noise_max=params_model.sanity_ph_fix_noise_max,
+            o2_crit_for_ph=params_model.sanity_o2_crit_for_ph,
+            ph_max_at_crit_o2=params_model.sanity_ph_max_at_crit_o2,
+            density_crit_for_o2=params_model.sanity_density_crit_for_o2,
+            o2_max_at_crit_density=params_model.sanity_o2_max_at_crit_density,
+            o2_fix_noise_min=params_model.sanity_o2_fix_noise_min,
+            o2_fix_noise_max=params_model.sanity_o2_fix_noise_max,
+            salinity_max_with_wc=params_model.sanity_salinity_max_with_wc,
+            sal_fix_noise_min=params_model.sanity_sal_fix_noise_min,
+            sal_fix_noise_max=params_model.sanity_sal_fix_noise_max,
+            max_mortality_ratio=params_model.sanity_max_mortality_ratio
+        )
+    except AttributeError as e:
+         # Esto solo pasaría si PresetSchema y los Dataclasses no coinciden
+         raise Exception(f"Error interno al asignar parámetros validados: {e}")
+
+    return CompiledPreset(
+        preset_hash=digest or preset_hash(config_dict),
+        params=params_model,
+        volume_L=volume_L,
+        initial_N=initial_N,
+        temp_config=temp_config,
+        sal_config=sal_config,
+        o2_config=o2_config,
+        ph_config=ph_config,
+        feed_config=feed_config,
+        mort_config=mort_config,
+        growth_config=growth_config,
+        sanity_config=sanity_config,
+    )
+
+
+def get_compiled_preset(config_dict: dict) -> CompiledPreset:
+    """
+    Devuelve el preset compilado desde una LRU indexada por su hash. Los
+    presets repetidos (lotes, ensembles) solo se validan la primera vez.
+    """
+    canonical = canonical_preset_json(config_dict)
+    return _compile_cached(sha256(canonical.encode()).hexdigest(), canonical)
+
+@lru_cache(maxsize=PRESET_CACHE_SIZE)
+def _compile_cached(digest: str, canonical: str) -> CompiledPreset:
+    return compile_preset(json.loads(canonical), digest)
@@ -5,10 +5,32 @@ NoiseSource = Callable[[float, float], float]
 UniformNoiseSource = Callable[[float, float], float]
 BinomialSource = Callable[[int, float], int]
 SimStateRow = Dict[str, Any]
+SimStateColumns = Dict[str, np.ndarray]
+UniformNoiseArraySource = Callable[[float, float, int], np.ndarray]
 
 # --- CONSTANTES GLOBALES ---
 MINUTES_PER_DAY = 1440.0
 
+# Columnas de salida y sus decimales (None = entero/booleano, sin redondeo)
+OUTPUT_COLUMNS: Dict[str, Optional[int]] = {
+    "tank_id": None,
+    "minute_index": None,
+    "temperature_C": 4,
+    "salinity_ppt": 4,
+    "oxygen_mgL": 3,
+    "pH": 3,
+    "feed_kg_min": 6,
+    "density_shrimp_L": 4,
+    "survivors": None,
+    "deaths": None,
+    "current_weight_g": 4,
+    "biomass_kg": 4,
+    "waterchange": None,
+    "feed_spike": None,
+    "stock_add": None,
+}
+BOOLEAN_OUTPUT_COLUMNS = ("waterchange", "feed_spike")
+
 # --- DEFINICIONES DE CONFIGURACIÓN ---
 @dataclass(frozen=True)
 class TemperatureConfig:
@@ -100,10 +122,28 @@ class SanityConfig:
     sal_fix_noise_max: float
     max_mortality_ratio: float 
 
+@dataclass(frozen=True)
+class SanityRule:
+    """
+    Regla de sanidad registrable. Puede tener implementación escalar (una fila
+    dict) y/o vectorizada (columnas numpy de un bloque de filas); el entorno
+    adapta la que falte.
+    """
+    name: str
+    scalar: Optional[Callable[[SimStateRow], SimStateRow]] = None
+    vectorized: Optional[Callable[[SimStateColumns], SimStateColumns]] = None
+
 @dataclass
 class SimulationState:
-    """Contiene el estado mutable de la simulación que cambia cada minuto."""
-    timestamp: datetime
+    """
+    Estado mutable de la simulación que cambia cada minuto. Se actualiza en
+    sitio (simulation_step, simulate_day_fused) en vez de crear uno por paso;
+    con __slots__ no lleva __dict__ (declarados a mano: slots=True pide 3.10).
+    """
+    __slots__ = (
+        "temperature", "salinity", "oxygen", "ph", "feed_spike_remaining",
+        "survivors", "density", "current_weight_g", "biomass_kg",
+    )
     temperature: float
     salinity: float
     oxygen: float
@@ -1,9 +1,11 @@
 from .common_imports import *
+import math
 
 from .config_models import (
     TemperatureConfig, SalinityConfig, OxygenConfig, pHConfig, FeedConfig,
     MortalityConfig, SanityConfig, GrowthConfig,
     NoiseSource, UniformNoiseSource, BinomialSource, SimStateRow,
+    SimStateColumns, UniformNoiseArraySource,
     MINUTES_PER_DAY
 )
 
@@ -21,7 +23,7 @@ def calculate_sinusoidal_temperature(
 ) -> float:
     """Calcula la temperatura (°C) en t_min usando un modelo sinusoidal."""
     minute_of_day = t_min % 1440
-    daily = config.amplitude * np.sin(2 * np.pi * minute_of_day / 1440.0 + phase)
+    daily = config.amplitude * math.sin(2 * math.pi * minute_of_day / 1440.0 + phase)
     drift = config.drift_per_day * (t_min / 1440.0)    
     noise = noise_source(0, config.sigma) 
     
@@ -32,12 +34,16 @@ def calculate_salinity_delta(
     noise_source: NoiseSource,
     temp_above_base: float,
     waterchange_active: bool,
+    dt_minutes: int = 1,
 ) -> float:
-    """Calcula el *cambio* (delta) en salinidad para un minuto."""
-    delta_evap = config.k_evap_per_deg * max(0.0, temp_above_base)
-    delta_drift = config.drift_per_min
+    """
+    Calcula el *cambio* (delta) en salinidad para un paso de dt_minutes.
+    Paseo aleatorio: deriva y evaporación escalan con dt, el ruido con sqrt(dt).
+    """
+    delta_evap = config.k_evap_per_deg * max(0.0, temp_above_base) * dt_minutes
+    delta_drift = config.drift_per_min * dt_minutes
     delta_repl = config.waterchange_reduction if waterchange_active else 0.0
-    noise = noise_source(0, config.sigma)
+    noise = noise_source(0, config.sigma * np.sqrt(dt_minutes))
         
     return delta_evap + delta_drift - delta_repl + noise
 
@@ -52,7 +58,7 @@ def calculate_sinusoidal_oxygen(
     temp_above_base: float
 ) -> float:
     """Calcula el O2 'normal' (sinusoidal, afectado por T)."""
-    diurnal = config.amplitude * np.sin(2 * np.pi * (t_min % 1440) / 1440)
+    diurnal = config.amplitude * math.sin(2 * math.pi * (t_min % 1440) / 1440)
     noise = noise_source(0, config.sigma)
     temp_effect = config.k_temp * temp_above_base
     
@@ -72,7 +78,7 @@ def apply_oxygen_floor(o2_value: float, config: OxygenConfig) -> float:
 def calculate_ph_diurnal_delta(t_min: int, config: pHConfig) -> float:
     """Calcula el delta de pH basado en el ciclo diurno (sinusoidal)."""
     minute_of_day = t_min % 1440
-    return config.amplitude * np.sin(2 * np.pi * minute_of_day / 1440.0 + config.phase)
+    return config.amplitude * math.sin(2 * math.pi * minute_of_day / 1440.0 + config.phase)
 
 def calculate_ph_feed_delta(feed_t_kg_min: float, config: pHConfig) -> float:
     """Calcula el delta de pH basado en la alimentación."""
@@ -105,12 +111,19 @@ def apply_ph_waterchange_recovery(
 def apply_ph_smoothing(
     current_ph_calculated: float, 
     prev_ph_state: float, 
-    config: pHConfig
+    config: pHConfig,
+    dt_minutes: int = 1
 ) -> float:
     """Suaviza el nuevo valor calculado con el estado anterior."""
-    alpha = config.smoothing_alpha
+    alpha = scale_smoothing_alpha(config.smoothing_alpha, dt_minutes)
     return (alpha * current_ph_calculated) + ((1 - alpha) * prev_ph_state)
 
+def scale_smoothing_alpha(alpha: float, dt_minutes: int) -> float:
+    """Alpha equivalente a aplicar el suavizado por minuto dt_minutes veces seguidas."""
+    if dt_minutes == 1:
+        return alpha
+    return 1.0 - (1.0 - alpha) ** dt_minutes
+
 def apply_ph_limits(ph_value: float, config: pHConfig) -> float:
     """Aplica los límites (suelo/techo) realistas al valor de pH."""
     return max(config.min_limit, min(config.max_limit, ph_value))
@@ -136,10 +149,11 @@ def calculate_feed_rate_kg_min(
     return max(config.min_feed_kg_min, total_feed)
 
 def update_feed_spike_state(
-    current_spike_remaining_min: int
+    current_spike_remaining_min: int,
+    dt_minutes: int = 1
 ) -> int:
-    """Actualiza el estado (contador) del spike."""
-    return max(0, current_spike_remaining_min - 1)
+    """Actualiza el estado (contador, en minutos) del spike."""
+    return max(0, current_spike_remaining_min - dt_minutes)
 
 def calculate_o2_stress_penalty(
     o2_t: float, 
@@ -185,7 +199,7 @@ def convert_risk_to_mortality_rate(
     """Convierte el 'risk_score' (r) a tasa (m) vía sigmoide, risk_score = 0 DEBE producir m_rate = 0."""
     if risk_score <= 0:
         return 0.0
-    sigmoid_risk = 1.0 / (1.0 + np.exp(-risk_score))
+    sigmoid_risk = 1.0 / (1.0 + math.exp(-risk_score))
     scaled_risk = (sigmoid_risk - 0.5) * 2.0
     
     return config.kappa_scaler * scaled_risk
@@ -197,6 +211,12 @@ def apply_mortality_limit(
     """RESPONSABILIDAD: Aplica un límite superior (techo) a la tasa."""
     return min(rate, config.max_mortality_rate)
 
+def scale_mortality_rate(rate_per_min: float, dt_minutes: int) -> float:
+    """Probabilidad de morir durante dt_minutes a partir de la tasa por minuto."""
+    if dt_minutes == 1:
+        return rate_per_min
+    return 1.0 - (1.0 - rate_per_min) ** dt_minutes
+
 def calculate_deaths_deterministic(
     n_previous: int, 
     mortality_rate: float
@@ -295,6 +315,70 @@ def apply_sanity_mortality_check(
         return new_row
     return row
 
+# --- REGLAS DE SANIDAD VECTORIZADAS (máscaras sobre las columnas de un bloque) ---
+
+def apply_sanity_temp_ph_check_vectorized(
+    cols: SimStateColumns,
+    config: SanityConfig,
+    noise: UniformNoiseArraySource
+) -> SimStateColumns:
+    """Versión vectorizada de apply_sanity_temp_ph_check."""
+    mask = (cols["temperature_C"] > config.temp_crit_for_ph) & (cols["pH"] < config.ph_min_at_crit_temp)
+    n = int(np.count_nonzero(mask))
+    if n == 0:
+        return cols
+    ph = cols["pH"].copy()
+    ph[mask] = config.ph_min_at_crit_temp + noise(config.ph_fix_noise_min, config.ph_fix_noise_max, n)
+    return {**cols, "pH": ph}
+
+def apply_sanity_o2_ph_check_vectorized(
+    cols: SimStateColumns,
+    config: SanityConfig
+) -> SimStateColumns:
+    """Versión vectorizada de apply_sanity_o2_ph_check."""
+    mask = (cols["oxygen_mgL"] < config.o2_crit_for_ph) & (cols["pH"] > config.ph_max_at_crit_o2)
+    if not mask.any():
+        return cols
+    return {**cols, "pH": np.where(mask, config.ph_max_at_crit_o2, cols["pH"])}
+
+def apply_sanity_density_o2_check_vectorized(
+    cols: SimStateColumns,
+    config: SanityConfig,
+    noise: UniformNoiseArraySource
+) -> SimStateColumns:
+    """Versión vectorizada de apply_sanity_density_o2_check."""
+    mask = (cols["density_shrimp_L"] > config.density_crit_for_o2) & (cols["oxygen_mgL"] > config.o2_max_at_crit_density)
+    n = int(np.count_nonzero(mask))
+    if n == 0:
+        return cols
+    o2 = cols["oxygen_mgL"].copy()
+    o2[mask] = config.o2_max_at_crit_density - noise(config.o2_fix_noise_min, config.o2_fix_noise_max, n)
+    return {**cols, "oxygen_mgL": o2}
+
+def apply_sanity_waterchange_salinity_check_vectorized(
+    cols: SimStateColumns,
+    config: SanityConfig,
+    noise: UniformNoiseArraySource
+) -> SimStateColumns:
+    """Versión vectorizada de apply_sanity_waterchange_salinity_check."""
+    mask = cols["waterchange"].astype(bool) & (cols["salinity_ppt"] > config.salinity_max_with_wc)
+    n = int(np.count_nonzero(mask))
+    if n == 0:
+        return cols
+    sal = cols["salinity_ppt"].copy()
+    sal[mask] = config.salinity_max_with_wc + noise(config.sal_fix_noise_min, config.sal_fix_noise_max, n)
+    return {**cols, "salinity_ppt": sal}
+
+def apply_sanity_mortality_check_vectorized(
+    cols: SimStateColumns,
+    config: SanityConfig
+) -> SimStateColumns:
+    """Versión vectorizada de apply_sanity_mortality_check."""
+    max_deaths = (cols["survivors"] * config.max_mortality_ratio).astype(np.int64)
+    if not (cols["deaths"] > max_deaths).any():
+        return cols
+    return {**cols, "deaths": np.minimum(cols["deaths"], max_deaths)}
+
 def calculate_daily_growth(
     current_weight_g: float,
     feed_eaten_today_kg: float,
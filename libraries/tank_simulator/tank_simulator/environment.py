@@ -1,166 +1,142 @@
 from .common_imports import *
+from dataclasses import replace
 # Importar nuestros módulos locales
 # from presets import SEASON_PRESETS
 from .config_models import (
-    TemperatureConfig, SalinityConfig, OxygenConfig, pHConfig, FeedConfig,
-    MortalityConfig, SanityConfig, GrowthConfig, SimulationState,
-    MINUTES_PER_DAY
+    SimulationState, SanityRule, SimStateRow, SimStateColumns, MINUTES_PER_DAY
 )
 from .preset_schema import PresetSchema
+from .compiled_preset import CompiledPreset, get_compiled_preset
+from .kernels import KERNEL_BACKENDS, DEFAULT_KERNEL_BACKEND
+from .random_streams import spawn_streams
 
 # Importar las funciones de cálculo que necesita para generar schedules
 from .core_functions import (
     calculate_density,
     apply_sanity_temp_ph_check, apply_sanity_o2_ph_check,
     apply_sanity_density_o2_check, apply_sanity_waterchange_salinity_check,
-    apply_sanity_mortality_check
+    apply_sanity_mortality_check,
+    apply_sanity_temp_ph_check_vectorized, apply_sanity_o2_ph_check_vectorized,
+    apply_sanity_density_o2_check_vectorized, apply_sanity_waterchange_salinity_check_vectorized,
+    apply_sanity_mortality_check_vectorized,
+    scale_mortality_rate
+)
+
+SANITY_MODES = ("scalar", "vectorized")
+# Pasos de tiempo habituales; se acepta cualquier divisor de un día
+DT_MINUTES_OPTIONS = (1, 5, 15, 60)
+
+# Campos del preset que determinan los horarios de eventos (y los sorteos que consumen)
+SCHEDULE_FIELDS = (
+    "waterchange_frequency_days", "O2_event_prob_per_day",
+    "feed_spike_prob_per_day", "feed_spike_duration_min",
+    "stocking_prob_per_day", "stocking_min", "stocking_max",
 )
 
 class SimulationEnvironment:
     """
     Contenedor de Inyección de Dependencias (DIP).
     Construye y contiene toda la configuración, los generadores de
-    aleatoriedad y los horarios de eventos.
+    aleatoriedad y los horarios de eventos. `config_dict` puede ser el dict
+    del preset o un CompiledPreset ya validado.
+    La aleatoriedad se reparte en flujos con nombre (random_streams): los
+    horarios solo consumen 'events' y cada subsistema/regla el suyo.
+    Con `schedules_from` (otro entorno con la misma schedule_key) se reutilizan
+    sus horarios sin volver a sortearlos: el resultado es idéntico al de
+    generarlos desde cero.
+    `dt_minutes` es el paso de tiempo: cada fila representa dt_minutes
+    minutos y los horarios de eventos se indexan por el minuto de inicio del paso.
     """
-    def __init__(self, days: int, config_dict: dict, seed: int, start_time: datetime, 
-                 tank_id: int):
+    def __init__(self, days: int, config_dict: Union[dict, CompiledPreset], seed: int, start_time: datetime,
+                 tank_id: int, sanity_mode: str = "vectorized", kernel_backend: Optional[str] = None,
+                 schedules_from: Optional["SimulationEnvironment"] = None, dt_minutes: int = 1):
+
+        if sanity_mode not in SANITY_MODES:
+            raise ValueError(f"sanity_mode inválido '{sanity_mode}'. Opciones: {SANITY_MODES}")
+        kernel_backend = kernel_backend or DEFAULT_KERNEL_BACKEND
+        if kernel_backend not in KERNEL_BACKENDS:
+            raise ValueError(f"kernel_backend inválido '{kernel_backend}'. Opciones: {KERNEL_BACKENDS}")
+        if dt_minutes < 1 or int(MINUTES_PER_DAY) % dt_minutes != 0:
+            raise ValueError(f"dt_minutes inválido '{dt_minutes}': debe dividir un día. Habituales: {DT_MINUTES_OPTIONS}")
 
         self.days = days
         self.minutes = int(days * MINUTES_PER_DAY)
+        self.dt_minutes = dt_minutes
+        self.steps = self.minutes // dt_minutes
+        self.steps_per_day = int(MINUTES_PER_DAY) // dt_minutes
         self.seed = seed
         self.start_time = start_time
         self.tank_id = tank_id
+        self.sanity_mode = sanity_mode
+        self.kernel_backend = kernel_backend
 
-        # 1. VALIDACIÓN ESTRICTA (Estilo "Interface" TS)
-        #    Aquí usamos Pydantic para validar todo el diccionario.
-        try:
-            # Intenta crear el modelo Pydantic a partir del diccionario
-            params_model = PresetSchema(**config_dict)
-        except ValidationError as e:
-            # Si falla, Pydantic da un error MUY detallado
-            print("="*50)
-            print("¡ERROR! El preset de configuración es inválido.")
-            print("Revisa que TODAS las claves estén presentes y tengan el tipo correcto.")
-            print("="*50)
-            raise ValueError(f"Error de validación en el preset:\n{e}")
-        
-        # 2. Inyección de Dependencia de Aleatoriedad (DIP)
-        self.rng = np.random.default_rng(seed)
-
-        # 3. Crear todas las Configs (ISP)
-        #    Ahora leemos desde 'params_model.clave' en lugar de 'params["clave"]'.
-        #    Esto es 100% seguro porque Pydantic ya lo validó.
-        try:
-            self.volume_L = params_model.V
-            self.initial_N = params_model.initial_N 
-
-            self.temp_config = TemperatureConfig(
-                base=params_model.T_base,
-                amplitude=params_model.A_T,
-                sigma=params_model.sigma_T,
-                drift_per_day=params_model.drift_T_per_day
-            )
-            self.sal_config = SalinityConfig(
-                base=params_model.S_base,
-                drift_per_min=params_model.drift_S_per_min,
-                sigma=params_model.sigma_S,
-                k_evap_per_deg=params_model.k_evap_per_deg,
-                waterchange_reduction=params_model.waterchange_reduction
-            )
-            self.o2_config = OxygenConfig(
-                base=params_model.O2_base, amplitude=params_model.A_O2, sigma=params_model.sigma_O2,
-                k_temp=params_model.k_T_O2, hypoxia_min=params_model.hypoxia_min,
-                hypoxia_max=params_model.hypoxia_max, floor=params_model.O2_floor
-            )
-            self.ph_config = pHConfig(
-                 base=params_model.pH_base, amplitude=params_model.A_pH,
-                 sigma=params_model.sigma_pH, phase=params_model.pH_phase,
-                 k_feed_acid=params_model.k_feed_acid, k_o2_acid=params_model.k_O2_pH,
-                 o2_acid_threshold=params_model.O2_pH_threshold,
-                 waterchange_recovery_factor=params_model.pH_recovery_on_waterchange,
-                 smoothing_alpha=params_model.pH_smoothing_alpha,
-                 min_limit=params_model.pH_min_limit,
-                 max_limit=params_model.pH_max_limit
-            )
-            self.feed_config = FeedConfig(
-                base_kg_per_day=params_model.Feed_base,
-                spike_multiplier=params_model.feed_spike_multiplier,
-                noise_min_factor=params_model.feed_noise_min_factor,
-                noise_max_factor=params_model.feed_noise_max_factor,
-                min_feed_kg_min=params_model.feed_min_kg_min
-            )
-            self.mort_config = MortalityConfig(
-                weight_o2=params_model.alpha, weight_temp=params_model.beta,
-                weight_density=params_model.gamma,
-                o2_critical_threshold=params_model.O2_crit,
-                temp_optimal_threshold=params_model.T_opt,
-                density_optimal_threshold=params_model.rho_opt,
-                shock_factor=params_model.shock_factor,
-                o2_shock_threshold=params_model.O2_crit_for_shock,
-                density_shock_threshold=params_model.density_crit_for_shock,
-                kappa_scaler=params_model.kappa,
-                max_mortality_rate=params_model.max_mortality_rate,
-                weight_salinity=params_model.weight_salinity,
-                salinity_optimal_min=params_model.salinity_optimal_min,
-                salinity_optimal_max=params_model.salinity_optimal_max,
-                salinity_lethal_low=params_model.salinity_lethal_low,
-                salinity_lethal_high=params_model.salinity_lethal_high
-            )
-            self.growth_config = GrowthConfig(
-                initial_weight_g=params_model.initial_weight_g,
-                target_weight_g=params_model.target_weight_g,
-                fcr=params_model.fcr,
-                feed_table=params_model.feed_table,
-                temp_min_growth=params_model.temp_min_growth,
-                temp_optimal_growth=params_model.temp_optimal_growth,
-                temp_max_growth=params_model.temp_max_growth
-            )
-            self.sanity_config = SanityConfig(
-                temp_crit_for_ph=params_model.sanity_temp_crit_for_ph,
-                ph_min_at_crit_temp=params_model.sanity_ph_min_at_crit_temp,
-                ph_fix_noise_min=params_model.sanity_ph_fix_noise_min,
-                ph_fix_noise_max=params_model.sanity_ph_fix_noise_max,
-                o2_crit_for_ph=params_model.sanity_o2_crit_for_ph,
-                ph_max_at_crit_o2=params_model.sanity_ph_max_at_crit_o2,
-                density_crit_for_o2=params_model.sanity_density_crit_for_o2,
-                o2_max_at_crit_density=params_model.sanity_o2_max_at_crit_density,
-                o2_fix_noise_min=params_model.sanity_o2_fix_noise_min,
-                o2_fix_noise_max=params_model.sanity_o2_fix_noise_max,
-                salinity_max_with_wc=params_model.sanity_salinity_max_with_wc,
-                sal_fix_noise_min=params_model.sanity_sal_fix_noise_min,
-                sal_fix_noise_max=params_model.sanity_sal_fix_noise_max,
-                max_mortality_ratio=params_model.sanity_max_mortality_ratio
+        # 1. PRESET COMPILADO (validado una sola vez y cacheado por hash)
+        self.preset = (
+            config_dict if isinstance(config_dict, CompiledPreset) else get_compiled_preset(config_dict)
+        )
+        params_model = self.preset.params
+
+        # 2. Inyección de Dependencia de Aleatoriedad (DIP): un flujo por subsistema
+        self.rngs = spawn_streams(seed)
+
+        # 3. Configs (ISP): compartidas e inmutables entre entornos del mismo preset
+        self.volume_L = self.preset.volume_L
+        self.initial_N = self.preset.initial_N
+        self.temp_config = self.preset.temp_config
+        self.sal_config = self.preset.sal_config
+        self.o2_config = self.preset.o2_config
+        self.ph_config = self.preset.ph_config
+        self.feed_config = self.preset.feed_config
+        self.mort_config = self.preset.mort_config
+        self.growth_config = self.preset.growth_config
+        self.sanity_config = self.preset.sanity_config
+        if dt_minutes != 1:
+            # El tope de muertes de la sanidad es por minuto: se lleva a probabilidad por paso
+            self.sanity_config = replace(
+                self.sanity_config,
+                max_mortality_ratio=scale_mortality_rate(self.sanity_config.max_mortality_ratio, dt_minutes)
             )
-        except AttributeError as e:
-             # Esto solo pasaría si PresetSchema y los Dataclasses no coinciden
-             raise Exception(f"Error interno al asignar parámetros validados: {e}")
 
         # 4. Generar Horarios de Eventos (SRP/OCP)
         #    Ahora pasamos el modelo Pydantic a los generadores
-        try:
-            self.waterchange_schedule = self._generate_waterchange_schedule(params_model)
-            self.o2_event_minutes = self._generate_o2_events(params_model)
-            self.feed_spike_schedule = self._generate_feed_spikes(params_model)
-            self.stocking_schedule = self._generate_stocking_events(params_model)
-        except AttributeError as e:
-             raise ValueError(f"Parámetro para generar eventos {e} falta en el config_dict.")
+        if schedules_from is not None and schedules_from.schedule_key() == self.schedule_key():
+            self._share_schedules(schedules_from)
+        else:
+            try:
+                self.waterchange_schedule = self._generate_waterchange_schedule(params_model)
+                self.o2_event_minutes = self._generate_o2_events(params_model)
+                self.feed_spike_schedule = self._generate_feed_spikes(params_model)
+                self.stocking_schedule = self._generate_stocking_events(params_model)
+            except AttributeError as e:
+                 raise ValueError(f"Parámetro para generar eventos {e} falta en el config_dict.")
 
         # 5. Generar Pipeline de Sanidad (OCP)
+        self.sanity_rules = self._build_sanity_rules()
         self.sanity_pipeline = self._build_sanity_pipeline()
 
-    # --- Funciones de "Ruido" (DIP) ---
-    def get_normal_noise(self, mean: float, std: float) -> float:
-        return self.rng.normal(mean, std)
-    
-    def get_uniform_noise(self, min_val: float, max_val: float) -> float:
-        return self.rng.uniform(min_val, max_val)
+    # --- Horarios compartidos entre entornos (barridos de parámetros) ---
+    def schedule_key(self) -> Tuple:
+        """Todo lo que determina los horarios: días, paso, semilla y SCHEDULE_FIELDS del preset."""
+        params = self.preset.params
+        return (self.minutes, self.dt_minutes, self.seed) + tuple(
+            tuple(value) if isinstance(value, list) else value
+            for value in (getattr(params, field) for field in SCHEDULE_FIELDS)
+        )
+
+    def _share_schedules(self, other: "SimulationEnvironment") -> None:
+        # Los horarios no se mutan durante la simulación: se comparten por referencia
+        self.waterchange_schedule = other.waterchange_schedule
+        self.o2_event_minutes = other.o2_event_minutes
+        self.feed_spike_schedule = other.feed_spike_schedule
+        self.stocking_schedule = other.stocking_schedule
 
-    def get_binomial_noise(self, n: int, p: float) -> int:
-        return self.rng.binomial(n, p)
+    def _step_start(self, t: int) -> int:
+        """Minuto de inicio del paso que contiene el minuto t."""
+        return t - t % self.dt_minutes
 
     # --- CAMBIO: Aceptar PresetSchema en lugar de dict ---
     def _generate_waterchange_schedule(self, params_model: PresetSchema) -> Set[int]:
-        """Genera el set de minutos de recambio basado en la frecuencia en días."""
+        """Genera el set de minutos (inicio de paso) de recambio basado en la frecuencia en días."""
         wc_freq_days = params_model.waterchange_frequency_days
         if not wc_freq_days or wc_freq_days <= 0:
             print("INFO: No se programaron recambios de agua.")
@@ -168,7 +144,7 @@ class SimulationEnvironment:
             
         intervalo_minutos = int(wc_freq_days * MINUTES_PER_DAY)
         schedule = {
-            t for t in range(intervalo_minutos - 1, self.minutes, intervalo_minutos)
+            self._step_start(t) for t in range(intervalo_minutos - 1, self.minutes, intervalo_minutos)
         }
         print(f"INFO: Recambios programados cada {wc_freq_days} días. Total {len(schedule)} recambios.")
         return schedule
@@ -180,40 +156,103 @@ class SimulationEnvironment:
         num_events = int(self.days * prob_per_day)
         if num_events == 0:
             return set()
-        event_minutes = self.rng.choice(range(self.minutes), size=num_events, replace=False)
-        return set(event_minutes)
+        event_steps = self.rngs["events"].choice(range(self.steps), size=num_events, replace=False)
+        return set(event_steps * self.dt_minutes)
 
     def _generate_feed_spikes(self, params_model: PresetSchema) -> Dict[int, int]:
-        prob_per_min = params_model.feed_spike_prob_per_day / MINUTES_PER_DAY
+        prob_per_step = params_model.feed_spike_prob_per_day / MINUTES_PER_DAY * self.dt_minutes
         min_dur, max_dur = params_model.feed_spike_duration_min
         schedule = {}
-        for t in range(self.minutes):
-            if self.rng.random() < prob_per_min:
-                duration = self.rng.integers(min_dur, max_dur + 1)
+        for t in range(0, self.minutes, self.dt_minutes):
+            if self.rngs["events"].random() < prob_per_step:
+                duration = self.rngs["events"].integers(min_dur, max_dur + 1)
                 schedule[t] = duration 
         return schedule
 
     def _generate_stocking_events(self, params_model: PresetSchema) -> Dict[int, int]:
-        prob_per_min = params_model.stocking_prob_per_day / MINUTES_PER_DAY
+        prob_per_step = params_model.stocking_prob_per_day / MINUTES_PER_DAY * self.dt_minutes
         min_stock = params_model.stocking_min
         max_stock = params_model.stocking_max
         schedule = {}
-        for t in range(self.minutes):
-            if self.rng.random() < prob_per_min:
-                amount = self.rng.integers(min_stock, max_stock + 1)
+        for t in range(0, self.minutes, self.dt_minutes):
+            if self.rngs["events"].random() < prob_per_step:
+                amount = self.rngs["events"].integers(min_stock, max_stock + 1)
                 schedule[t] = amount
         return schedule
     
-    def _build_sanity_pipeline(self) -> List[Callable]:
+    def _build_sanity_rules(self) -> List[SanityRule]:
         # (OCP en acción: añade/quita reglas aquí sin tocar el bucle)
+        cfg = self.sanity_config
+        # Cada regla con ruido tiene su flujo: fila a fila o en bloque, sortea
+        # lo mismo en el mismo orden (las filas que cumplen la condición)
+        temp_ph_noise = self.rngs["sanity_temp_ph"].uniform
+        density_o2_noise = self.rngs["sanity_density_o2"].uniform
+        waterchange_noise = self.rngs["sanity_waterchange_salinity"].uniform
+        return [
+            SanityRule(
+                "temp_ph",
+                scalar=partial(apply_sanity_temp_ph_check, config=cfg, noise=temp_ph_noise),
+                vectorized=partial(apply_sanity_temp_ph_check_vectorized, config=cfg, noise=temp_ph_noise)
+            ),
+            SanityRule(
+                "o2_ph",
+                scalar=partial(apply_sanity_o2_ph_check, config=cfg),
+                vectorized=partial(apply_sanity_o2_ph_check_vectorized, config=cfg)
+            ),
+            SanityRule(
+                "density_o2",
+                scalar=partial(apply_sanity_density_o2_check, config=cfg, noise=density_o2_noise),
+                vectorized=partial(apply_sanity_density_o2_check_vectorized, config=cfg, noise=density_o2_noise)
+            ),
+            SanityRule(
+                "waterchange_salinity",
+                scalar=partial(apply_sanity_waterchange_salinity_check, config=cfg, noise=waterchange_noise),
+                vectorized=partial(apply_sanity_waterchange_salinity_check_vectorized, config=cfg, noise=waterchange_noise)
+            ),
+            SanityRule(
+                "mortality",
+                scalar=partial(apply_sanity_mortality_check, config=cfg),
+                vectorized=partial(apply_sanity_mortality_check_vectorized, config=cfg)
+            ),
+        ]
+
+    def _build_sanity_pipeline(self) -> List[Callable]:
+        """Pipeline escalar (fila a fila) derivado de las reglas registradas."""
         return [
-            partial(apply_sanity_temp_ph_check, config=self.sanity_config, noise=self.get_uniform_noise),
-            partial(apply_sanity_o2_ph_check, config=self.sanity_config),
-            partial(apply_sanity_density_o2_check, config=self.sanity_config, noise=self.get_uniform_noise),
-            partial(apply_sanity_waterchange_salinity_check, config=self.sanity_config, noise=self.get_uniform_noise),
-            partial(apply_sanity_mortality_check, config=self.sanity_config)
+            rule.scalar if rule.scalar is not None else partial(_apply_vectorized_rule_to_row, rule.vectorized)
+            for rule in self.sanity_rules
         ]
 
+    def register_sanity_rule(
+        self,
+        name: str,
+        scalar: Optional[Callable[[SimStateRow], SimStateRow]] = None,
+        vectorized: Optional[Callable[[SimStateColumns], SimStateColumns]] = None
+    ) -> None:
+        """Registra una regla de sanidad personalizada (escalar, vectorizada o ambas)."""
+        if scalar is None and vectorized is None:
+            raise ValueError(f"La regla de sanidad '{name}' necesita al menos una implementación.")
+        self.sanity_rules.append(SanityRule(name, scalar=scalar, vectorized=vectorized))
+        self.sanity_pipeline = self._build_sanity_pipeline()
+
+    def apply_sanity_row(self, row: SimStateRow) -> SimStateRow:
+        for rule_function in self.sanity_pipeline:
+            row = rule_function(row)
+        return row
+
+    def apply_sanity_rows(self, cols: SimStateColumns) -> SimStateColumns:
+        """Modo escalar: el pipeline fila a fila sobre un bloque de columnas."""
+        return _apply_scalar_rule_to_block(self.apply_sanity_row, cols)
+
+    def apply_sanity_block(self, cols: SimStateColumns) -> SimStateColumns:
+        """Aplica todas las reglas sobre un bloque de columnas (p.ej. un día)."""
+        for rule in self.sanity_rules:
+            if rule.vectorized is not None:
+                cols = rule.vectorized(cols)
+            else:
+                cols = _apply_scalar_rule_to_block(rule.scalar, cols)
+        return cols
+
     # --- Estado Inicial (SRP) ---
     def get_initial_state(self) -> SimulationState:
         """Crea el estado inicial (t=0) de la simulación."""
@@ -223,7 +262,6 @@ class SimulationEnvironment:
             initial_biomass = (initial_N * initial_weight) / 1000.0
 
             return SimulationState(
-                timestamp=self.start_time,
                 temperature=self.temp_config.base,
                 salinity=self.sal_config.base,
                 oxygen=self.o2_config.base,
@@ -235,4 +273,15 @@ class SimulationEnvironment:
                 biomass_kg=initial_biomass
             )
         except KeyError as e:
-            raise Exception(f"Error al crear estado inicial, faltó un parámetro: {e}")
\ No newline at end of file
+            raise Exception(f"Error al crear estado inicial, faltó un parámetro: {e}")
+
+
+# --- Adaptadores entre reglas escalares y vectorizadas ---
+def _apply_vectorized_rule_to_row(rule: Callable[[SimStateColumns], SimStateColumns], row: SimStateRow) -> SimStateRow:
+    cols = rule({key: np.asarray([value]) for key, value in row.items()})
+    return {key: value[0].item() for key, value in cols.items()}
+
+def _apply_scalar_rule_to_block(rule: Callable[[SimStateRow], SimStateRow], cols: SimStateColumns) -> SimStateColumns:
+    keys = list(cols.keys())
+    rows = [rule(dict(zip(keys, values))) for values in zip(*(cols[k].tolist() for k in keys))]
+    return {key: np.asarray([row[key] for row in rows]) for key in keys}
@@ -0,0 +1,125 @@
+import os
+import time
+import cProfile
+import resource
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class StageTimer:
+    """
+    Acumula duración (s) y bytes por etapa de un job.
+    Uso: `with timer.stage("csv_write"): ...` y `timer.add_bytes("csv_write", n)`.
+    """
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self.bytes: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def add_bytes(self, name: str, n_bytes: int):
+        self.bytes[name] = self.bytes.get(name, 0) + int(n_bytes)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Formato plano para el hash del job en Redis."""
+        data = {f"stage_{name}_s": round(value, 4) for name, value in self.durations.items()}
+        data.update({f"stage_{name}_bytes": value for name, value in self.bytes.items()})
+        return data
+
+    def summary(self) -> str:
+        parts = []
+        for name, value in self.durations.items():
+            part = f"{name}={value:.3f}s"
+            if name in self.bytes:
+                part += f" ({self.bytes[name] / 1e6:.2f} MB)"
+            parts.append(part)
+        return ", ".join(parts)
+
+
+class NullStageTimer(StageTimer):
+    """Timer que no registra nada (valor por defecto cuando no se instrumenta)."""
+    @contextmanager
+    def stage(self, name: str):
+        yield self
+
+    def record(self, name: str, seconds: float):
+        pass
+
+    def add_bytes(self, name: str, n_bytes: int):
+        pass
+
+
+NULL_TIMER = NullStageTimer()
+
+
+@contextmanager
+def profiled(out_path: Optional[str]):
+    """Captura un perfil cProfile del bloque y lo guarda en out_path (.prof). Sin ruta no hace nada."""
+    if not out_path:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        profiler.dump_stats(out_path)
+
+
+def current_rss_bytes() -> int:
+    """RSS actual del proceso (/proc en Linux; si no, el máximo histórico de getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB en Linux
+
+class PeakRssSampler:
+    """
+    Pico de RSS de un bloque en un proceso de larga vida: un hilo muestrea el
+    RSS cada `interval_s` y, si el máximo histórico de getrusage subió durante
+    el bloque, ese máximo (exacto) pertenece al bloque.
+    Uso: `with PeakRssSampler() as rss: ...` y luego `rss.peak_bytes`.
+    """
+    def __init__(self, interval_s: float = 0.02):
+        self.interval_s = interval_s
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._maxrss_before = 0
+
+    def _sample(self):
+        while not self._stop.wait(self.interval_s):
+            self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+
+    def __enter__(self):
+        self._maxrss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.peak_bytes = current_rss_bytes()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+        if maxrss > self._maxrss_before:
+            self.peak_bytes = max(self.peak_bytes, maxrss * 1024)
+        return False
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak_bytes / 2**20
@@ -0,0 +1,238 @@
+"""
+Kernel fusionado de un día: temperatura, salinidad, feed, O2, pH, mortalidad
+y muertes en un solo bucle sobre los pasos (de dt_minutes minutos), con los
+flujos de RNG del entorno (np.random.Generator por subsistema) consumidos
+dentro del kernel en el mismo orden que simulation_step.
+
+Es opcional: con numba instalado se compila con njit; sin numba el runner usa
+el camino de referencia (simulation_step). numba se importa solo al pedir el
+backend, para no penalizar el arranque de los workers.
+"""
+from .common_imports import *
+import math
+
+from .core_functions import scale_smoothing_alpha
+
+KERNEL_BACKENDS = ("python", "numba", "auto")
+DEFAULT_KERNEL_BACKEND = os.environ.get("TANK_SIMULATOR_KERNEL", "python")
+
+# --- Índices del vector de parámetros (constantes en tiempo de compilación) ---
+P_T_BASE, P_T_AMPLITUDE, P_T_SIGMA, P_T_DRIFT = 0, 1, 2, 3
+P_S_DRIFT, P_S_SIGMA, P_S_K_EVAP, P_S_WC_REDUCTION = 4, 5, 6, 7
+P_O2_BASE, P_O2_AMPLITUDE, P_O2_SIGMA, P_O2_K_TEMP, P_O2_HYP_MIN, P_O2_HYP_MAX, P_O2_FLOOR = 8, 9, 10, 11, 12, 13, 14
+P_PH_BASE, P_PH_AMPLITUDE, P_PH_SIGMA, P_PH_PHASE, P_PH_K_FEED, P_PH_K_O2, P_PH_O2_THRESHOLD = 15, 16, 17, 18, 19, 20, 21
+P_PH_WC_RECOVERY, P_PH_ALPHA, P_PH_MIN, P_PH_MAX = 22, 23, 24, 25
+P_F_SPIKE_MULT, P_F_NOISE_MIN, P_F_NOISE_MAX, P_F_MIN = 26, 27, 28, 29
+P_M_W_O2, P_M_W_TEMP, P_M_W_DENSITY, P_M_O2_CRIT, P_M_T_OPT, P_M_RHO_OPT = 30, 31, 32, 33, 34, 35
+P_M_SHOCK, P_M_O2_SHOCK, P_M_RHO_SHOCK, P_M_KAPPA, P_M_MAX_RATE = 36, 37, 38, 39, 40
+P_M_W_SAL, P_M_SAL_OPT_MIN, P_M_SAL_OPT_MAX, P_M_SAL_LETHAL_LOW, P_M_SAL_LETHAL_HIGH = 41, 42, 43, 44, 45
+P_VOLUME, P_DT = 46, 47
+N_PARAMS = 48
+
+# --- Columnas de la matriz de salida ---
+K_TEMP, K_SAL, K_O2, K_PH, K_FEED, K_DENSITY = 0, 1, 2, 3, 4, 5
+K_SURVIVORS, K_DEATHS, K_SPIKE_REMAINING, K_MRATE = 6, 7, 8, 9
+N_OUTPUTS = 10
+
+
+def pack_kernel_params(env) -> np.ndarray:
+    """Aplana las configs inmutables del entorno en el vector que consume el kernel."""
+    t, s, o, p, f, m = env.temp_config, env.sal_config, env.o2_config, env.ph_config, env.feed_config, env.mort_config
+    params = np.empty(N_PARAMS, dtype=np.float64)
+    params[[P_T_BASE, P_T_AMPLITUDE, P_T_SIGMA, P_T_DRIFT]] = (t.base, t.amplitude, t.sigma, t.drift_per_day)
+    params[[P_S_DRIFT, P_S_SIGMA, P_S_K_EVAP, P_S_WC_REDUCTION]] = (
+        s.drift_per_min, s.sigma, s.k_evap_per_deg, s.waterchange_reduction
+    )
+    params[[P_O2_BASE, P_O2_AMPLITUDE, P_O2_SIGMA, P_O2_K_TEMP, P_O2_HYP_MIN, P_O2_HYP_MAX, P_O2_FLOOR]] = (
+        o.base, o.amplitude, o.sigma, o.k_temp, o.hypoxia_min, o.hypoxia_max, o.floor
+    )
+    params[[P_PH_BASE, P_PH_AMPLITUDE, P_PH_SIGMA, P_PH_PHASE, P_PH_K_FEED, P_PH_K_O2, P_PH_O2_THRESHOLD]] = (
+        p.base, p.amplitude, p.sigma, p.phase, p.k_feed_acid, p.k_o2_acid, p.o2_acid_threshold
+    )
+    params[[P_PH_WC_RECOVERY, P_PH_ALPHA, P_PH_MIN, P_PH_MAX]] = (
+        p.waterchange_recovery_factor, scale_smoothing_alpha(p.smoothing_alpha, env.dt_minutes),
+        p.min_limit, p.max_limit
+    )
+    params[[P_F_SPIKE_MULT, P_F_NOISE_MIN, P_F_NOISE_MAX, P_F_MIN]] = (
+        f.spike_multiplier, f.noise_min_factor, f.noise_max_factor, f.min_feed_kg_min
+    )
+    params[[P_M_W_O2, P_M_W_TEMP, P_M_W_DENSITY, P_M_O2_CRIT, P_M_T_OPT, P_M_RHO_OPT]] = (
+        m.weight_o2, m.weight_temp, m.weight_density,
+        m.o2_critical_threshold, m.temp_optimal_threshold, m.density_optimal_threshold
+    )
+    params[[P_M_SHOCK, P_M_O2_SHOCK, P_M_RHO_SHOCK, P_M_KAPPA, P_M_MAX_RATE]] = (
+        m.shock_factor, m.o2_shock_threshold, m.density_shock_threshold, m.kappa_scaler, m.max_mortality_rate
+    )
+    params[[P_M_W_SAL, P_M_SAL_OPT_MIN, P_M_SAL_OPT_MAX, P_M_SAL_LETHAL_LOW, P_M_SAL_LETHAL_HIGH]] = (
+        m.weight_salinity, m.salinity_optimal_min, m.salinity_optimal_max,
+        m.salinity_lethal_low, m.salinity_lethal_high
+    )
+    params[P_VOLUME] = env.volume_L
+    params[P_DT] = env.dt_minutes
+    return params
+
+
+def fused_day_kernel(temp_rng, sal_rng, feed_rng, o2_rng, ph_rng, mort_rng, params, t0, n,
+                     salinity, ph, spike_remaining, survivors,
+                     feed_kg_per_min, waterchange, o2_event, spike_start, stock_add, out):
+    """
+    Simula n pasos de params[P_DT] minutos desde el minuto t0 y escribe una
+    fila por paso en `out` (n x N_OUTPUTS). Los arrays de eventos (waterchange,
+    o2_event, spike_start, stock_add) están indexados por paso relativo al
+    bloque; spike_start vale -1 sin spike.
+    Replica, fórmula a fórmula y en el mismo orden de sorteos, a
+    simulation_step + core_functions.
+    """
+    two_pi = 2 * math.pi
+    dt = params[P_DT]
+    dt_minutes = int(dt)
+    for i in range(n):
+        t = t0 + i * dt_minutes
+        minute_of_day = t % 1440
+
+        # 1. Temperatura
+        temp = (params[P_T_BASE]
+                + params[P_T_AMPLITUDE] * math.sin(two_pi * minute_of_day / 1440.0 + 0.0)
+                + params[P_T_DRIFT] * (t / 1440.0)
+                + temp_rng.normal(0, params[P_T_SIGMA]))
+        temp_above_base = temp - params[P_T_BASE]
+
+        # 2. Salinidad
+        delta_repl = params[P_S_WC_REDUCTION] if waterchange[i] else 0.0
+        sal_delta = (params[P_S_K_EVAP] * max(0.0, temp_above_base) * dt + params[P_S_DRIFT] * dt - delta_repl
+                     + sal_rng.normal(0, params[P_S_SIGMA] * np.sqrt(dt)))
+        salinity = max(0.0, salinity + sal_delta)
+
+        # 3. Feed
+        spike_remaining = max(0, spike_remaining - dt_minutes)
+        if spike_start[i] >= 0:
+            spike_remaining = spike_start[i]
+        noise_factor = feed_rng.uniform(params[P_F_NOISE_MIN], params[P_F_NOISE_MAX])
+        spike_add = 0.0
+        if spike_remaining > 0:
+            spike_add = params[P_F_SPIKE_MULT] * feed_kg_per_min
+        feed_rate = max(params[P_F_MIN], feed_kg_per_min * (1.0 + noise_factor) + spike_add)
+
+        # 4. Oxígeno
+        if o2_event[i]:
+            o2 = o2_rng.uniform(params[P_O2_HYP_MIN], params[P_O2_HYP_MAX])
+        else:
+            o2 = (params[P_O2_BASE]
+                  + params[P_O2_AMPLITUDE] * math.sin(two_pi * minute_of_day / 1440)
+                  - params[P_O2_K_TEMP] * temp_above_base
+                  + o2_rng.normal(0, params[P_O2_SIGMA]))
+        o2 = max(o2, params[P_O2_FLOOR])
+
+        # 5. pH
+        ph_calc = params[P_PH_BASE]
+        ph_calc += params[P_PH_AMPLITUDE] * math.sin(two_pi * minute_of_day / 1440.0 + params[P_PH_PHASE])
+        ph_calc += -params[P_PH_K_FEED] * feed_rate
+        ph_calc += -params[P_PH_K_O2] * max(0.0, (params[P_PH_O2_THRESHOLD] - o2))
+        ph_calc += ph_rng.normal(0, params[P_PH_SIGMA])
+        if waterchange[i]:
+            factor = params[P_PH_WC_RECOVERY]
+            ph_calc = (1 - factor) * ph_calc + (factor * params[P_PH_BASE])
+        alpha = params[P_PH_ALPHA]
+        ph = (alpha * ph_calc) + ((1 - alpha) * ph)
+        ph = max(params[P_PH_MIN], min(params[P_PH_MAX], ph))
+
+        # 6. Población y densidad
+        survivors_before = survivors + stock_add[i]
+        density = max(0.0, survivors_before / params[P_VOLUME])
+
+        # 7. Mortalidad
+        sal_penalty = 0.0
+        if salinity < params[P_M_SAL_OPT_MIN]:
+            if salinity <= params[P_M_SAL_LETHAL_LOW]:
+                sal_penalty = 1.0
+            else:
+                sal_penalty = ((params[P_M_SAL_OPT_MIN] - salinity)
+                               / (params[P_M_SAL_OPT_MIN] - params[P_M_SAL_LETHAL_LOW]))
+        elif salinity > params[P_M_SAL_OPT_MAX]:
+            if salinity >= params[P_M_SAL_LETHAL_HIGH]:
+                sal_penalty = 1.0
+            else:
+                sal_penalty = ((salinity - params[P_M_SAL_OPT_MAX])
+                               / (params[P_M_SAL_LETHAL_HIGH] - params[P_M_SAL_OPT_MAX]))
+        sal_penalty = max(0.0, min(1.0, sal_penalty))
+
+        risk = (params[P_M_W_O2] * max(0.0, params[P_M_O2_CRIT] - o2)
+                + params[P_M_W_TEMP] * max(0.0, temp - params[P_M_T_OPT])
+                + params[P_M_W_DENSITY] * max(0.0, density - params[P_M_RHO_OPT])
+                + params[P_M_W_SAL] * sal_penalty)
+        if o2 < params[P_M_O2_SHOCK] and density > params[P_M_RHO_SHOCK]:
+            risk = risk * params[P_M_SHOCK]
+        m_rate = 0.0
+        if risk > 0:
+            m_rate = params[P_M_KAPPA] * ((1.0 / (1.0 + math.exp(-risk)) - 0.5) * 2.0)
+        m_rate = min(m_rate, params[P_M_MAX_RATE])
+        step_rate = m_rate
+        if dt_minutes != 1:
+            step_rate = 1.0 - (1.0 - m_rate) ** dt
+
+        # 8. Muertes
+        rate = max(0.0, min(1.0, step_rate))
+        n_pop = max(0, survivors_before)
+        deaths = 0
+        if n_pop != 0 and rate != 0.0:
+            deaths = mort_rng.binomial(n_pop, rate)
+        survivors = max(0, survivors_before - deaths)
+
+        out[i, K_TEMP] = temp
+        out[i, K_SAL] = salinity
+        out[i, K_O2] = o2
+        out[i, K_PH] = ph
+        out[i, K_FEED] = feed_rate
+        out[i, K_DENSITY] = density
+        out[i, K_SURVIVORS] = survivors
+        out[i, K_DEATHS] = deaths
+        out[i, K_SPIKE_REMAINING] = spike_remaining
+        out[i, K_MRATE] = m_rate
+
+
+_compiled_kernel = None
+
+def numba_available() -> bool:
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def get_compiled_kernel() -> Callable:
+    """Compila (una vez por proceso, con caché en disco de numba) el kernel fusionado."""
+    global _compiled_kernel
+    if _compiled_kernel is None:
+        from numba import njit
+        _compiled_kernel = njit(cache=True)(fused_day_kernel)
+    return _compiled_kernel
+
+def resolve_kernel_backend(backend: str) -> str:
+    """
+    Devuelve el backend efectivo: 'numba' solo si numba está instalado.
+    La sanidad (escalar o vectorizada) usa sus propios flujos de RNG, así que
+    puede aplicarse después del kernel en ambos modos.
+    """
+    if backend not in KERNEL_BACKENDS:
+        raise ValueError(f"kernel_backend inválido '{backend}'. Opciones: {KERNEL_BACKENDS}")
+    if backend == "python":
+        return "python"
+    if not numba_available():
+        if backend == "numba":
+            print("WARNING: numba no está instalado. Usando el backend python.")
+        return "python"
+    return "numba"
+
+
+def event_arrays(env) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Materializa los horarios de eventos del entorno como arrays por paso (se cortan por día)."""
+    dt = env.dt_minutes
+    waterchange = np.zeros(env.steps, dtype=np.bool_)
+    o2_event = np.zeros(env.steps, dtype=np.bool_)
+    spike_start = np.full(env.steps, -1, dtype=np.int32)
+    stock_add = np.zeros(env.steps, dtype=np.int32)
+    waterchange[[t // dt for t in env.waterchange_schedule]] = True
+    o2_event[[t // dt for t in env.o2_event_minutes]] = True
+    spike_start[[t // dt for t in env.feed_spike_schedule]] = list(env.feed_spike_schedule.values())
+    stock_add[[t // dt for t in env.stocking_schedule]] = list(env.stocking_schedule.values())
+    return waterchange, o2_event, spike_start, stock_add
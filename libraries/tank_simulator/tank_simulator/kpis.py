@@ -0,0 +1,37 @@
+from .common_imports import *
+
+from .environment import SimulationEnvironment
+from .config_models import MINUTES_PER_DAY
+
+# Orden de las columnas de KPIs en las tablas de resultados
+KPI_COLUMNS = (
+    "days_simulated", "harvested", "harvest_day", "final_survivors", "survival_rate",
+    "final_weight_g", "final_biomass_kg", "total_feed_kg", "fcr_achieved", "stop_reason",
+)
+
+
+def summarize_kpis(
+    env: SimulationEnvironment,
+    minutes: int,
+    final_survivors: int,
+    final_weight_g: float,
+    total_feed_kg: float,
+    total_stocked: int = 0
+) -> Dict[str, Any]:
+    """KPIs finales (KPI_COLUMNS salvo stop_reason) a partir de los totales de la corrida."""
+    initial_biomass_kg = env.initial_N * env.growth_config.initial_weight_g / 1000.0
+    final_biomass_kg = final_survivors * final_weight_g / 1000.0
+    biomass_gain_kg = final_biomass_kg - initial_biomass_kg
+    harvested = final_weight_g >= env.growth_config.target_weight_g
+    stocked = env.initial_N + total_stocked
+    return {
+        "days_simulated": minutes / MINUTES_PER_DAY,
+        "harvested": harvested,
+        "harvest_day": int(minutes // MINUTES_PER_DAY) if harvested else None,
+        "final_survivors": final_survivors,
+        "survival_rate": final_survivors / stocked if stocked else None,
+        "final_weight_g": round(final_weight_g, 4),
+        "final_biomass_kg": round(final_biomass_kg, 4),
+        "total_feed_kg": round(total_feed_kg, 4),
+        "fcr_achieved": round(total_feed_kg / biomass_gain_kg, 4) if biomass_gain_kg > 0 else None,
+    }
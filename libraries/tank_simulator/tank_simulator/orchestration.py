@@ -2,7 +2,19 @@ from .common_imports import *
 
 # Importar nuestros módulos locales
 from .environment import SimulationEnvironment
-from .config_models import SimulationState, MINUTES_PER_DAY
+from .instrumentation import StageTimer, NULL_TIMER
+from .collectors import OutputCollector, RowCollector, columns_to_rows
+from .stop_conditions import StopCondition, target_weight_reached
+from .cancellation import CancellationToken
+from .kernels import (
+    resolve_kernel_backend, get_compiled_kernel, pack_kernel_params, event_arrays,
+    N_OUTPUTS, K_TEMP, K_SAL, K_O2, K_PH, K_FEED, K_DENSITY,
+    K_SURVIVORS, K_DEATHS, K_SPIKE_REMAINING, K_MRATE
+)
+from .config_models import (
+    SimulationState, SimStateColumns, MINUTES_PER_DAY,
+    OUTPUT_COLUMNS, BOOLEAN_OUTPUT_COLUMNS
+)
 from .core_functions import (
     calculate_sinusoidal_temperature,
     calculate_salinity_delta,
@@ -25,6 +37,7 @@ from .core_functions import (
     apply_mortality_shock,
     convert_risk_to_mortality_rate,
     apply_mortality_limit,
+    scale_mortality_rate,
     calculate_deaths_stochastic,
     apply_deaths_to_population,
     calculate_density,
@@ -33,12 +46,25 @@ from .core_functions import (
 )
 
 
-def simulation_step(t: int, env: SimulationEnvironment, prev_state: SimulationState, feed_kg_per_min_today: float) -> (SimulationState, Dict[str, Any]): # type: ignore
+# Valores crudos de un paso, en el orden que devuelve advance_step
+STEP_COLUMNS = (
+    "tank_id", "minute_index", "temperature_C", "salinity_ppt", "oxygen_mgL", "pH", "feed_kg_min",
+    "density_shrimp_L", "survivors", "deaths", "current_weight_g", "biomass_kg", "waterchange",
+    "feed_spike", "stock_add", "mortality_rate_min",
+)
+STEP_INT_COLUMNS = ("tank_id", "minute_index", "survivors", "deaths", "stock_add")
+STEP_BOOL_COLUMNS = ("waterchange", "feed_spike")
+
+
+def advance_step(t: int, env: SimulationEnvironment, prev_state: SimulationState, feed_kg_per_min_today: float) -> tuple:
     """
-    R.U.: Orquesta todas las funciones puras para UN solo minuto (t).
-    Devuelve el nuevo estado y la fila de datos para guardar.
+    R.U.: Orquesta todas las funciones puras para UN solo paso de
+    env.dt_minutes minutos que empieza en el minuto t. Actualiza prev_state
+    en sitio y devuelve los valores crudos del paso (orden de STEP_COLUMNS),
+    sin construir una fila dict.
     """
     
+    dt = env.dt_minutes
     # --- Banderas de Eventos ---
     is_waterchange = (t in env.waterchange_schedule)
     is_o2_event = (t in env.o2_event_minutes)
@@ -47,26 +73,27 @@ def simulation_step(t: int, env: SimulationEnvironment, prev_state: SimulationSt
     temp = calculate_sinusoidal_temperature(
         t_min=t,
         config=env.temp_config,
-        noise_source=env.get_normal_noise
+        noise_source=env.rngs["temperature"].normal
     )
     temp_above_base = temp - env.temp_config.base 
     # --- 2. Salinidad ---
     sal_delta = calculate_salinity_delta(
         config=env.sal_config,
-        noise_source=env.get_normal_noise,
+        noise_source=env.rngs["salinity"].normal,
         temp_above_base=temp_above_base,
-        waterchange_active=is_waterchange
+        waterchange_active=is_waterchange,
+        dt_minutes=dt
     )
     sal = update_salinity_state(prev_state.salinity, sal_delta)
     # --- 3. Alimentación (Feed) ---
-    spike_remaining = update_feed_spike_state(prev_state.feed_spike_remaining)
+    spike_remaining = update_feed_spike_state(prev_state.feed_spike_remaining, dt)
     if t in env.feed_spike_schedule:
         spike_remaining = env.feed_spike_schedule[t]
         
     is_spike_active = (spike_remaining > 0)
 
     base_rate_per_min = feed_kg_per_min_today 
-    noise_factor = env.get_uniform_noise(
+    noise_factor = env.rngs["feed"].uniform(
         env.feed_config.noise_min_factor, 
         env.feed_config.noise_max_factor
     )
@@ -79,12 +106,12 @@ def simulation_step(t: int, env: SimulationEnvironment, prev_state: SimulationSt
         )
     # --- 4. Oxígeno (O2) ---
     if is_o2_event:
-        o2_raw = calculate_hypoxia_event_value(env.o2_config, env.get_uniform_noise)
+        o2_raw = calculate_hypoxia_event_value(env.o2_config, env.rngs["oxygen"].uniform)
     else:
         o2_raw = calculate_sinusoidal_oxygen(
             t_min=t,
             config=env.o2_config,
-            noise_source=env.get_normal_noise,
+            noise_source=env.rngs["oxygen"].normal,
             temp_above_base=temp_above_base
         )
     o2 = apply_oxygen_floor(o2_raw, env.o2_config)
@@ -93,10 +120,10 @@ def simulation_step(t: int, env: SimulationEnvironment, prev_state: SimulationSt
     ph_calc += calculate_ph_diurnal_delta(t, env.ph_config)
     ph_calc += calculate_ph_feed_delta(feed_rate, env.ph_config) 
     ph_calc += calculate_ph_o2_delta(o2, env.ph_config)
-    ph_calc += calculate_ph_noise_delta(env.ph_config, env.get_normal_noise)
+    ph_calc += calculate_ph_noise_delta(env.ph_config, env.rngs["ph"].normal)
     if is_waterchange:
         ph_calc = apply_ph_waterchange_recovery(ph_calc, env.ph_config)
-    ph_smoothed = apply_ph_smoothing(ph_calc, prev_state.ph, env.ph_config)
+    ph_smoothed = apply_ph_smoothing(ph_calc, prev_state.ph, env.ph_config, dt)
     ph = apply_ph_limits(ph_smoothed, env.ph_config)
     # --- 6. Población y Densidad ---
     stock_add = env.stocking_schedule.get(t, 0)
@@ -114,48 +141,38 @@ def simulation_step(t: int, env: SimulationEnvironment, prev_state: SimulationSt
     # --- 8. Supervivientes (Survivors) ---
     deaths = calculate_deaths_stochastic(
         n_previous=survivors_before_deaths,
-        mortality_rate=m_rate,
-        binomial_source=env.get_binomial_noise
+        mortality_rate=scale_mortality_rate(m_rate, dt),
+        binomial_source=env.rngs["mortality"].binomial
     )
     survivors = apply_deaths_to_population(survivors_before_deaths, deaths)
-    # --- 9. Crear Nuevo Estado y Fila de Salida ---
-    new_timestamp = prev_state.timestamp + timedelta(minutes=1)
-    new_state = SimulationState(
-            timestamp=new_timestamp,
-            temperature=temp,
-            salinity=sal,
-            oxygen=o2,
-            ph=ph,
-            feed_spike_remaining=spike_remaining,
-            survivors=survivors,
-            density=density, 
-            current_weight_g=prev_state.current_weight_g, 
-            biomass_kg=prev_state.biomass_kg             
+    # --- 9. Actualizar Estado (en sitio) y Valores del Paso ---
+    # (El timestamp no se calcula aquí: se deriva de start_time + minute_index al exportar)
+    # current_weight_g y biomass_kg solo cambian al inicio/cierre del día
+    state = prev_state
+    state.temperature = temp
+    state.salinity = sal
+    state.oxygen = o2
+    state.ph = ph
+    state.feed_spike_remaining = spike_remaining
+    state.survivors = survivors
+    state.density = density
+    return (
+        env.tank_id, t, temp, sal, o2, ph, feed_rate, density, survivors, deaths,
+        state.current_weight_g, state.biomass_kg, is_waterchange, is_spike_active, stock_add, m_rate
     )
-    row_data = {
-        "timestamp_utc": new_timestamp.isoformat(),
-        "tank_id": env.tank_id,
-        "minute_index": t,
-        "temperature_C": temp,
-        "salinity_ppt": sal,
-        "oxygen_mgL": o2,
-        "pH": ph,
-        "feed_kg_min": feed_rate,
-        "density_shrimp_L": density,
-        "survivors": survivors,
-        "deaths": deaths,
-        "current_weight_g": new_state.current_weight_g,
-        "biomass_kg": new_state.biomass_kg,
-        "waterchange": is_waterchange,
-        "feed_spike": is_spike_active,
-        "stock_add": stock_add,
-        "mortality_rate_min": m_rate
-    }    
+
+def simulation_step(t: int, env: SimulationEnvironment, prev_state: SimulationState, feed_kg_per_min_today: float, finalize: bool = True) -> (SimulationState, Dict[str, Any]): # type: ignore
+    """
+    Un paso (advance_step) como fila dict para guardar.
+    Con finalize=False devuelve la fila cruda (sin sanidad ni redondeo).
+    """
+    row_data = dict(zip(STEP_COLUMNS, advance_step(t, env, prev_state, feed_kg_per_min_today)))
+    state = prev_state
+    if not finalize:
+        return state, row_data
     # --- 10. Sanity Checks ---
-    for rule_function in env.sanity_pipeline:
-        row_data = rule_function(row_data)
+    row_data = env.apply_sanity_row(row_data)
     final_row = {
-        "timestamp_utc": row_data["timestamp_utc"],
         "tank_id": int(row_data["tank_id"]),
         "minute_index": int(row_data["minute_index"]),
         "temperature_C": round(row_data["temperature_C"], 4),
@@ -172,81 +189,201 @@ def simulation_step(t: int, env: SimulationEnvironment, prev_state: SimulationSt
         "feed_spike": bool(row_data["feed_spike"]),
         "stock_add": int(row_data["stock_add"])
     }
-    return new_state, final_row
+    return state, final_row
+
+# --- Procesado por bloques (un día de filas crudas) ---
+def rows_to_columns(rows: List[Dict[str, Any]]) -> SimStateColumns:
+    """Convierte una lista de filas dict a columnas numpy."""
+    return {key: np.array([row[key] for row in rows]) for key in rows[0]}
+
+def finalize_columns(cols: SimStateColumns) -> SimStateColumns:
+    """Selecciona las columnas de salida y aplica el redondeo/tipos de final_row en bloque."""
+    final = {}
+    for key, decimals in OUTPUT_COLUMNS.items():
+        values = cols[key]
+        if decimals is not None:
+            final[key] = np.round(values.astype(np.float64), decimals)
+        elif key in BOOLEAN_OUTPUT_COLUMNS:
+            final[key] = values.astype(bool)
+        else:
+            final[key] = values.astype(np.int64)
+    return final
+
+def process_day_block(env: SimulationEnvironment, day_rows: List[Dict[str, Any]]) -> SimStateColumns:
+    return process_day_columns(env, rows_to_columns(day_rows))
+
+def process_day_columns(env: SimulationEnvironment, cols: SimStateColumns) -> SimStateColumns:
+    """
+    Aplica la sanidad (en bloque o fila a fila según env.sanity_mode) y el
+    redondeo de salida a un bloque de columnas crudas. Las reglas usan sus
+    propios flujos de RNG, así que ambos modos dan el mismo resultado.
+    """
+    if env.sanity_mode == "vectorized":
+        cols = env.apply_sanity_block(cols)
+    else:
+        cols = env.apply_sanity_rows(cols)
+    return finalize_columns(cols)
+
+# --- Simulación de un bloque de minutos (un día) ---
+def simulate_day_reference(
+    env: SimulationEnvironment, state: SimulationState, t0: int, n: int, feed_kg_per_min_today: float
+) -> Tuple[SimulationState, SimStateColumns]:
+    """
+    Camino de referencia: n pasos de advance_step desde el minuto t0, escritos
+    directamente en columnas del día preasignadas (sin filas dict).
+    """
+    out = np.empty((n, len(STEP_COLUMNS)), dtype=np.float64)
+    for i, t in enumerate(range(t0, t0 + n * env.dt_minutes, env.dt_minutes)):
+        out[i] = advance_step(t, env, state, feed_kg_per_min_today)
+    cols = {}
+    for j, key in enumerate(STEP_COLUMNS):
+        if key in STEP_INT_COLUMNS:
+            cols[key] = out[:, j].astype(np.int64)
+        elif key in STEP_BOOL_COLUMNS:
+            cols[key] = out[:, j] != 0
+        else:
+            cols[key] = out[:, j]
+    return state, cols
+
+def simulate_day_fused(
+    env: SimulationEnvironment, kernel: Callable, params: np.ndarray, events: Tuple[np.ndarray, ...],
+    state: SimulationState, t0: int, n: int, feed_kg_per_min_today: float
+) -> Tuple[SimulationState, SimStateColumns]:
+    """Mismo contrato que simulate_day_reference, usando el kernel fusionado (numba)."""
+    s0 = t0 // env.dt_minutes
+    waterchange, o2_event, spike_start, stock_add = (events_array[s0:s0 + n] for events_array in events)
+    out = np.empty((n, N_OUTPUTS), dtype=np.float64)
+    rngs = env.rngs
+    kernel(rngs["temperature"], rngs["salinity"], rngs["feed"], rngs["oxygen"], rngs["ph"], rngs["mortality"],
+           params, t0, n, state.salinity, state.ph, state.feed_spike_remaining, state.survivors,
+           feed_kg_per_min_today, waterchange, o2_event, spike_start, stock_add, out)
+
+    survivors = out[:, K_SURVIVORS].astype(np.int64)
+    spike_remaining = out[:, K_SPIKE_REMAINING].astype(np.int64)
+    state.temperature = out[-1, K_TEMP]
+    state.salinity = out[-1, K_SAL]
+    state.oxygen = out[-1, K_O2]
+    state.ph = out[-1, K_PH]
+    state.feed_spike_remaining = int(spike_remaining[-1])
+    state.survivors = int(survivors[-1])
+    state.density = out[-1, K_DENSITY]
+    cols = {
+        "tank_id": np.full(n, env.tank_id, dtype=np.int64),
+        "minute_index": np.arange(t0, t0 + n * env.dt_minutes, env.dt_minutes, dtype=np.int64),
+        "temperature_C": out[:, K_TEMP],
+        "salinity_ppt": out[:, K_SAL],
+        "oxygen_mgL": out[:, K_O2],
+        "pH": out[:, K_PH],
+        "feed_kg_min": out[:, K_FEED],
+        "density_shrimp_L": out[:, K_DENSITY],
+        "survivors": survivors,
+        "deaths": out[:, K_DEATHS].astype(np.int64),
+        "current_weight_g": np.full(n, state.current_weight_g, dtype=np.float64),
+        "biomass_kg": np.full(n, state.biomass_kg, dtype=np.float64),
+        "waterchange": waterchange.copy(),
+        "feed_spike": spike_remaining > 0,
+        "stock_add": stock_add.astype(np.int64),
+        "mortality_rate_min": out[:, K_MRATE],
+    }
+    return state, cols
+
+def build_day_simulator(env: SimulationEnvironment) -> Callable:
+    """
+    Selecciona el backend del bucle paso a paso (env.kernel_backend) y
+    devuelve una función (state, t0, n_pasos, feed) -> (state, columnas crudas).
+    """
+    if resolve_kernel_backend(env.kernel_backend) == "numba":
+        return partial(simulate_day_fused, env, get_compiled_kernel(), pack_kernel_params(env), event_arrays(env))
+    return partial(simulate_day_reference, env)
 
 # --- COMPONENTE 5: El Runner del Bucle (SRP) ---
-def run_simulation(env: SimulationEnvironment, progress_callback: Optional[Callable[[float], None]] = None) -> List[Dict[str, Any]]:
+def run_simulation(
+    env: SimulationEnvironment,
+    progress_callback: Optional[Callable[[float], None]] = None,
+    timer: Optional[StageTimer] = None,
+    collector: Optional[OutputCollector] = None,
+    stop_conditions: Optional[List[StopCondition]] = None,
+    cancel_token: Optional[CancellationToken] = None
+) -> Any:
     """
-    R.U.: Ejecuta el bucle de simulación. MINUTO a MINUTO. 
+    R.U.: Ejecuta el bucle de simulación por días (cada día paso a paso de
+    env.dt_minutes, con el backend python o el kernel fusionado). Las filas se procesan por
+    bloques diarios (sanidad + redondeo) y se entregan al `collector`
+    (por defecto RowCollector: devuelve la lista de filas por minuto).
+    `stop_conditions` se evalúan al cierre de cada día, además del peso objetivo.
+    `cancel_token` se consulta al inicio de cada día: si el job se canceló o
+    venció su plazo lanza SimulationCancelled (como mucho un día después).
+    Con `timer` se registran las etapas 'simulation_loop' y 'day_blocks'.
     """
     print(f"Starting simulation for tank {env.tank_id} ({env.days} days)...")
-    
-    # Cargar params solo para el estado inicial
+    timer = timer or NULL_TIMER
+    collector = collector or RowCollector()
+    conditions = [target_weight_reached, *(stop_conditions or [])]
+    loop_start = time.perf_counter()
+    minutes_per_day = int(MINUTES_PER_DAY)
+    dt = env.dt_minutes
 
     state = env.get_initial_state()
-        
-    rows = []
-    daily_feed_given_kg = 0.0 
-    feed_kg_per_min_today = 0.0 
-    daily_temps = []
-    
-    # --- Bucle Principal ---
-    for t in range(env.minutes):
-        
-        # --- Lógica Diaria (se ejecuta al inicio del día, t=0, 1440, etc.) ---
-        if  progress_callback and t % MINUTES_PER_DAY == 0:
-            day_number = t // MINUTES_PER_DAY
-            progress = (t / env.minutes) * 100
-            progress_callback(progress)
-            # print(f"  Simulating Day {day_number + 1}...")
-            
-            # 1. Calcular biomasa actual (inicio del día)
-            state.biomass_kg = (state.survivors * state.current_weight_g) / 1000.0
-            
-            # 2. Calcular demanda de feed para HOY (kg/día)
-            daily_feed_demand_kg = calculate_daily_feed_demand_kg(
-                state.biomass_kg,
-                state.current_weight_g, 
-                env.growth_config       
-            )
-            
-            # 3. Calcular tasa de feed para los próximos minutos (kg/min)
-            feed_kg_per_min_today = daily_feed_demand_kg / MINUTES_PER_DAY
-            
-            # 4. Resetear acumulador de comida del día
-            daily_feed_given_kg = 0.0
-
-        # --- Lógica Minuto a Minuto ---
-        # Pasamos la tasa de feed calculada para el día actual
-        new_state, output_row = simulation_step(t, env, state, feed_kg_per_min_today)
-        
-        # Acumulamos cuánto alimento se dio *realmente* este minuto
-        daily_feed_given_kg += output_row["feed_kg_min"] 
-        daily_temps.append(output_row["temperature_C"])
-        
-        rows.append(output_row)
-        state = new_state # Actualizamos el estado para el siguiente minuto
+    simulate_day = build_day_simulator(env)
+    collector.start(env)
+    stop_reason = "completed"
+    t = -dt
+
+    # --- Bucle Principal (un día por iteración) ---
+    for t0 in range(0, env.minutes, minutes_per_day):
+
+        # --- Lógica Diaria (inicio del día, t=0, 1440, etc.) ---
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        if progress_callback:
+            progress_callback((t0 / env.minutes) * 100)
+
+        # 1. Calcular biomasa actual (inicio del día)
+        state.biomass_kg = (state.survivors * state.current_weight_g) / 1000.0
+        # 2. Calcular demanda de feed para HOY (kg/día) y 3. tasa por minuto (kg/min)
+        daily_feed_demand_kg = calculate_daily_feed_demand_kg(
+            state.biomass_kg,
+            state.current_weight_g,
+            env.growth_config
+        )
+        feed_kg_per_min_today = daily_feed_demand_kg / MINUTES_PER_DAY
+
+        # --- Lógica Paso a Paso (feed_kg_min sigue siendo una tasa por minuto) ---
+        n = min(env.steps_per_day, (env.minutes - t0) // dt)
+        if state.current_weight_g >= env.growth_config.target_weight_g:
+            n = 1  # peso objetivo ya alcanzado: se emite un paso y se detiene
+        state, raw_cols = simulate_day(state, t0, n, feed_kg_per_min_today)
 
-        # --- Lógica Fin del Día (se ejecuta en t=1439) ---
-        if (t + 1) % MINUTES_PER_DAY == 0:
-            # Calcular nuevo peso basado en la comida *realmente* dada
-            avg_temp_today = np.mean(daily_temps) if daily_temps else env.temp_config.base
+        # --- Lógica Fin del Día ---
+        with timer.stage("day_blocks"):
+            day = process_day_columns(env, raw_cols)
+        t = t0 + (n - 1) * dt
+        if n == env.steps_per_day:
+            # Calcular nuevo peso basado en la comida *realmente* dada (ya redondeada)
             state.current_weight_g = calculate_daily_growth(
                 current_weight_g=state.current_weight_g,
-                feed_eaten_today_kg=daily_feed_given_kg,
+                feed_eaten_today_kg=float(day["feed_kg_min"].sum()) * dt,
                 fcr=env.growth_config.fcr,
                 survivors_at_end_of_day=state.survivors,
-                avg_temp_today=avg_temp_today,     
-                config=env.growth_config        
+                avg_temp_today=float(day["temperature_C"].mean()),
+                config=env.growth_config
             )
-            daily_temps = [] 
-            # Imprimir progreso diario (opcional)
-            # print(f"    End of Day {day_number + 1}: Weight={state.current_weight_g:.2f}g, Survivors={state.survivors}")
+        with timer.stage("day_blocks"):
+            collector.add_day(day, state)
 
-        # --- Condición de Parada (Cosecha) ---
-        if state.current_weight_g >= env.growth_config.target_weight_g:
+        # --- Condiciones de Parada (Cosecha y las del usuario) ---
+        reason = next((r for r in (condition(env, state, day) for condition in conditions) if r), None)
+        if reason == "target_weight":
             print(f"  Target weight {env.growth_config.target_weight_g}g reached at minute {t}. Stopping simulation.")
-            break 
+        elif reason:
+            print(f"  Stop condition '{reason}' met at minute {t}. Stopping simulation.")
+        if reason:
+            stop_reason = reason
+            break
+
+    # El bucle incluye los bloques diarios; day_blocks permite separar su coste
+    timer.record("simulation_loop", time.perf_counter() - loop_start)
 
-    print(f"Simulation loop complete. {len(rows)} minutes generated.")
-    return rows
\ No newline at end of file
+    result = collector.result(env, state, stop_reason)
+    print(f"Simulation loop complete. {t + dt} minutes generated.")
+    return result
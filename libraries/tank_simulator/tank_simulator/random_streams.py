@@ -0,0 +1,21 @@
+"""
+Flujos de números aleatorios con nombre, derivados de la semilla del job con
+SeedSequence.spawn. Cada subsistema (y cada regla de sanidad con ruido)
+consume solo su flujo: el orden o el número de sorteos de uno no altera a los
+demás, así que un motor vectorizado, paralelo o compilado reproduce bit a bit
+al secuencial mientras respete el orden de sorteos *dentro* de cada flujo.
+"""
+from .common_imports import *
+
+# El orden define qué hijo de la SeedSequence recibe cada flujo:
+# los flujos nuevos se añaden al final para no cambiar los existentes.
+RNG_STREAMS = (
+    "events", "temperature", "salinity", "feed", "oxygen", "ph", "mortality",
+    "sanity_temp_ph", "sanity_density_o2", "sanity_waterchange_salinity",
+)
+
+
+def spawn_streams(seed: int) -> Dict[str, np.random.Generator]:
+    """Un Generator independiente por cada nombre de RNG_STREAMS."""
+    children = np.random.SeedSequence(seed).spawn(len(RNG_STREAMS))
+    return {name: np.random.default_rng(child) for name, child in zip(RNG_STREAMS, children)}
@@ -0,0 +1,33 @@
+"""
+Condiciones de parada evaluadas al cierre de cada día (tras el crecimiento).
+Cada condición recibe (env, state, day) y devuelve el motivo de parada o None.
+target_weight_reached siempre está activa; el resto se añade por corrida.
+"""
+from .common_imports import *
+
+from .config_models import SimulationState, SimStateColumns
+
+StopCondition = Callable[[Any, SimulationState, SimStateColumns], Optional[str]]
+
+
+def target_weight_reached(env, state: SimulationState, day: SimStateColumns) -> Optional[str]:
+    if state.current_weight_g >= env.growth_config.target_weight_g:
+        return "target_weight"
+    return None
+
+def survivors_below(threshold: int) -> StopCondition:
+    """Detiene la corrida cuando los supervivientes al cierre del día caen bajo `threshold`."""
+    def condition(env, state: SimulationState, day: SimStateColumns) -> Optional[str]:
+        return "survivors_below" if state.survivors < threshold else None
+    return condition
+
+def daily_mortality_above(max_ratio: float) -> StopCondition:
+    """
+    Detiene la corrida tras un día cuya mortalidad (muertes del día sobre la
+    población expuesta: supervivientes al cierre + muertes) supere `max_ratio`.
+    """
+    def condition(env, state: SimulationState, day: SimStateColumns) -> Optional[str]:
+        deaths = int(day["deaths"].sum())
+        exposed = int(day["survivors"][-1]) + deaths
+        return "daily_mortality_above" if exposed and deaths / exposed > max_ratio else None
+    return condition
@@ -0,0 +1,162 @@
+"""
+Barridos de parámetros sobre un preset base: rejilla (producto cartesiano) o
+hipercubo latino. Todos los puntos usan la misma semilla (números aleatorios
+comunes), así las diferencias de KPIs se deben a los parámetros y no al ruido.
+Los puntos que no cambian SCHEDULE_FIELDS comparten horarios (flujo "events").
+"""
+from .common_imports import *
+import multiprocessing
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from .environment import SimulationEnvironment, SCHEDULE_FIELDS
+from .orchestration import run_simulation
+from .preset_schema import PresetSchema
+from .collectors import KpiCollector
+from .cancellation import CancellationToken
+
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Producto cartesiano de los valores de cada campo, en el orden del dict."""
+    if not grid:
+        return [{}]
+    fields = list(grid)
+    return [dict(zip(fields, values)) for values in product(*(grid[field] for field in fields))]
+
+def latin_hypercube(ranges: Dict[str, Tuple[float, float]], n_points: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Muestreo por hipercubo latino: cada rango se divide en n_points estratos y
+    cada estrato se usa exactamente una vez por campo. Los campos enteros del
+    preset (p.ej. initial_N) se redondean.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for field, (low, high) in ranges.items():
+        strata = (rng.permutation(n_points) + rng.random(n_points)) / n_points
+        values = low + strata * (high - low)
+        if PresetSchema.model_fields[field].annotation is int:
+            values = np.rint(values).astype(int)
+        columns[field] = values.tolist()
+    return [{field: columns[field][i] for field in ranges} for i in range(n_points)]
+
+
+def _schedule_overrides(overrides: Dict[str, Any]) -> Tuple:
+    return tuple((field, repr(overrides[field])) for field in SCHEDULE_FIELDS if field in overrides)
+
+_cancel_event = None
+
+def _init_sweep_worker(cancel_event) -> None:
+    """Inicializador de los procesos hijos: guarda el evento de cancelación del barrido."""
+    global _cancel_event
+    _cancel_event = cancel_event
+
+def _worker_cancel_token() -> Optional[CancellationToken]:
+    """En un proceso hijo, token que se corta en cuanto el padre activa el evento."""
+    if _cancel_event is None:
+        return None
+    return CancellationToken(is_cancelled=_cancel_event.is_set, check_interval_s=0)
+
+def _run_point_group(
+    base_preset: dict,
+    points: List[Tuple[int, Dict[str, Any]]],
+    days: int,
+    seed: int,
+    start_time: datetime,
+    tank_id: int,
+    env_options: Dict[str, Any],
+    cancel_token: Optional[CancellationToken] = None
+) -> List[Dict[str, Any]]:
+    """
+    Ejecuta un grupo de puntos que comparten horarios: el primero los genera
+    y el resto los reutiliza (schedules_from). Se ejecuta en un proceso hijo,
+    donde el token es el del evento de cancelación compartido con el padre.
+    """
+    cancel_token = cancel_token or _worker_cancel_token()
+    results = []
+    template = None
+    for index, overrides in points:
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        env = SimulationEnvironment(
+            days=days,
+            config_dict={**base_preset, **overrides},
+            seed=seed,
+            start_time=start_time,
+            tank_id=tank_id,
+            schedules_from=template,
+            **env_options
+        )
+        template = template or env
+        kpis = run_simulation(env, collector=KpiCollector(), cancel_token=cancel_token)
+        results.append({"point": index, **overrides, **kpis})
+    return results
+
+def run_sweep(
+    base_preset: dict,
+    points: List[Dict[str, Any]],
+    days: int,
+    seed: int,
+    start_time: datetime,
+    tank_id: int,
+    max_workers: Optional[int] = None,
+    progress_callback: Optional[Callable[[float], None]] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    **env_options
+) -> List[Dict[str, Any]]:
+    """
+    Ejecuta todos los puntos del barrido (overrides sobre base_preset) en
+    paralelo y devuelve una fila de KPIs por punto, ordenadas por 'point'.
+    Los puntos se agrupan por los SCHEDULE_FIELDS que modifican y cada grupo
+    se reparte en tantos lotes como procesos, para que cada lote genere sus
+    horarios una sola vez.
+    Con un solo proceso `cancel_token` llega a run_simulation (se corta en el
+    siguiente día simulado); con varios el padre lo consulta cada
+    check_interval_s, descarta los lotes pendientes sin esperar a los que
+    corren y les reenvía la cancelación por un multiprocessing.Event, que los
+    hijos consultan entre escenarios y en cada cierre de día.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    groups: Dict[Tuple, List[Tuple[int, Dict[str, Any]]]] = {}
+    for index, overrides in enumerate(points):
+        groups.setdefault(_schedule_overrides(overrides), []).append((index, overrides))
+
+    batches = []
+    for group in groups.values():
+        n_batches = min(max_workers, len(group))
+        batches.extend(group[i::n_batches] for i in range(n_batches))
+
+    run_batch = partial(
+        _run_point_group, base_preset, days=days, seed=seed,
+        start_time=start_time, tank_id=tank_id, env_options=env_options
+    )
+    results = []
+    if max_workers == 1:
+        for batch in batches:
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+            results.extend(run_batch(batch, cancel_token=cancel_token))
+            if progress_callback:
+                progress_callback(len(results) / len(points) * 100)
+    else:
+        cancel_event = multiprocessing.Event()
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_sweep_worker,
+                                       initargs=(cancel_event,))
+        # Sin token basta con esperar a cada lote; con token se despierta para consultarlo
+        poll_s = max(cancel_token.check_interval_s, 0.1) if cancel_token else None
+        pending = {executor.submit(run_batch, batch) for batch in batches}
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=poll_s, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results.extend(future.result())
+                if done and progress_callback:
+                    progress_callback(len(results) / len(points) * 100)
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+        except BaseException:
+            cancel_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+
+    return sorted(results, key=lambda row: row["point"])
@@ -1,31 +1,141 @@
+import threading
 from common.common_imports import *
 from common.models import *
 from common.simulation_utils import *
 from common.redis_utils import *
 from common.rabbit_utils import *
+from common.scheduling import route_job, publish_job
+from common.serialization import dumps_str, UploadMessage
 from common.logger import *
 from common.job_status import *
+from common.minio_utils import *
+from tank_simulator.instrumentation import StageTimer, PeakRssSampler, profiled
+from tank_simulator.cancellation import CancellationToken, SimulationCancelled
+from common.metrics import *
 
 redis_client = RedisClient(REDIS_URL)
 logger = get_logger('SimulationWorker')
+minio_client = None
 
-def callback(ch, method, properties, body):
+def get_upload_sink(job_id: str, tank_id: int):
+    """Sink de subida directa a MinIO (solo si SIMULATIONS_DIRECT_UPLOAD está activo)."""
+    global minio_client
+    if not DIRECT_UPLOAD:
+        return None
     try:
-        data = json.loads(body.decode())
-        payload = SimulationPayload(**data["data"])
-        job_id = payload.job_id
-        logger.info(f"[→] Recibida simulación Job: {job_id}")
-        redis_client.update_job(job_id, {"status": JobStatus.RUNNING.value, "progress": 0})
-        
-        def on_progress(percent: float):
-            scaled_progress = round(percent * 0.70, 2)
-            redis_client.publish_progress(
-                job_id=job_id,
-                channel=REDIS_SIMULATION_CHANNEL,
-                status=JobStatus.RUNNING.value,
-                progress=scaled_progress
-            )
+        if minio_client is None:
+            minio_client = create_minio_client()
+            ensure_bucket(minio_client)
+        return MinioUploadSink(minio_client, f"{job_id}/tank_{tank_id}")
+    except Exception as e:
+        logger.warning(f"[!] MinIO no disponible, se usará la cola de subida: {e}")
+        return None
+
+def queue_upload(ch, job_id: str, tank_id: int, paths: Dict[str, str], cache_url: str = None, cache_path: str = None):
+    """
+    Encola la subida de los artefactos de un job (tablas sin caché de chunks por
+    defecto) en el canal del carril que lo consume: los canales de pika no se
+    comparten entre hilos.
+    """
+    upload_message = UploadMessage(
+        job_id=job_id,
+        tank_id=tank_id,
+        csv_path=paths.get("csv"),
+        parquet_path=paths.get("parquet"),
+        cache_url=cache_url,
+        cache_path=cache_path,
+        published_at=time.time(),
+    )
+    logger.info(f"Paths para MinIO {upload_message}")
+    ch.basic_publish(exchange="", routing_key=UPLOAD_QUEUE, body=upload_message.to_json())
+    redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.QUEUED_FOR_UPLOAD.value, 92)
+
+def build_cancel_token(job_id: str, timeout_s: Optional[float]) -> CancellationToken:
+    """Token del job: plazo (payload o SIMULATIONS_JOB_TIMEOUT_S) y clave '{job_id}:cancel' en Redis."""
+    return CancellationToken(
+        deadline_s=timeout_s or JOB_TIMEOUT_S or None,
+        is_cancelled=partial(redis_client.cancel_requested, job_id),
+        check_interval_s=CANCEL_CHECK_INTERVAL_S,
+    )
+
+def process_summary(ch, method, payload: SimulationPayload, cancel_token: CancellationToken) -> Dict[str, Any]:
+    """Modos 'daily' y 'kpis': sin filas por minuto, ni chunks de caché."""
+    job_id = payload.job_id
+
+    def on_progress(percent: float):
+        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.RUNNING.value, round(percent * 0.85, 2))
+
+    timer = StageTimer()
+    result = simulate_tank_summary(
+        days=payload.days,
+        config_dict=payload.preset.model_dump(),
+        seed=payload.seed,
+        start_time=payload.start_time,
+        tank_id=payload.tank_id,
+        output_mode=payload.output_mode,
+        stop=payload.stop,
+        progress_callback=on_progress,
+        timer=timer,
+        dt_minutes=payload.dt_minutes,
+        cancel_token=cancel_token,
+    )
+    observe_stage_timer("simulation", timer)
+
+    if payload.output_mode == "kpis":
+        redis_client.update_job(job_id, {**timer.as_dict(), "kpis": dumps_str(result)})
+        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.COMPLETED.value, 100)
+        logger.info(f"[✔] KPIs calculados para {job_id}: {result}")
+        shared = {"kind": "kpis", "kpis": result}
+    else:
+        paths = write_table(result, SIMULATIONS_OUT_DIR, payload.tank_id,
+                            f"{job_id}_tank_{payload.tank_id}_daily", timer)
+        redis_client.update_job(job_id, timer.as_dict())
+        queue_upload(ch, job_id, payload.tank_id, paths)
+        logger.info(f"[✔] Agregados diarios listos para {job_id} ({len(result)} días). Archivos: {paths}")
+        shared = {"kind": "files", "paths": paths}
+
+    JOBS_TOTAL.labels(worker="simulation", status="completed").inc()
+    ch.basic_ack(delivery_tag=method.delivery_tag)
+    return shared
 
+def process_sweep(ch, method, payload: SweepPayload, cancel_token: CancellationToken) -> Dict[str, Any]:
+    """Barrido de parámetros: una tabla de KPIs por punto, subida por la cola de MinIO."""
+    job_id = payload.job_id
+
+    def on_progress(percent: float):
+        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.RUNNING.value, round(percent * 0.85, 2))
+
+    timer = StageTimer()
+    df, paths = run_sweep_job(payload, SIMULATIONS_OUT_DIR, progress_callback=on_progress, timer=timer,
+                              cancel_token=cancel_token)
+    redis_client.update_job(job_id, {**timer.as_dict(), "sweep_points": len(df)})
+    logger.info(f"[⏱] Etapas barrido {job_id}: {timer.summary()}")
+    observe_stage_timer("simulation", timer)
+
+    queue_upload(ch, job_id, payload.tank_id, paths)
+    logger.info(f"[✔] Barrido completado para {job_id} ({len(df)} puntos). Archivos: {paths}")
+    JOBS_TOTAL.labels(worker="simulation", status="completed").inc()
+    ch.basic_ack(delivery_tag=method.delivery_tag)
+    return {"kind": "files", "paths": paths}
+
+def process_simulation(ch, method, payload: SimulationPayload, cancel_token: CancellationToken) -> Dict[str, Any]:
+    """Modo 'rows': filas por minuto, artefactos CSV/Parquet y chunks para el cache server."""
+    job_id = payload.job_id
+
+    def on_progress(percent: float):
+        scaled_progress = round(percent * 0.70, 2)
+        redis_client.publish_progress(
+            job_id=job_id,
+            channel=REDIS_SIMULATION_CHANNEL,
+            status=JobStatus.RUNNING.value,
+            progress=scaled_progress
+        )
+
+    timer = StageTimer()
+    profile_path = job_profile_path(SIMULATIONS_OUT_DIR, payload.tank_id, job_id) if payload.profile else None
+    memory_budget_mb = payload.memory_budget_mb or MEMORY_BUDGET_MB or None
+
+    with profiled(profile_path), PeakRssSampler() as rss:
         df, paths = simulate_tank_data(
             days=payload.days,
             config_dict=payload.preset.model_dump(),
@@ -35,55 +145,202 @@ def callback(ch, method, properties, body):
             tank_id=payload.tank_id,
             job_id=job_id,
             progress_callback=on_progress,
-        )  
+            sink=get_upload_sink(job_id, payload.tank_id),
+            export_options=payload.export,
+            timer=timer,
+            stop=payload.stop,
+            dt_minutes=payload.dt_minutes,
+            cancel_token=cancel_token,
+            chunk_size=CHUNK_SIZE,
+            memory_budget_bytes=memory_budget_mb * 2**20 if memory_budget_mb else None,
+        )
+    del df  # ya exportado (None con presupuesto de memoria)
 
-        # Enviando a MINIO-
-        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.GENERATING_FILES.value, 70)
+    # Los chunks del cache server ya se generaron a la vez que CSV/Parquet
+    redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.GENERATING_FILES.value, 70)
+    cache_path = paths.pop("cache")
+    n_rows = paths.pop("rows")
 
-        cache_path = generate_chunks(df, job_id, payload.tank_id, out_dir=SIMULATIONS_OUT_DIR)
+    redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.GENERATING_FILES.value, 85)
 
-        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.GENERATING_FILES.value, 85)
+    stage_report = timer.as_dict()
+    stage_report["peak_rss_mb"] = round(rss.peak_mb, 1)
+    if memory_budget_mb:
+        stage_report["memory_budget_mb"] = memory_budget_mb
+    if profile_path:
+        stage_report["profile_path"] = profile_path
+    redis_client.update_job(job_id, stage_report)
+    logger.info(f"[⏱] Etapas job {job_id}: {timer.summary()} | pico RSS {rss.peak_mb:.0f} MB")
+    if memory_budget_mb and rss.peak_mb > memory_budget_mb:
+        logger.warning(f"[!] Job {job_id} superó su presupuesto de memoria: {rss.peak_mb:.0f} > {memory_budget_mb} MB")
+    observe_stage_timer("simulation", timer)
+    observe_simulation(n_rows * payload.dt_minutes, timer.durations.get("simulation_loop"))
 
-        print(CACHE_SERVER_URL)
-        if check_cache_server_alive(CACHE_SERVER_URL):
-            cache_url = f"{CACHE_SERVER_URL}/cache/{job_id}/metadata"
-        else:
-            logger.warning("[!] Cache server no disponible, cache_url = null")
-            cache_url = None
+    logger.debug(f"Cache server: {CACHE_SERVER_URL}")
+    if check_cache_server_alive(CACHE_SERVER_URL):
+        cache_url = f"{CACHE_SERVER_URL}/cache/{job_id}/metadata"
+    else:
+        logger.warning("[!] Cache server no disponible, cache_url = null")
+        cache_url = None
 
-        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.PREPARING_UPLOAD.value, 90)
+    redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.PREPARING_UPLOAD.value, 90)
+    shared = {"kind": "files", "paths": paths, "cache_url": cache_url, "cache_path": cache_path}
 
-        upload_message = {
-            "job_id": job_id,
-            "tank_id": payload.tank_id,
-            "csv_path": paths.get("csv"),
-            "parquet_path": paths.get("parquet"),
-            "cache_url": cache_url,
-            "cache_path": cache_path,
-        }
+    if paths.get("csv_url"):
+        # Los artefactos ya se subieron en proceso: no pasa por UPLOAD_QUEUE
+        logger.info(f"[✔] Simulación subida directamente a MinIO para {job_id}. Archivos: {paths}")
+        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.COMPLETED.value, 100, paths["csv_url"])
+        JOBS_TOTAL.labels(worker="simulation", status="completed").inc()
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        return shared
 
+    queue_upload(ch, job_id, payload.tank_id, paths, cache_url, cache_path)
 
-        logger.info(f"Paths para MinIO {upload_message}")
+    redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.PREPARING_UPLOAD.value, 95, cache_url)
 
-        channel.basic_publish(
-            exchange="",
-            routing_key=UPLOAD_QUEUE,
-            body=json.dumps(upload_message)
-        )
+    logger.info(f"[✔] Simulación completada para {job_id}. Archivos: {paths}")
+    JOBS_TOTAL.labels(worker="simulation", status="completed").inc()
+
+    ch.basic_ack(delivery_tag=method.delivery_tag)
+    return shared
 
-        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.QUEUED_FOR_UPLOAD.value, 92)
+def replay_shared_result(ch, method, job_id: str, tank_id: int, leader_id: str, shared: Dict[str, Any]) -> bool:
+    """
+    Seguidor de un job idéntico: publica los artefactos del líder bajo su
+    propio job_id, con las mismas etapas de progreso que una simulación normal.
+    Los artefactos locales del líder se enlazan como '{job_id}_*': cache_url
+    apunta al propio job y la subida del líder no borra los del seguidor.
+    Devuelve False (sin publicar nada) si el líder ya los borró: el seguidor
+    simula por su cuenta.
+    """
+    if shared["kind"] == "files":
+        try:
+            shared = alias_job_artifacts(leader_id, job_id, shared)
+        except OSError as e:
+            remove_job_artifacts(SIMULATIONS_OUT_DIR, tank_id, job_id)
+            logger.warning(f"[!] Artefactos de {leader_id} ya no disponibles ({e}): {job_id} se simula")
+            return False
 
+    logger.info(f"[=] Job {job_id} idéntico a {leader_id}: se reutilizan sus artefactos")
+    redis_client.update_job(job_id, {"deduplicated_from": leader_id})
+    redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.GENERATING_FILES.value, 70)
+    redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.GENERATING_FILES.value, 85)
+
+    paths = shared.get("paths", {})
+    if shared["kind"] == "kpis":
+        redis_client.update_job(job_id, {"kpis": dumps_str(shared["kpis"])})
+        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.COMPLETED.value, 100)
+    elif paths.get("csv_url"):
+        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.PREPARING_UPLOAD.value, 90)
+        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.COMPLETED.value, 100, paths["csv_url"])
+    else:
+        cache_url = f"{CACHE_SERVER_URL}/cache/{job_id}/metadata" if shared.get("cache_url") else None
+        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.PREPARING_UPLOAD.value, 90)
+        queue_upload(ch, job_id, tank_id, paths, cache_url, shared.get("cache_path"))
         redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.PREPARING_UPLOAD.value, 95, cache_url)
 
-        logger.info(f"[✔] Simulación completada para {job_id}. Archivos: {paths}")
+    JOBS_TOTAL.labels(worker="simulation", status="deduplicated").inc()
+    ch.basic_ack(delivery_tag=method.delivery_tag)
+    return True
+
+def share_result(fingerprint: str, job_id: str, shared: Dict[str, Any]):
+    """
+    Publica el resultado del líder para sus seguidores. Va después del ack:
+    un fallo solo se registra (un nack de un mensaje ya confirmado cerraría
+    el canal) y se libera el lock para que un seguidor simule.
+    """
+    try:
+        redis_client.share_job_result(fingerprint, job_id, shared, DEDUP_WINDOW_S)
+    except Exception as e:
+        logger.error(f"[!] No se pudo compartir el resultado de {job_id}: {e}")
+        try:
+            redis_client.release_fingerprint(fingerprint, job_id)
+        except Exception:
+            pass  # el lock caduca solo tras DEDUP_LOCK_TTL_S
+
+def callback(ch, method, properties, body):
+    job_id, fingerprint = None, None
+    try:
+        message = parse_job_message(body)
+        observe_queue_wait(method.routing_key, properties, message)
+        payload = message.data
+        is_sweep = message.type == "sweep"
+        job_id = payload.job_id
+
+        # Los productores publican en la cola corta: los jobs grandes se pasan al carril largo
+        lane, lane_queue, _ = route_job(payload)
+        if method.routing_key == LANE_QUEUES["short"] and lane == "long":
+            publish_job(ch, body, payload)
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            logger.info(f"[↪] Job {job_id} enrutado al carril largo ({lane_queue})")
+            return
+
+        logger.info(f"[→] Recibido {'barrido' if is_sweep else 'simulación'} Job: {job_id}")
+        redis_client.update_job(job_id, {"status": JobStatus.RUNNING.value, "progress": 0})
+
+        # Payloads idénticos (salvo job_id) en vuelo: uno simula y el resto reutiliza
+        if DEDUP_ENABLED:
+            fingerprint = payload_fingerprint(payload)
+            leader_id, shared = redis_client.coalesce_job(
+                fingerprint, job_id, DEDUP_LOCK_TTL_S, DEDUP_POLL_S, DEDUP_MAX_WAIT_S
+            )
+            if leader_id is not None:
+                fingerprint = None
+                if shared is None:
+                    logger.warning(f"[!] {leader_id} sin resultado tras {DEDUP_MAX_WAIT_S:.0f}s: {job_id} se simula")
+                elif replay_shared_result(ch, method, job_id, payload.tank_id, leader_id, shared):
+                    return
+
+        cancel_token = build_cancel_token(job_id, payload.timeout_s)
+        if is_sweep:
+            shared = process_sweep(ch, method, payload, cancel_token)
+        elif payload.output_mode != "rows":
+            shared = process_summary(ch, method, payload, cancel_token)
+        else:
+            shared = process_simulation(ch, method, payload, cancel_token)
+
+        if fingerprint:
+            share_result(fingerprint, job_id, shared)
 
+    except SimulationCancelled as e:
+        # Cancelado o fuera de plazo: libera el core, borra artefactos parciales y no pasa por la DLX
+        if fingerprint:
+            redis_client.release_fingerprint(fingerprint, job_id)
+        removed = remove_job_artifacts(SIMULATIONS_OUT_DIR, payload.tank_id, job_id)
+        status = JobStatus.CANCELLED if e.reason == "cancelled" else JobStatus.TIMEOUT
+        redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, status.value, 100)
+        logger.warning(f"[✖] Job {job_id} detenido ({e.reason}). Artefactos parciales borrados: {len(removed)}")
+        JOBS_TOTAL.labels(worker="simulation", status=e.reason).inc()
         ch.basic_ack(delivery_tag=method.delivery_tag)
 
     except Exception as e:
+        if fingerprint:
+            redis_client.release_fingerprint(fingerprint, job_id)
         logger.error(f"[!] Error ejecutando simulación (Encolando en DLX QUEUE) {e}")
+        JOBS_TOTAL.labels(worker="simulation", status="failed").inc()
         ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
 
+def consume_lane(lane: str):
+    """Consume un carril en su propia conexión: un job largo no bloquea al carril corto."""
+    queue_name = LANE_QUEUES[lane]
+    conn, channel = create_lane_consumer(URL_RABBIT, queue_name, LANE_PREFETCH[lane], callback,
+                                         LANE_QUEUES.values(), RABBITMQ_MAX_PRIORITY)
+    logger.info(f"[*] Esperando mensajes en {queue_name} (prefetch {LANE_PREFETCH[lane]})...")
+    try:
+        channel.start_consuming()
+    except Exception as e:
+        logger.error(f"[!] Consumidor del carril {lane} detenido: {e}")
+
 if __name__ == "__main__":
-    logger.info(f"[*] Esperando mensajes en {COLA_NOMBRE}...")
-    conn, channel = create_rabbit_connection(URL_RABBIT, COLA_NOMBRE, callback)
-    channel.start_consuming()
\ No newline at end of file
+    metrics_port = start_metrics_server(9101)
+    logger.info(f"[*] Métricas en :{metrics_port}/metrics")
+    # Un hilo y una conexión por carril (SIMULATION_LANES): los jobs cortos se
+    # siguen despachando mientras el carril largo simula.
+    lanes = [threading.Thread(target=consume_lane, args=(lane,), name=f"lane-{lane}", daemon=True)
+             for lane in SIMULATION_LANES]
+    for thread in lanes:
+        thread.start()
+    while all(thread.is_alive() for thread in lanes):
+        time.sleep(1)
+    # Si un carril cae, el proceso sale para que el orquestador lo reinicie entero
+    raise SystemExit(1)
@@ -0,0 +1,53 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from prometheus_client import Counter, make_asgi_app
+import os
+import pyarrow as pa
+from common.models import ResultQuery
+from common.result_dataset import run_query, arrow_ipc_stream, list_result_files, QueryError, ARROW_STREAM_MEDIA_TYPE
+
+app = FastAPI()
+app.mount("/metrics", make_asgi_app())
+
+# ==== Métricas ====
+QUERY_REQUESTS = Counter(
+    "query_requests_total", "Consultas analíticas por tipo de resultado y desenlace", ["kind", "result"]
+)
+QUERY_BATCHES_SERVED = Counter("query_batches_served_total", "Lotes Arrow servidos")
+
+BASE_PATH = os.getenv("SIMULATIONS_OUT_DIR", "simulations_storage")
+
+@app.post("/query")
+def query(request: ResultQuery):
+    """
+    Consulta sobre los Parquet de todos los jobs guardados (tank_id/job_id como
+    particiones). Responde Arrow IPC en streaming; p.ej. O2 medio diario por
+    tanque de los jobs X, Y, Z:
+
+        {"job_ids": ["X", "Y", "Z"], "group_by": ["tank_id", "job_id", "day"],
+         "aggregations": {"oxygen_mgL": ["mean"]}}
+    """
+    try:
+        schema, batches = run_query(request, BASE_PATH)
+    except (QueryError, pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        QUERY_REQUESTS.labels(kind=request.kind, result="invalid").inc()
+        raise HTTPException(400, str(e))
+
+    def counted():
+        for batch in batches:
+            QUERY_BATCHES_SERVED.inc()
+            yield batch
+
+    QUERY_REQUESTS.labels(kind=request.kind, result="ok").inc()
+    return StreamingResponse(arrow_ipc_stream(schema, counted()), media_type=ARROW_STREAM_MEDIA_TYPE)
+
+@app.get("/query/jobs")
+def list_jobs(kind: str = "rows"):
+    """Jobs consultables de cada tipo con su tanque."""
+    if kind not in ("rows", "daily", "sweep"):
+        raise HTTPException(400, "kind must be rows, daily or sweep")
+    return [{"tank_id": tank_id, "job_id": job_id} for _, tank_id, job_id in list_result_files(BASE_PATH, kind)]
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
@@ -0,0 +1,12 @@
+import pytest
+from benchmarks.cases import cold_import, UPLOADER_MODULES, SIMULATION_CORE_MODULES
+
+
+@pytest.mark.parametrize("modules, forbidden, budget_ms", [
+    (UPLOADER_MODULES, ("numpy", "pandas", "pyarrow"), 700),
+    (SIMULATION_CORE_MODULES, ("pandas", "pyarrow"), 500),
+], ids=["uploader", "simulation_core"])
+def test_cold_import(modules, forbidden, budget_ms):
+    result = cold_import(modules, forbidden)
+    assert result["loaded"] == [], f"Módulos pesados cargados en el arranque: {result['loaded']}"
+    assert result["import_ms"] <= budget_ms
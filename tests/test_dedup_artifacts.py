@@ -0,0 +1,47 @@
+import os
+import json
+import pandas as pd
+import pyarrow.parquet as pq
+from common.simulation_utils import export_dataframe, generate_chunks, alias_job_artifacts
+from common.run_summary import RunSummary
+from common.storage_lifecycle import StorageManager, UPLOADED_MARKER, job_entries
+from benchmarks.cases import reference_dataframe, TANK_ID
+
+
+def test_follower_artifacts_survive_leader_cleanup(tmp_path):
+    out_dir = str(tmp_path)
+    env, df = reference_dataframe(1)
+    paths = export_dataframe(df, env, out_dir, "leader")
+    cache_path = generate_chunks(df, "leader", TANK_ID, out_dir, chunk_size=500, summary=RunSummary.for_env(env))
+    open(os.path.join(cache_path, UPLOADED_MARKER), "w").close()
+    shared = {"kind": "files", "paths": paths, "cache_url": "/cache/leader/metadata", "cache_path": cache_path}
+
+    follower = alias_job_artifacts("leader", "follower", shared)
+    assert os.path.basename(follower["cache_path"]) == "follower_cache"
+    assert os.path.basename(follower["paths"]["parquet"]).startswith("follower_tank_")
+    assert not os.path.exists(os.path.join(follower["cache_path"], UPLOADED_MARKER))
+
+    # El uploader del líder borra sus archivos antes de que suba el seguidor
+    StorageManager(out_dir=out_dir, keep_hot=False).release_uploaded(
+        "leader", TANK_ID, [paths["parquet"], paths["csv"]]
+    )
+    assert not os.path.exists(paths["parquet"]) and not os.path.exists(cache_path)
+    assert pq.read_metadata(follower["paths"]["parquet"]).num_rows == len(df)
+    assert len(pd.read_csv(follower["paths"]["csv"])) == len(df)
+    with open(os.path.join(follower["cache_path"], "index.json")) as f:
+        index = json.load(f)
+    assert index["job_id"] == "follower"
+    assert sorted(os.listdir(follower["cache_path"])) == sorted(
+        ["index.json", "stats.json", "events.json"] + [f"chunk_{n}.json" for n in range(1, index["chunks"] + 1)]
+    )
+
+
+def test_job_entries_match_full_job_id(tmp_path):
+    tank_folder = tmp_path / f"tank_{TANK_ID}"
+    tank_folder.mkdir()
+    for name in ("abc_tank_1_seed7.csv", "abc_cache", "abc_profile.prof",
+                 "abc_2_tank_1_seed7.csv", "abc_2_cache", "abc_2_profile.prof"):
+        (tank_folder / name).touch()
+
+    names = [os.path.basename(path) for path in job_entries(str(tmp_path), TANK_ID, "abc")]
+    assert names == ["abc_cache", "abc_profile.prof", "abc_tank_1_seed7.csv"]
@@ -0,0 +1,6 @@
+from benchmarks.cases import dt_relative_errors, DT_TOLERANCE
+
+
+def test_dt15_daily_means_match_dt1():
+    errors = dt_relative_errors(dt_minutes=15)
+    assert {key: error for key, error in errors.items() if error > DT_TOLERANCE} == {}
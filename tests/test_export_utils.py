@@ -0,0 +1,45 @@
+import io
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from common.models import ExportOptions
+from common.export_utils import write_csv, apply_precision, minute_timestamps, json_records
+from benchmarks.cases import reference_dataframe
+
+
+@pytest.fixture(scope="module")
+def results():
+    _, df = reference_dataframe(2)
+    return df
+
+
+@pytest.mark.parametrize("engine", ["pandas", "pyarrow"])
+def test_write_csv_leaves_file_open(results, engine):
+    f = io.BytesIO()
+    write_csv(results, f, ExportOptions(csv_engine=engine, csv_compression="gzip"))
+    assert not f.closed
+    assert gzip.decompress(f.getvalue()).startswith(b"timestamp_utc,tank_id,")
+
+
+@pytest.mark.parametrize("precision", ["full", "compact"])
+def test_pyarrow_csv_matches_pandas(results, precision):
+    df = apply_precision(results, ExportOptions(precision=precision))
+    expected, actual = io.BytesIO(), io.BytesIO()
+    write_csv(df, expected, ExportOptions(csv_engine="pandas"))
+    write_csv(df, actual, ExportOptions(csv_engine="pyarrow"))
+    assert actual.getvalue() == expected.getvalue()
+
+
+@pytest.mark.parametrize("engine", ["pandas", "pyarrow"])
+def test_aware_start_keeps_utc_offset(engine):
+    start = datetime(2025, 1, 1, 2, tzinfo=timezone(timedelta(hours=2)))
+    df = pd.DataFrame({"timestamp_utc": minute_timestamps(start, np.arange(3)), "minute_index": np.arange(3)})
+    f = io.BytesIO()
+    write_csv(df, f, ExportOptions(csv_engine=engine))
+    assert f.getvalue().splitlines()[1] == b"2025-01-01T00:01:00+00:00,0"
+    records = json.loads(json_records(pa.Table.from_pandas(df, preserve_index=False)))
+    assert records[0]["timestamp_utc"] == "2025-01-01T00:01:00+00:00"
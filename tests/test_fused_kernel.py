@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from tank_simulator import kernels
+from tank_simulator.orchestration import simulate_day_reference, simulate_day_fused
+from benchmarks.cases import build_env
+
+DAYS = 10
+
+
+def assert_fused_matches_reference(kernel, dt_minutes: int) -> None:
+    """Mismas columnas crudas y mismo estado al cierre de cada día, con la misma semilla."""
+    env_ref, env_fused = build_env(DAYS, dt_minutes=dt_minutes), build_env(DAYS, dt_minutes=dt_minutes)
+    params, events = kernels.pack_kernel_params(env_fused), kernels.event_arrays(env_fused)
+    state_ref, state_fused = env_ref.get_initial_state(), env_fused.get_initial_state()
+    n = env_ref.steps_per_day
+    for day in range(DAYS):
+        t0 = day * 1440
+        feed = 0.002 * (day + 1)
+        state_ref, ref_cols = simulate_day_reference(env_ref, state_ref, t0, n, feed)
+        state_fused, fused_cols = simulate_day_fused(env_fused, kernel, params, events, state_fused, t0, n, feed)
+        mismatched = [key for key in ref_cols if not np.array_equal(ref_cols[key], fused_cols[key])]
+        assert mismatched == [], f"día {day}"
+        assert state_fused == state_ref, f"día {day}"
+
+
+@pytest.mark.parametrize("dt_minutes", [1, 15])
+def test_python_kernel_matches_reference(dt_minutes):
+    assert_fused_matches_reference(kernels.fused_day_kernel, dt_minutes)
+
+
+@pytest.mark.parametrize("dt_minutes", [1, 15])
+def test_compiled_kernel_matches_reference(dt_minutes):
+    pytest.importorskip("numba")
+    assert_fused_matches_reference(kernels.get_compiled_kernel(), dt_minutes)
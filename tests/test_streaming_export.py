@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import subprocess
+import pyarrow.parquet as pq
+from tank_simulator.orchestration import run_simulation
+from common.simulation_utils import export_dataframe, generate_chunks, rows_to_dataframe
+from common.streaming_export import StreamingExportCollector, MemoryPlan
+from common.run_summary import RunSummary
+from benchmarks.cases import ROOT, TANK_ID, build_env, reference_dataframe
+
+BUDGET_MB = 200
+# Intérprete propio: el pico de pytest incluye lo que hayan cargado otros
+# tests. Se lee VmHWM (pico desde el exec) y no ru_maxrss, que en Linux
+# arrastra el RSS del padre en el momento del fork/exec.
+BUDGET_RUN = """
+import sys, json, resource
+from benchmarks.cases import load_reference_preset, SEED, START_TIME, TANK_ID
+from common.simulation_utils import simulate_tank_data, CHUNK_SIZE
+_, paths = simulate_tank_data(
+    365, load_reference_preset(), SEED, START_TIME, sys.argv[1], TANK_ID, "test",
+    chunk_size=CHUNK_SIZE, memory_budget_bytes=int(sys.argv[2])
+)
+try:
+    with open("/proc/self/status") as f:
+        peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+except OSError:
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"rows": paths["rows"], "peak_mb": peak_kb / 1024}))
+"""
+
+def test_365_days_stay_within_memory_budget(tmp_path):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, "libraries", "tank_simulator")]))
+    stdout = subprocess.run(
+        [sys.executable, "-c", BUDGET_RUN, str(tmp_path), str(BUDGET_MB * 2**20)],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(stdout.strip().splitlines()[-1])
+    assert result["rows"] == 365 * 1440
+    assert result["peak_mb"] <= BUDGET_MB, f"pico de RSS {result['peak_mb']:.0f} MB"
+
+
+def test_streaming_export_matches_in_memory_export(tmp_path):
+    """Un día por vaciado y chunks a caballo entre bloques: mismos archivos que la exportación en memoria."""
+    env, df = reference_dataframe(3)
+    memory_dir, streaming_dir = str(tmp_path / "memory"), str(tmp_path / "streaming")
+    expected = export_dataframe(df, env, memory_dir, "test")
+    expected_cache = generate_chunks(df, "test", TANK_ID, memory_dir, chunk_size=1000, summary=RunSummary.for_env(env))
+
+    plan = MemoryPlan(budget_bytes=0, baseline_bytes=0, buffer_days=1, chunk_size=1000, encode_rows=300)
+    paths = run_simulation(build_env(3), collector=StreamingExportCollector(streaming_dir, "test", None, plan))
+
+    assert paths["rows"] == len(df)
+    assert pq.read_table(paths["parquet"]).equals(pq.read_table(expected["parquet"]))
+    with open(paths["csv"], "rb") as f, open(expected["csv"], "rb") as g:
+        assert f.read() == g.read()
+    names = sorted(os.listdir(expected_cache))
+    assert sorted(os.listdir(paths["cache"])) == names
+    for name in names:
+        with open(os.path.join(paths["cache"], name), "rb") as f, open(os.path.join(expected_cache, name), "rb") as g:
+            assert f.read() == g.read(), name
+
+
+def test_one_parquet_row_group_per_day_with_coarse_dt(tmp_path):
+    env = build_env(4, dt_minutes=15)
+    df = rows_to_dataframe(run_simulation(env), env)
+    in_memory = export_dataframe(df, env, str(tmp_path / "memory"), "test")
+    plan = MemoryPlan(budget_bytes=0, baseline_bytes=0, buffer_days=3, chunk_size=1000, encode_rows=300)
+    streamed = run_simulation(build_env(4, dt_minutes=15), collector=StreamingExportCollector(
+        str(tmp_path / "streaming"), "test", None, plan, write_chunks=False
+    ))
+    for path in (in_memory["parquet"], streamed["parquet"]):
+        metadata = pq.read_metadata(path)
+        assert metadata.num_row_groups == 4
+        assert {metadata.row_group(i).num_rows for i in range(4)} == {env.steps_per_day}
@@ -0,0 +1,25 @@
+import time
+import multiprocessing
+import pytest
+from tank_simulator.sweep import run_sweep
+from tank_simulator.cancellation import CancellationToken, SimulationCancelled
+from benchmarks.cases import load_reference_preset, START_TIME, SEED, TANK_ID
+
+
+def test_cancelled_sweep_does_not_wait_for_running_batches():
+    # Cada lote simula dos escenarios de 120 días: varios segundos por proceso
+    points = [{"initial_N": 10000 + 1000 * i} for i in range(4)]
+    token = CancellationToken(deadline_s=0.5, check_interval_s=0.1)
+
+    started = time.monotonic()
+    with pytest.raises(SimulationCancelled) as excinfo:
+        run_sweep(load_reference_preset(), points, days=120, seed=SEED, start_time=START_TIME,
+                  tank_id=TANK_ID, max_workers=2, cancel_token=token)
+    assert excinfo.value.reason == "timeout"
+    assert time.monotonic() - started < 3
+
+    # Los hijos reciben la cancelación y se cortan en su siguiente día simulado
+    deadline = time.monotonic() + 5
+    while multiprocessing.active_children() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert not multiprocessing.active_children()
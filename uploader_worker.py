@@ -1,27 +1,28 @@
-import json
 import os
-from minio import Minio
+from common.minio_utils import create_minio_client, ensure_bucket, build_object_url
 from common.redis_utils import RedisClient
 from common.logger import get_logger
+from common.storage_lifecycle import StorageManager, path_size
+from common.serialization import UploadMessage
 from common.rabbit_utils import create_rabbit_connection
 from common.common_imports import *
 from common.job_status import *
+from tank_simulator.instrumentation import StageTimer
+from common.metrics import (
+    JOBS_TOTAL, start_metrics_server, observe_stage_timer, observe_upload, observe_queue_wait
+)
 
 
 logger = get_logger("MinioUploaderWorker")
 
 redis_client = RedisClient(REDIS_URL)
 
-minio_client = Minio(
-    MINIO_URL,
-    access_key=MINIO_ACCESS,
-    secret_key=MINIO_SECRET,
-    secure=False
-)
+minio_client = create_minio_client()
+
+storage = StorageManager()
 
 # Crear bucket si no existe
-if not minio_client.bucket_exists(MINIO_BUCKET):
-    minio_client.make_bucket(MINIO_BUCKET)
+if ensure_bucket(minio_client):
     logger.info(f"[+] Bucket '{MINIO_BUCKET}' creado")
 
 def upload_file(local_path: str, remote_path: str):
@@ -31,15 +32,33 @@ def upload_file(local_path: str, remote_path: str):
         file_path=local_path
     )
 
+def csv_object_name(local_name: str, base_name: str) -> str:
+    """output + sufijo de partición + extensión (.csv, .csv.gz, .csv.zst)."""
+    return "output" + local_name[len(base_name):]
+
+def upload_csv(csv: str, remote_folder: str) -> str:
+    """Sube un CSV o una carpeta de CSV particionados. Devuelve el objeto remoto."""
+    if os.path.isdir(csv):
+        base_name = os.path.basename(csv.rstrip(os.sep))[:-len("_csv")]
+        for name in sorted(os.listdir(csv)):
+            upload_file(os.path.join(csv, name), f"{remote_folder}/csv/{csv_object_name(name, base_name)}")
+        return f"{remote_folder}/csv/"
+
+    name = os.path.basename(csv)
+    remote_path = f"{remote_folder}/{csv_object_name(name, name[:name.index('.csv')])}"
+    upload_file(csv, remote_path)
+    return remote_path
+
 def callback(ch, method, properties, body):
     try:
-        data = json.loads(body.decode())
-        job_id = data["job_id"]
-        tank_id = data["tank_id"]
+        message = UploadMessage.from_json(body)
+        observe_queue_wait(UPLOAD_QUEUE, properties, message)
+        job_id = message.job_id
+        tank_id = message.tank_id
 
-        parquet = data["parquet_path"]
-        csv = data["csv_path"]
-        cache_url = data["cache_url"]
+        parquet = message.parquet_path
+        csv = message.csv_path
+        cache_url = message.cache_url
 
         remote_folder = f"{job_id}/tank_{tank_id}"
 
@@ -65,12 +84,16 @@ def callback(ch, method, properties, body):
                 cache_url
             )
 
+            JOBS_TOTAL.labels(worker="uploader", status="failed").inc()
             ch.basic_ack(delivery_tag=method.delivery_tag)
             return
 
         redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.UPLOADING.value, 96, cache_url)
 
-        upload_file(parquet, f"{remote_folder}/output.parquet")
+        timer = StageTimer()
+        with timer.stage("upload_parquet"):
+            upload_file(parquet, f"{remote_folder}/output.parquet")
+        timer.add_bytes("upload_parquet", os.path.getsize(parquet))
         redis_client.publish_progress(
             job_id,
             REDIS_SIMULATION_CHANNEL,
@@ -79,7 +102,9 @@ def callback(ch, method, properties, body):
             cache_url
         )
 
-        upload_file(csv, f"{remote_folder}/output.csv")
+        with timer.stage("upload_csv"):
+            csv_remote = upload_csv(csv, remote_folder)
+        timer.add_bytes("upload_csv", path_size(csv))
         redis_client.publish_progress(
             job_id,
             REDIS_SIMULATION_CHANNEL,
@@ -88,24 +113,37 @@ def callback(ch, method, properties, body):
             cache_url
         )
 
-        final_url = (
-            f"http://{MINIO_URL}/"
-            f"{MINIO_BUCKET}/"
-            f"{job_id}/tank_{tank_id}/output.csv"
-        )
+        final_url = build_object_url(csv_remote)
 
-        logger.info(f"[✔] Subida correcta en MinIO para job {job_id}")
+        logger.info(f"[✔] Subida correcta en MinIO para job {job_id} ({timer.summary()})")
+        redis_client.update_job(job_id, timer.as_dict())
+        observe_stage_timer("uploader", timer)
+        for artifact in ("parquet", "csv"):
+            stage = f"upload_{artifact}"
+            observe_upload(artifact, timer.bytes.get(stage, 0), timer.durations.get(stage, 0.0))
+        JOBS_TOTAL.labels(worker="uploader", status="completed").inc()
         redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.COMPLETED.value, 100, final_url)
 
+        if STORAGE_CLEANUP_AFTER_UPLOAD:
+            # Los datos ya están en MinIO: un fallo al borrar no invalida la subida
+            try:
+                removed = storage.release_uploaded(job_id, tank_id, [parquet, csv])
+                logger.info(f"[✔] Liberados {len(removed)} artefactos locales de job {job_id}")
+            except OSError as e:
+                logger.warning(f"[!] No se pudieron borrar los artefactos locales de job {job_id}: {e}")
+
         ch.basic_ack(delivery_tag=method.delivery_tag)
 
     except Exception as e:
         redis_client.publish_progress(job_id, REDIS_SIMULATION_CHANNEL, JobStatus.UPLOAD_FAILED.value, 100, cache_url)
         logger.error(f"[!] Error subiendo a MinIO: {e}")
+        JOBS_TOTAL.labels(worker="uploader", status="failed").inc()
         ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
 
 
 if __name__ == "__main__":
+    metrics_port = start_metrics_server(9102)
+    logger.info(f"[*] Métricas en :{metrics_port}/metrics")
     logger.info(f"[*] Esperando mensajes en {UPLOAD_QUEUE}...")
     conn, channel = create_rabbit_connection(
         URL_RABBIT,